@@ -0,0 +1,66 @@
+"""Compare cache codecs on encode time, decode time and payload size.
+
+Run from ``backend/``::
+
+    python -m scripts.benchmark_cache_codec --repeat 20
+
+Each codec encodes the full pet and ability lists, the largest values the
+app caches, and a single pet, the most frequent one. Decoding rebuilds the
+models as the cache does. Codecs whose library is not installed are skipped.
+"""
+
+import argparse
+import time
+
+from src.repository.cache_codec import SERIALIZERS, CacheCodec
+from src.repository.csv_ingest import load_abilities, load_pets
+
+
+def timed(fn, repeat: int) -> float:
+    """Fastest of ``repeat`` calls in milliseconds, the least noisy figure."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return min(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--compress-threshold", type=int, default=1024)
+    args = parser.parse_args()
+
+    pets, abilities = load_pets(), load_abilities()
+    values = {
+        "pets": (pets, type(pets[0])),
+        "abilities": (abilities, type(abilities[0])),
+        "one pet": (pets[0], type(pets[0])),
+    }
+
+    print(
+        f"{'value':<10} {'codec':<13} {'bytes':>9} {'encode ms':>10} {'decode ms':>10}"
+    )
+    for serializer in SERIALIZERS:
+        for threshold in (0, args.compress_threshold):
+            try:
+                codec = CacheCodec(serializer, compress_threshold=threshold)
+            except ImportError:
+                continue
+            if threshold and not codec.compress_threshold:
+                continue
+            for label, (value, model_cls) in values.items():
+                raw = codec.encode(value)
+                encode_ms = timed(lambda: codec.encode(value), args.repeat)
+                decode_ms = timed(
+                    lambda: codec.decode_models(raw, model_cls), args.repeat
+                )
+                print(
+                    f"{label:<10} {codec.name:<13} {len(raw):>9} "
+                    f"{encode_ms:>10.3f} {decode_ms:>10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Compare FAISS index modes on recall, latency and memory.
+
+Run from ``backend/``::
+
+    python -m scripts.benchmark_search_index            # real pet and ability texts
+    python -m scripts.benchmark_search_index --synthetic 100000 --dimension 768
+
+Recall@k is measured against the exact flat index on the same vectors.
+Memory is the serialized index size, which is what a memory-mapped index
+keeps resident.
+"""
+
+import argparse
+import csv
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from src.core.vector_index import INDEX_TYPES, IndexConfig
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def load_texts() -> list[str]:
+    """Every pet and ability row flattened to one string, as the search index sees it."""
+    texts = []
+    for name in ("mop_battle_pets.csv", "mop_battle_pet_abilities.csv"):
+        with (DATA_DIR / name).open(encoding="utf-8") as f:
+            texts.extend(" ".join(row.values()) for row in csv.DictReader(f))
+    return texts
+
+
+def encode(texts: list[str], model_name: str) -> np.ndarray:
+    from sentence_transformers import SentenceTransformer
+
+    from src.core.semantic_search import normalize
+
+    return normalize(SentenceTransformer(model_name).encode(texts)).astype(np.float32)
+
+
+def synthetic(n_vectors: int, dimension: int, seed: int) -> np.ndarray:
+    """Clustered unit vectors; uniform random ones make every index look bad."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n_vectors // 50, 1), dimension))
+    vectors = centers[rng.integers(len(centers), size=n_vectors)]
+    vectors += 0.3 * rng.standard_normal((n_vectors, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def benchmark(
+    config: IndexConfig,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+) -> dict[str, float]:
+    started = time.perf_counter()
+    index = config.build(vectors)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    build_seconds = time.perf_counter() - started
+
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {
+        "recall": float(recall),
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+        "memory_mb": faiss.serialize_index(index).nbytes / 2**20,
+        "build_s": build_seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--synthetic", type=int, metavar="N", help="use N random vectors"
+    )
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument(
+        "--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES
+    )
+    parser.add_argument("--hnsw-ef-search", type=int, default=64)
+    parser.add_argument("--ivf-nprobe", type=int, default=8)
+    parser.add_argument("--pq-m", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic(args.synthetic, args.dimension, args.seed)
+    else:
+        vectors = encode(load_texts(), args.model)
+    rng = np.random.default_rng(args.seed)
+    # Perturbed copies of stored vectors stand in for real queries.
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(
+        f"{len(vectors)} vectors, d={vectors.shape[1]}, {len(queries)} queries, k={args.k}"
+    )
+    print(
+        f"{'mode':<8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'memory MB':>10} {'build s':>8}"
+    )
+    for index_type in args.types:
+        config = IndexConfig(
+            index_type=index_type,
+            hnsw_ef_search=args.hnsw_ef_search,
+            ivf_nprobe=args.ivf_nprobe,
+            pq_m=args.pq_m,
+        )
+        result = benchmark(config, vectors, queries, truth, args.k)
+        print(
+            f"{index_type:<8} {result['recall']:>9.3f} {result['p50_ms']:>8.3f} "
+            f"{result['p99_ms']:>8.3f} {result['memory_mb']:>10.2f} {result['build_s']:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
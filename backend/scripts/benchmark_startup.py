@@ -0,0 +1,80 @@
+"""Measure how long the app takes to start serving requests.
+
+Run from ``backend/``::
+
+    python -m scripts.benchmark_startup --runs 5 --max-seconds 2
+
+Each run is a fresh interpreter that imports the app, builds it, runs the
+lifespan startup and answers ``/ready``. Model and index loading happen in
+the background and are not part of the measured time. Exits non-zero if
+the median exceeds ``--max-seconds`` or building the app imported a
+heavy module, so CI can catch regressions.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "faiss")
+
+CHILD = f"""
+import json, os, sys, time
+started = time.perf_counter()
+from src.app.battler_app import BattlerApp
+imported = time.perf_counter()
+battler = BattlerApp()
+built = time.perf_counter()
+heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+from fastapi.testclient import TestClient
+with TestClient(battler.app) as client:
+    status = client.get("/ready").status_code
+    served = time.perf_counter()
+print(json.dumps({{
+    "import_s": imported - started,
+    "build_s": built - imported,
+    "first_response_s": served - started,
+    "ready_status": status,
+    "heavy_modules": heavy,
+}}), flush=True)
+# Skip waiting for the background warm-up threads.
+os._exit(0)
+"""
+
+
+def run_once() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    for key in ("import_s", "build_s", "first_response_s"):
+        values = [r[key] for r in results]
+        print(
+            f"{key:<18} median {statistics.median(values):.3f}s  max {max(values):.3f}s"
+        )
+    heavy = sorted({m for r in results for m in r["heavy_modules"]})
+    print(f"heavy modules loaded while building the app: {heavy or 'none'}")
+
+    median = statistics.median(r["first_response_s"] for r in results)
+    if heavy or (args.max_seconds is not None and median > args.max_seconds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,93 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+
+from fastapi import Depends, FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response
+from src.app.response_cache import ResponseCache
 from src.core.pet_manager import PetManager
-from src.core.models import BattlePet, PetType, Ability
+from src.core.models import (
+    BattlePet,
+    PetType,
+    Ability,
+    MatchupRequest,
+    MatchupResponse,
+    SimulationRequest,
+    SimulationResponse,
+    TeamRecommendationRequest,
+    TeamRecommendation,
+    SearchRequest,
+    SearchResponse,
+    Page,
+    PageQuery,
+)
+from src.core.search_filters import unsupported_filters
+from src.core.simulation import DRAW
+from src.repository import redis_cache
+from src.repository.catalog import CatalogDataHandler
+from src.repository.clients import Clients, close_clients, set_clients
+from src.repository.pet_data_handler import PetDataHandler
+from src.utils.inference_executor import ExecutorSaturated
+from src.utils.readiness import NotReady, Readiness
+from src.utils.settings import Settings
 from fastapi.middleware.cors import CORSMiddleware
 
 
+def page_query(
+    limit: int = Query(100, ge=1, le=1000, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the last page"),
+    sort: str = Query("id", description="Field to sort on, e.g. 'speed'"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return, e.g. 'name,type'"
+    ),
+) -> PageQuery:
+    return PageQuery(
+        limit=limit,
+        cursor=cursor,
+        sort=sort,
+        descending=order == "desc",
+        fields=tuple(f.strip() for f in fields.split(",") if f.strip())
+        if fields
+        else None,
+    )
+
+
 class BattlerApp:
-    def __init__(self):
-        self.app = FastAPI(title="battler_app", version="0.0.1")
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or Settings.from_env()
+        # Every repository class below shares these pools; lifespan closes them.
+        set_clients(Clients(self.settings))
+        self.catalog: Optional[CatalogDataHandler] = None
+        if self.settings.catalog_mode:
+            self.catalog = CatalogDataHandler(
+                refresh_interval=self.settings.catalog_refresh_seconds
+            )
+        self.app = FastAPI(title="battler_app", version="0.0.1", lifespan=self.lifespan)
         self.router = APIRouter()
-        self.manager = PetManager()
+        self.manager = PetManager(db=self.catalog, settings=self.settings)
+        self.readiness = Readiness(
+            ["database", "search_model", "search_index", "counter_index"]
+        )
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self.responses = ResponseCache()
+
+        @self.app.exception_handler(ExecutorSaturated)
+        async def inference_saturated(request: Request, exc: ExecutorSaturated):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": str(exc)},
+                headers={"Retry-After": "1"},
+            )
+
+        @self.app.exception_handler(NotReady)
+        async def not_ready(request: Request, exc: NotReady):
+            return JSONResponse(
+                status_code=503,
+                content={"detail": str(exc)},
+                headers={"Retry-After": "5"},
+            )
 
         self.app.add_middleware(
             CORSMiddleware,
@@ -18,28 +97,213 @@ class BattlerApp:
             allow_headers=["*"],
         )
 
-        @self.router.get("/battle_pets/get")
-        async def list_battle_pets() -> list[BattlePet]:
-            return await self.manager.list_battle_pets()
+        async def cached(request: Request, key: tuple, build) -> Response:
+            """The catalog response ``build`` produces, served from ``self.responses``."""
+            version = await self.manager.dataset_version()
+            return await self.responses.respond(request, key, version, build)
+
+        @self.router.get("/battle_pets/get", response_model=Page)
+        async def list_battle_pets(
+            request: Request, query: PageQuery = Depends(page_query)
+        ) -> Response:
+            try:
+                return await cached(
+                    request,
+                    ("battle_pets", query),
+                    lambda: self.manager.battle_pets_page(query),
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
 
-        @self.router.get("/battle_pets/get_by_id")
-        async def get_battle_pet_by_id(_id: int) -> BattlePet:
-            return await self.manager.get_pet(_id)
+        @self.router.get("/battle_pets/get_by_id", response_model=BattlePet)
+        async def get_battle_pet_by_id(request: Request, _id: int) -> Response:
+            return await cached(
+                request, ("battle_pet", _id), lambda: self.manager.get_pet(_id)
+            )
 
-        @self.router.get("/battle_pets/list_double_counters")
+        @self.router.get(
+            "/battle_pets/list_double_counters", response_model=list[BattlePet]
+        )
         async def list_double_counters(
+            request: Request,
             _type: str = Query(..., description="Pet type (e.g. 'Aquatic', 'Beast')"),
-        ) -> list[BattlePet]:
+        ) -> Response:
             try:
                 type_enum = PetType(_type)
             except ValueError:
                 raise HTTPException(
                     status_code=400, detail=f"Invalid pet type: {_type}"
                 )
-            return await self.manager.double_tappers(type_enum)
+            return await cached(
+                request,
+                ("double_counters", type_enum),
+                lambda: self.manager.double_tappers(type_enum),
+            )
 
-        @self.router.get("/abilities/get_by_id")
-        async def get_ability_by_id(_id: int) -> Ability:
-            return await self.manager.get_ability(_id)
+        @self.router.post("/battle_pets/matchups")
+        async def matchups(request: MatchupRequest) -> MatchupResponse:
+            pets_by_id = {pet.id: pet for pet in await self.manager.list_battle_pets()}
+            missing = [
+                _id
+                for _id in (*request.attacker_ids, *request.defender_ids)
+                if _id not in pets_by_id
+            ]
+            if missing:
+                raise HTTPException(
+                    status_code=404, detail=f"Unknown battle pet ids: {missing}"
+                )
+            matrix = await self.manager.matchup_matrix(
+                [pets_by_id[_id] for _id in request.attacker_ids],
+                [pets_by_id[_id] for _id in request.defender_ids],
+            )
+            return MatchupResponse(
+                attacker_ids=request.attacker_ids,
+                defender_ids=request.defender_ids,
+                effectiveness=matrix.tolist(),
+            )
+
+        @self.router.post("/battles/simulate")
+        async def simulate_battles(request: SimulationRequest) -> SimulationResponse:
+            try:
+                result = await self.manager.simulate_battle(
+                    request.team_a,
+                    request.team_b,
+                    battles=request.battles,
+                    seed=request.seed,
+                    max_rounds=request.max_rounds,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            return SimulationResponse(
+                battles=result.battles,
+                team_a_win_rate=result.win_rate(0),
+                team_b_win_rate=result.win_rate(1),
+                draw_rate=result.win_rate(DRAW),
+                mean_rounds=float(result.rounds.mean()),
+                team_a_rounds_to_win=result.rounds_histogram(0),
+                team_b_rounds_to_win=result.rounds_histogram(1),
+            )
+
+        @self.router.post("/teams/recommend")
+        async def recommend_team(
+            request: TeamRecommendationRequest,
+        ) -> TeamRecommendation:
+            if not request.enemy_ids and request.enemy_type is None:
+                raise HTTPException(
+                    status_code=400, detail="Give enemy_ids or enemy_type"
+                )
+            try:
+                result = await self.manager.recommend_team(
+                    enemy_ids=request.enemy_ids,
+                    enemy_type=request.enemy_type,
+                    time_budget=request.time_budget,
+                    tameable_only=request.tameable_only,
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            return TeamRecommendation(
+                pets=result.pets,
+                score=result.score,
+                candidates=result.candidates,
+                complete=result.complete,
+            )
+
+        @self.router.post("/search")
+        async def search(request: SearchRequest) -> SearchResponse:
+            unsupported = unsupported_filters(request.filters, request.kind)
+            if unsupported:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Filters {unsupported} do not apply to {request.kind}",
+                )
+            response = SearchResponse(query=request.query, kind=request.kind)
+            if request.kind == "pets":
+                response.pets = await self.manager.sem_search_pets(
+                    request.query, request.k, request.filters
+                )
+            else:
+                response.abilities = await self.manager.sem_search_abilities(
+                    request.query, request.k, request.filters
+                )
+            return response
+
+        @self.router.get("/abilities/get", response_model=Page)
+        async def list_abilities(
+            request: Request, query: PageQuery = Depends(page_query)
+        ) -> Response:
+            try:
+                return await cached(
+                    request,
+                    ("abilities", query),
+                    lambda: self.manager.abilities_page(query),
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        @self.router.get("/abilities/get_by_id", response_model=Ability)
+        async def get_ability_by_id(request: Request, _id: int) -> Response:
+            return await cached(
+                request, ("ability", _id), lambda: self.manager.get_ability(_id)
+            )
+
+        @self.router.get("/ready")
+        async def ready() -> JSONResponse:
+            report = self.readiness.report()
+            return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+        @self.router.get("/metrics")
+        async def metrics() -> dict[str, dict[str, float]]:
+            metrics = self.manager.search_metrics()
+            metrics["responses"] = self.responses.metrics()
+            if isinstance(self.manager.db, PetDataHandler):
+                metrics.update(await redis_cache.metrics())
+                metrics["cache_loads"] = self.manager.db.flights.metrics()
+            return metrics
 
         self.app.include_router(self.router)
+
+    async def _warm_up_database(self) -> None:
+        if self.catalog is not None:
+            await self.catalog.load()
+            self.catalog.start()
+        elif isinstance(self.manager.db, PetDataHandler):
+            self.manager.db.start()
+        try:
+            await self.manager.db.ensure_indexes()
+        except NotImplementedError:
+            pass
+
+    async def warm_up(self) -> None:
+        """Load the database, model and indexes while the app already serves requests."""
+        sem_search = self.manager.sem_search
+        database_ready, model_ready = await asyncio.gather(
+            self.readiness.run("database", self._warm_up_database),
+            self.readiness.run(
+                "search_model",
+                lambda: self.manager.inference.run(sem_search.load_model),
+            ),
+        )
+        if not database_ready:
+            self.readiness.skip("search_index", "database failed to warm up")
+            self.readiness.skip("counter_index", "database failed to warm up")
+            return
+        await self.readiness.run("counter_index", self.manager.counter_index)
+        if model_ready:
+            await self.readiness.run("search_index", sem_search.set_embeddings)
+        else:
+            self.readiness.skip("search_index", "model failed to load")
+
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        self._warm_up_task = asyncio.create_task(self.warm_up())
+        yield
+        self._warm_up_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._warm_up_task
+        self.manager.team_builder.shutdown()
+        self.manager.inference.shutdown()
+        if self.catalog is not None:
+            await self.catalog.stop()
+        elif isinstance(self.manager.db, PetDataHandler):
+            await self.manager.db.stop()
+        await close_clients()
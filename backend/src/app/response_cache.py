@@ -0,0 +1,164 @@
+"""Serialized, validated and precompressed bodies for the catalog endpoints.
+
+Catalog responses only change with the dataset, so each body is serialized
+once per dataset version and served as raw bytes. Every body carries a
+strong ``ETag``: a client that sends it back in ``If-None-Match`` gets a
+304 with no body. The brotli and gzip variants are compressed once, in a
+worker thread, when the body is built, and kept with it.
+"""
+
+import asyncio
+import gzip
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+import brotli
+from fastapi import Request, Response
+from pydantic_core import to_json
+
+from src.core.query_cache import QueryCache
+from src.utils.single_flight import SingleFlight
+
+# Tried in this order when the client accepts several equally.
+ENCODINGS = ("br", "gzip")
+# Smaller bodies are not worth compressing.
+MIN_COMPRESS_BYTES = 1024
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=9)
+    # mtime=0 keeps the bytes, and so the ETag, identical across workers.
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """The preferred encoding of ``ENCODINGS`` that ``Accept-Encoding`` allows, if any."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _etag_matches(if_none_match: str, etags: set[str]) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.removeprefix("W/") in etags:
+            return True
+    return False
+
+
+@dataclass
+class CachedBody:
+    """One serialized response with its ETag and its compressed variants."""
+
+    body: bytes
+    digest: str = ""
+    variants: dict[str, bytes] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.digest = hashlib.sha256(self.body).hexdigest()[:32]
+
+    def etag(self, encoding: Optional[str]) -> str:
+        # Each encoding is a different representation, so it gets its own tag.
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def all_etags(self) -> set[str]:
+        return {self.etag(None), *(self.etag(e) for e in ENCODINGS)}
+
+    def encoded(self, encoding: Optional[str]) -> tuple[Optional[str], bytes]:
+        variant = self.variants.get(encoding) if encoding is not None else None
+        if variant is None:
+            return None, self.body
+        return encoding, variant
+
+
+def precompressed(body: bytes) -> CachedBody:
+    """``body`` with every variant in ``ENCODINGS``, unless it is too small to bother.
+
+    CPU-bound, so callers on the event loop run it in a thread.
+    """
+    cached = CachedBody(body)
+    if len(body) >= MIN_COMPRESS_BYTES:
+        cached.variants = {e: _compress(body, e) for e in ENCODINGS}
+    return cached
+
+
+class ResponseCache:
+    """Serialized catalog responses, keyed by dataset version and request."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        # Entries of older versions are never asked for again and age out.
+        self.bodies: QueryCache[CachedBody] = QueryCache(max_entries, ttl=float("inf"))
+        self.flights = SingleFlight()
+        self.not_modified = 0
+
+    async def _body(
+        self,
+        key: Hashable,
+        version: Optional[str],
+        build: Callable[[], Awaitable[Any]],
+    ) -> CachedBody:
+        async def serialize() -> CachedBody:
+            # Straight to JSON bytes in pydantic-core, skipping response validation.
+            body = to_json(await build())
+            return await asyncio.to_thread(precompressed, body)
+
+        if version is None:
+            # Without a dataset version nothing can be reused safely.
+            return await serialize()
+        cache_key = (version, key)
+        cached = self.bodies.get(cache_key)
+        if cached is None:
+            cached = await self.flights.run(cache_key, serialize)
+            self.bodies.set(cache_key, cached)
+        return cached
+
+    async def respond(
+        self,
+        request: Request,
+        key: Hashable,
+        version: Optional[str],
+        build: Callable[[], Awaitable[Any]],
+    ) -> Response:
+        """Answer ``request`` from the body ``build`` produces for ``version``.
+
+        ``key`` must identify everything the body depends on besides the
+        version, e.g. the path and query.
+        """
+        cached = await self._body(key, version, build)
+        encoding = accepted_encoding(request.headers.get("accept-encoding", ""))
+        encoding, content = cached.encoded(encoding)
+        headers = {
+            "ETag": cached.etag(encoding),
+            "Vary": "Accept-Encoding",
+            # Clients may keep the body but must revalidate, which is a 304.
+            "Cache-Control": "no-cache",
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, cached.all_etags()):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content, media_type="application/json", headers=headers)
+
+    def metrics(self) -> dict[str, float]:
+        return {**self.bodies.metrics(), "not_modified": self.not_modified}
@@ -0,0 +1,142 @@
+import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+import numpy as np
+
+from src.core.models import Ability, BattlePet, PetType
+from src.core.pet_type_chart import find_types_strong_against, pet_type_matrix
+
+DAMAGE_PATTERN = re.compile(
+    r"\b\d+\s+(" + "|".join([pt.value for pt in PetType]) + r")\s+damage\b",
+    re.IGNORECASE,
+)
+
+
+def deals_damage(ability: Ability) -> bool:
+    """Check the damage column first, then the description, for a damaging ability."""
+    if ability.damage and ability.damage.strip().lower() != "0":
+        return True
+    return DAMAGE_PATTERN.search(ability.description) is not None
+
+
+def _sorted_ids(ids) -> np.ndarray:
+    return np.unique(np.fromiter(ids, dtype=np.int64))
+
+
+@dataclass(frozen=True)
+class CounterIndex:
+    """Per-type counter tables, stored as sorted pet id arrays.
+
+    - ``strong``: pets with a damaging ability whose type is strong against the type
+    - ``defensive``: pets whose own type resists attacks of the type
+    - ``double``: pets in both tables
+    """
+
+    version: str
+    pets_by_id: Mapping[int, BattlePet]
+    strong: Mapping[PetType, np.ndarray]
+    defensive: Mapping[PetType, np.ndarray]
+    double: Mapping[PetType, np.ndarray]
+
+    @classmethod
+    def build(
+        cls, pets: list[BattlePet], abilities: list[Ability], version: str
+    ) -> "CounterIndex":
+        damaging_ids_by_type: dict[PetType, set[int]] = {t: set() for t in PetType}
+        for ability in abilities:
+            if deals_damage(ability):
+                damaging_ids_by_type[ability.type].add(ability.id)
+
+        pet_ids_by_type: dict[PetType, list[int]] = {t: [] for t in PetType}
+        for pet in pets:
+            pet_ids_by_type[pet.type].append(pet.id)
+
+        strong, defensive, double = {}, {}, {}
+        for target in PetType:
+            damaging_ids = set().union(
+                *(damaging_ids_by_type[t] for t in find_types_strong_against(target))
+            )
+            strong[target] = _sorted_ids(
+                pet.id
+                for pet in pets
+                if any(ability_id in damaging_ids for ability_id in pet.abilities)
+            )
+            resistant_types = pet_type_matrix[target]["weak_against"]
+            defensive[target] = _sorted_ids(
+                pet_id for t in resistant_types for pet_id in pet_ids_by_type[t]
+            )
+            double[target] = np.intersect1d(
+                strong[target], defensive[target], assume_unique=True
+            )
+
+        for table in (strong, defensive, double):
+            for ids in table.values():
+                ids.setflags(write=False)
+
+        return cls(
+            version=version,
+            pets_by_id=MappingProxyType({pet.id: pet for pet in pets}),
+            strong=MappingProxyType(strong),
+            defensive=MappingProxyType(defensive),
+            double=MappingProxyType(double),
+        )
+
+    def updated(
+        self,
+        pets: list[BattlePet],
+        removed: list[int],
+        abilities_by_id: Mapping[int, Ability],
+        version: str,
+    ) -> "CounterIndex":
+        """A copy with ``pets`` re-filed and ``removed`` dropped, leaving every other pet as is.
+
+        ``abilities_by_id`` must hold the abilities of ``pets``. Only valid
+        while the abilities themselves are unchanged.
+        """
+        touched = _sorted_ids([pet.id for pet in pets] + list(removed))
+        pets_by_id = dict(self.pets_by_id)
+        for pet_id in removed:
+            pets_by_id.pop(pet_id, None)
+        pets_by_id.update((pet.id, pet) for pet in pets)
+
+        damaging_types = {
+            pet.id: {
+                abilities_by_id[_id].type
+                for _id in pet.abilities
+                if _id in abilities_by_id and deals_damage(abilities_by_id[_id])
+            }
+            for pet in pets
+        }
+        strong, defensive, double = {}, {}, {}
+        for target in PetType:
+            attack_types = set(find_types_strong_against(target))
+            resistant_types = set(pet_type_matrix[target]["weak_against"])
+            strong[target] = np.union1d(
+                np.setdiff1d(self.strong[target], touched, assume_unique=True),
+                _sorted_ids(p.id for p in pets if damaging_types[p.id] & attack_types),
+            )
+            defensive[target] = np.union1d(
+                np.setdiff1d(self.defensive[target], touched, assume_unique=True),
+                _sorted_ids(p.id for p in pets if p.type in resistant_types),
+            )
+            double[target] = np.intersect1d(
+                strong[target], defensive[target], assume_unique=True
+            )
+
+        for table in (strong, defensive, double):
+            for ids in table.values():
+                ids.setflags(write=False)
+
+        return CounterIndex(
+            version=version,
+            pets_by_id=MappingProxyType(pets_by_id),
+            strong=MappingProxyType(strong),
+            defensive=MappingProxyType(defensive),
+            double=MappingProxyType(double),
+        )
+
+    def pets(self, ids: np.ndarray) -> list[BattlePet]:
+        """Resolve an id array from one of the tables into pets, in id order."""
+        return [self.pets_by_id[int(pet_id)] for pet_id in ids]
@@ -0,0 +1,159 @@
+"""One process that owns the sentence transformer, shared by every app worker.
+
+Start it next to the workers and point them at its socket::
+
+    python -m src.core.inference_sidecar --socket /run/battler/inference.sock
+    BATTLER_INFERENCE_SOCKET=/run/battler/inference.sock uvicorn ... --workers 8
+
+Each request is a length-prefixed JSON list of texts. The reply is a
+length-prefixed JSON header, ``{"shape": [rows, dim]}`` or ``{"error": ...}``,
+followed by the float32 embeddings.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import struct
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.utils.inference_executor import ExecutorSaturated, InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct("!I")
+
+
+def _frame(payload: bytes) -> bytes:
+    return _LENGTH.pack(len(payload)) + payload
+
+
+class SidecarEncoder:
+    """Drop-in for ``SentenceTransformer.encode`` that asks the sidecar instead.
+
+    Each calling thread keeps its own connection, so concurrent encodes do
+    not interleave on one socket.
+    """
+
+    def __init__(self, socket_path: Path, timeout: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: list[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> socket.socket:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(str(self.socket_path))
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _reset(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                self._connections.remove(conn)
+
+    def _recv_exactly(self, conn: socket.socket, size: int) -> bytes:
+        chunks = bytearray()
+        while len(chunks) < size:
+            chunk = conn.recv(size - len(chunks))
+            if not chunk:
+                raise ConnectionError("Inference sidecar closed the connection")
+            chunks += chunk
+        return bytes(chunks)
+
+    def _request(self, texts: list[str]) -> np.ndarray:
+        conn = self._connection()
+        conn.sendall(_frame(json.dumps(texts).encode("utf-8")))
+        (size,) = _LENGTH.unpack(self._recv_exactly(conn, _LENGTH.size))
+        header = json.loads(self._recv_exactly(conn, size))
+        if "error" in header:
+            if header.get("saturated"):
+                raise ExecutorSaturated(header["error"])
+            raise RuntimeError(f"Inference sidecar failed: {header['error']}")
+        rows, dim = header["shape"]
+        data = self._recv_exactly(conn, rows * dim * 4)
+        return np.frombuffer(data, dtype=np.float32).reshape(rows, dim)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        try:
+            return self._request(texts)
+        except ConnectionError:
+            # The sidecar may have restarted; retry once on a fresh connection.
+            self._reset()
+            return self._request(texts)
+
+    def close(self) -> None:
+        """Close every thread's connection."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+async def serve(
+    socket_path: Path, model, executor: InferenceExecutor
+) -> asyncio.AbstractServer:
+    """Answer encode requests on ``socket_path`` with ``model`` until cancelled."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                texts = json.loads(await reader.readexactly(size))
+                try:
+                    vectors = await executor.run(model.encode, texts)
+                except ExecutorSaturated as e:
+                    header, body = {"error": str(e), "saturated": True}, b""
+                except Exception as e:
+                    logger.exception("Encoding failed")
+                    header, body = {"error": repr(e)}, b""
+                else:
+                    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+                    header, body = {"shape": list(vectors.shape)}, vectors.tobytes()
+                writer.write(_frame(json.dumps(header).encode("utf-8")) + body)
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    socket_path.unlink(missing_ok=True)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    return await asyncio.start_unix_server(handle, path=str(socket_path))
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve query encoding for app workers")
+    parser.add_argument("--socket", type=Path, required=True)
+    parser.add_argument("--model", default="all-mpnet-base-v2")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--queue-depth", type=int, default=64)
+    args = parser.parse_args()
+
+    from src.core.semantic_search import load_sentence_transformer
+
+    logging.basicConfig(level=logging.INFO)
+    model = load_sentence_transformer(args.model)
+    server = await serve(
+        args.socket, model, InferenceExecutor(args.workers, args.queue_depth)
+    )
+    logger.info(f"Serving {args.model} on {args.socket}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
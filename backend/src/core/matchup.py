@@ -0,0 +1,78 @@
+from typing import Mapping
+
+import numpy as np
+
+from src.core.models import Ability, BattlePet, PetType
+from src.core.pet_type_chart import pet_type_matrix
+
+TYPE_ORDER: tuple[PetType, ...] = tuple(PetType)
+TYPE_INDEX: dict[PetType, int] = {t: i for i, t in enumerate(TYPE_ORDER)}
+
+STRONG_MULTIPLIER = 1.5
+WEAK_MULTIPLIER = 2 / 3
+
+
+def type_advantage_matrix() -> np.ndarray:
+    """Damage multiplier for [attack type, defender type], built from ``pet_type_matrix``."""
+    matrix = np.ones((len(TYPE_ORDER), len(TYPE_ORDER)), dtype=np.float32)
+    for attack_type, matchup in pet_type_matrix.items():
+        for defender in matchup["strong_against"]:
+            matrix[TYPE_INDEX[attack_type], TYPE_INDEX[defender]] = STRONG_MULTIPLIER
+        for defender in matchup["weak_against"]:
+            matrix[TYPE_INDEX[attack_type], TYPE_INDEX[defender]] = WEAK_MULTIPLIER
+    matrix.setflags(write=False)
+    return matrix
+
+
+TYPE_ADVANTAGE = type_advantage_matrix()
+
+
+def type_indices(pets: list[BattlePet]) -> np.ndarray:
+    return np.fromiter((TYPE_INDEX[pet.type] for pet in pets), dtype=np.intp)
+
+
+def ability_type_mask(
+    pets: list[BattlePet], abilities_by_id: Mapping[int, Ability]
+) -> np.ndarray:
+    """Boolean (pets, types) mask of the ability types each pet can attack with.
+
+    Padding slots (-1) and ids missing from ``abilities_by_id`` are ignored.
+    """
+    mask = np.zeros((len(pets), len(TYPE_ORDER)), dtype=bool)
+    for row, pet in enumerate(pets):
+        for ability_id in pet.abilities:
+            ability = abilities_by_id.get(ability_id)
+            if ability is not None:
+                mask[row, TYPE_INDEX[ability.type]] = True
+    return mask
+
+
+def best_multiplier_by_type(mask: np.ndarray) -> np.ndarray:
+    """(pets, defender types) best multiplier over each pet's ability types, 0 if it has none."""
+    candidates = np.where(mask[:, :, None], TYPE_ADVANTAGE[None, :, :], 0.0)
+    return candidates.max(axis=1)
+
+
+def effectiveness_matrix(
+    attackers: list[BattlePet],
+    defenders: list[BattlePet],
+    abilities_by_id: Mapping[int, Ability],
+) -> np.ndarray:
+    """(attackers, defenders) matrix of the best type multiplier each attacker can bring."""
+    best = best_multiplier_by_type(ability_type_mask(attackers, abilities_by_id))
+    return best[:, type_indices(defenders)]
+
+
+def pair_effectiveness(
+    pairs: list[tuple[BattlePet, BattlePet]],
+    abilities_by_id: Mapping[int, Ability],
+) -> np.ndarray:
+    """Best type multiplier for each (attacker, defender) pair."""
+    if not pairs:
+        return np.zeros(0, dtype=np.float32)
+    attackers = list({attacker.id: attacker for attacker, _ in pairs}.values())
+    row_of = {pet.id: row for row, pet in enumerate(attackers)}
+    best = best_multiplier_by_type(ability_type_mask(attackers, abilities_by_id))
+    rows = np.fromiter((row_of[attacker.id] for attacker, _ in pairs), dtype=np.intp)
+    cols = type_indices([defender for _, defender in pairs])
+    return best[rows, cols]
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, Field, ConfigDict, field_validator
 
 # types: Aquatic # Beast # Critter # Dragonkin # Elemental # Flying # Humanoid # Magic # Mechanical # Undead
@@ -101,3 +102,162 @@ class BattlePet(BaseModel):
         elif len(v) > 6:
             v = v[:6]
         return v
+
+
+class ChangeSet(BaseModel):
+    """Ids that one write inserted, updated or deleted in a collection."""
+
+    collection: Literal["battle_pets", "abilities"]
+    inserted: list[int] = Field(default_factory=list)
+    updated: list[int] = Field(default_factory=list)
+    deleted: list[int] = Field(default_factory=list)
+
+    @property
+    def upserted(self) -> list[int]:
+        return self.inserted + self.updated
+
+    @property
+    def empty(self) -> bool:
+        return not (self.inserted or self.updated or self.deleted)
+
+    @classmethod
+    def merge(cls, changes: list["ChangeSet"], collection: str) -> "ChangeSet":
+        """Net effect of ``changes`` on ``collection``, applied in order.
+
+        Inserts and updates are both reported as updated.
+        """
+        upserted: dict[int, None] = {}
+        deleted: dict[int, None] = {}
+        for change in changes:
+            if change.collection != collection:
+                continue
+            for _id in change.upserted:
+                deleted.pop(_id, None)
+                upserted[_id] = None
+            for _id in change.deleted:
+                upserted.pop(_id, None)
+                deleted[_id] = None
+        return cls(collection=collection, updated=list(upserted), deleted=list(deleted))
+
+
+class PageQuery(BaseModel):
+    """One page of a listing, after ``cursor`` in ``sort`` order, with only ``fields``."""
+
+    model_config = ConfigDict(frozen=True)
+
+    limit: int = Field(100, ge=1, le=1000, description="Items per page")
+    cursor: Optional[str] = Field(
+        None, description="next_cursor of the previous page; None for the first"
+    )
+    sort: str = Field("id", description="Field to sort on; ties are broken by id")
+    descending: bool = Field(False, description="Sort from highest to lowest")
+    fields: Optional[tuple[str, ...]] = Field(
+        None, description="Fields to return, id always included; None for all"
+    )
+
+
+class Page(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor for the next page; None on the last page"
+    )
+
+
+class MatchupRequest(BaseModel):
+    """Attacker and defender rosters to evaluate against each other."""
+
+    attacker_ids: list[int] = Field(..., description="Ids of the attacking pets")
+    defender_ids: list[int] = Field(..., description="Ids of the defending pets")
+
+
+class MatchupResponse(BaseModel):
+    attacker_ids: list[int] = Field(..., description="Row order of the matrix")
+    defender_ids: list[int] = Field(..., description="Column order of the matrix")
+    effectiveness: list[list[float]] = Field(
+        ...,
+        description="Best type multiplier of each attacker against each defender, 0 if it has no abilities",
+    )
+
+
+class SimulationRequest(BaseModel):
+    """Two teams of one to three pet ids to fight each other many times."""
+
+    team_a: list[int] = Field(..., min_length=1, max_length=3)
+    team_b: list[int] = Field(..., min_length=1, max_length=3)
+    battles: int = Field(1000, ge=1, le=100_000, description="Battles to simulate")
+    seed: Optional[int] = Field(None, description="Seed for reproducible results")
+    max_rounds: int = Field(100, ge=1, le=1000, description="Rounds before a draw")
+
+
+class SimulationResponse(BaseModel):
+    battles: int
+    team_a_win_rate: float
+    team_b_win_rate: float
+    draw_rate: float
+    mean_rounds: float
+    team_a_rounds_to_win: dict[int, int] = Field(
+        ..., description="Battles team A won, by number of rounds"
+    )
+    team_b_rounds_to_win: dict[int, int] = Field(
+        ..., description="Battles team B won, by number of rounds"
+    )
+
+
+class TeamRecommendationRequest(BaseModel):
+    """Enemy to build a team against: up to three pet ids, or a single type."""
+
+    enemy_ids: Optional[list[int]] = Field(None, min_length=1, max_length=3)
+    enemy_type: Optional[PetType] = Field(None, description="Enemy pet type")
+    time_budget: float = Field(
+        2.0,
+        gt=0,
+        le=30,
+        description="Seconds to search before returning the best team so far",
+    )
+    tameable_only: bool = Field(False, description="Skip untameable pets")
+
+
+class TeamRecommendation(BaseModel):
+    pets: list[BattlePet]
+    score: float
+    candidates: int = Field(..., description="Pets left to search after pruning")
+    complete: bool = Field(
+        ..., description="False if the time budget ran out before the search finished"
+    )
+
+
+class SearchFilters(BaseModel):
+    """Structured filters applied inside a semantic search."""
+
+    model_config = ConfigDict(frozen=True)
+
+    type: Optional[PetType] = Field(None, description="Pet or ability type")
+    damaging: Optional[bool] = Field(
+        None, description="Abilities only: damaging or non-damaging"
+    )
+    min_cooldown: Optional[int] = Field(
+        None, ge=0, description="Abilities only: minimum cooldown in rounds"
+    )
+    max_cooldown: Optional[int] = Field(
+        None, ge=0, description="Abilities only: maximum cooldown in rounds"
+    )
+    untameable: Optional[bool] = Field(
+        None, description="Pets only: untameable or tameable"
+    )
+    source: Optional[str] = Field(
+        None, description="Pets only: source, e.g. 'Pet Battle' or 'Drop'"
+    )
+
+
+class SearchRequest(BaseModel):
+    query: str = Field(..., min_length=1, description="Free-text search query")
+    kind: Literal["pets", "abilities"] = Field(..., description="What to search")
+    k: int = Field(5, ge=1, le=100, description="Number of results")
+    filters: SearchFilters = Field(default_factory=SearchFilters)
+
+
+class SearchResponse(BaseModel):
+    query: str
+    kind: Literal["pets", "abilities"]
+    pets: list[BattlePet] = Field(default_factory=list)
+    abilities: list[Ability] = Field(default_factory=list)
@@ -0,0 +1,109 @@
+import base64
+import binascii
+import heapq
+import json
+from typing import Any, Iterable, Optional, TypeVar
+
+from pydantic import TypeAdapter, ValidationError
+
+from src.core.models import Ability, BattlePet, Page, PageQuery
+
+M = TypeVar("M", BattlePet, Ability)
+
+# Fields a listing can be sorted on; each has an index on (field, id) in Mongo.
+SORT_FIELDS = {
+    "battle_pets": ("id", "level", "health", "power", "speed", "popularity"),
+    "abilities": ("id", "popularity"),
+}
+MODELS = {"battle_pets": BattlePet, "abilities": Ability}
+
+
+def check_query(collection: str, query: PageQuery) -> None:
+    """Raise ValueError for a sort field or projected field the collection lacks."""
+    if query.sort not in SORT_FIELDS[collection]:
+        raise ValueError(
+            f"Cannot sort {collection} on {query.sort!r}; "
+            f"choose from {', '.join(SORT_FIELDS[collection])}"
+        )
+    unknown = set(query.fields or ()) - set(MODELS[collection].model_fields)
+    if unknown:
+        raise ValueError(f"Unknown {collection} fields: {sorted(unknown)}")
+    if query.cursor is not None:
+        value, _ = decode_cursor(query.cursor, query)
+        annotation = MODELS[collection].model_fields[query.sort].annotation
+        try:
+            TypeAdapter(annotation).validate_python(value, strict=True)
+        except ValidationError:
+            raise ValueError(f"Invalid cursor {query.cursor!r}") from None
+
+
+def encode_cursor(query: PageQuery, value: Any, _id: int) -> str:
+    """A cursor after ``value`` and ``_id``, valid only for the query's sort order."""
+    raw = json.dumps(
+        [query.sort, query.descending, value, _id], separators=(",", ":")
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, query: PageQuery) -> tuple[Any, int]:
+    """The sort value and id of the last item on the previous page.
+
+    Raises ValueError for a malformed cursor or one made for another sort
+    field or order.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, descending, value, _id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+    if not isinstance(_id, int) or isinstance(_id, bool):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if sort != query.sort or descending is not query.descending:
+        raise ValueError(
+            f"Cursor {cursor!r} belongs to another sort order; start from the first page"
+        )
+    return value, _id
+
+
+def returned_fields(query: PageQuery) -> Optional[set[str]]:
+    """Fields to read for a page: the requested ones plus what the cursor needs."""
+    if query.fields is None:
+        return None
+    return {"id", query.sort, *query.fields}
+
+
+def page_of(rows: list[dict[str, Any]], query: PageQuery) -> Page:
+    """Build a page from up to ``limit + 1`` rows in order; the extra row means more follow."""
+    more = len(rows) > query.limit
+    rows = rows[: query.limit]
+    next_cursor = (
+        encode_cursor(query, rows[-1][query.sort], rows[-1]["id"]) if more else None
+    )
+    if query.fields is not None and query.sort not in {"id", *query.fields}:
+        for row in rows:
+            row.pop(query.sort, None)
+    return Page(items=rows, next_cursor=next_cursor)
+
+
+def paginate(models: Iterable[M], query: PageQuery) -> Page:
+    """One page of ``models`` in process, ordered and cut exactly as Mongo would.
+
+    Only the page is sorted, not the whole collection.
+    """
+
+    def key(model: M) -> tuple:
+        return getattr(model, query.sort), model.id
+
+    if query.cursor is not None:
+        after = decode_cursor(query.cursor, query)
+        if query.descending:
+            models = (m for m in models if key(m) < after)
+        else:
+            models = (m for m in models if key(m) > after)
+    pick = heapq.nlargest if query.descending else heapq.nsmallest
+    include = returned_fields(query)
+    rows = [
+        m.model_dump(mode="json", include=include)
+        for m in pick(query.limit + 1, models, key=key)
+    ]
+    return page_of(rows, query)
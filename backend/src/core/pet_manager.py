@@ -1,39 +1,127 @@
 import asyncio
-import re
 from typing import Optional, Any, Coroutine
 
+import numpy as np
+
+from src.core.counter_index import CounterIndex, deals_damage
+from src.core.matchup import effectiveness_matrix, pair_effectiveness
+from src.core.simulation import SimulationResult, simulate
+from src.core.team_builder import (
+    TeamBuilder,
+    TeamSearchResult,
+    damaging_type_mask,
+    type_attack_mask,
+)
 from src.core.pet_type_chart import pet_type_matrix
 from src.repository.pet_data_handler import PetDataHandler
 from src.repository.interface.database import DbBase
-from src.core.models import BattlePet, PetType, Ability
+from src.core.models import (
+    BattlePet,
+    ChangeSet,
+    Page,
+    PageQuery,
+    PetType,
+    Ability,
+    SearchFilters,
+)
+from src.core.pagination import check_query
+from src.utils.inference_executor import InferenceExecutor
+from src.utils.settings import Settings
+from src.utils.single_flight import SingleFlight
+from src.core.search_batcher import SearchBatcher
 from src.core.semantic_search import SemanticSearch
 
-def find_types_strong_against(target_type: PetType) -> list[PetType]:
-    return [
-        pet_type
-        for pet_type, matchup in pet_type_matrix.items()
-        if target_type in matchup.get("strong_against", [])
-    ]
-
 
 async def is_damage_ability(ability: Ability) -> bool:
     """Check if an ability is a damaging ability."""
-    if ability.damage and ability.damage.strip().lower() != "0":
-        return True
-    #pattern = r"dealing\s+\d+\s+(" + "|".join([pt.value for pt in PetType]) + r")\s+damage"
-    pattern =         r"\b\d+\s+(" + "|".join([pt.value for pt in PetType]) + r")\s+damage\b"
-
-    desc_damage = re.search(pattern, ability.description, re.IGNORECASE)
-    if desc_damage:
-        print(f"✅✅✅ Description damage found in: {ability.name}")
-        return True
-    return False
+    return deals_damage(ability)
 
 
 class PetManager:
-    def __init__(self, db: Optional[DbBase] = None) -> None:
-        self.db = db or PetDataHandler()
-        self.sem_search = SemanticSearch(db=self.db)
+    def __init__(
+        self, db: Optional[DbBase] = None, settings: Optional[Settings] = None
+    ) -> None:
+        settings = settings or Settings.from_env()
+        self.db = db or PetDataHandler(settings=settings)
+        self.inference = InferenceExecutor(
+            settings.inference_workers, settings.inference_queue_depth
+        )
+        self.sem_search = SemanticSearch(
+            db=self.db, executor=self.inference, settings=settings
+        )
+        window = settings.search_batch_window_ms / 1000
+        self.pet_search_batcher = SearchBatcher(
+            self.sem_search.search_pets,
+            window,
+            settings.search_batch_max_size,
+            executor=self.inference,
+        )
+        self.ability_search_batcher = SearchBatcher(
+            self.sem_search.search_abilities,
+            window,
+            settings.search_batch_max_size,
+            executor=self.inference,
+        )
+        self._counter_index: Optional[CounterIndex] = None
+        self._counter_index_lock = asyncio.Lock()
+        self.team_builder = TeamBuilder()
+        self._index_syncs = SingleFlight()
+
+    async def dataset_version(self) -> Optional[str]:
+        try:
+            return await self.db.get_dataset_version()
+        except NotImplementedError:
+            return None
+
+    async def _changes_since(self, version: str) -> Optional[list[ChangeSet]]:
+        try:
+            return await self.db.get_changes_since(version)
+        except NotImplementedError:
+            return None
+
+    async def counter_index(self) -> CounterIndex:
+        """Return the counter tables, updating them when the dataset version moved."""
+        version = await self.dataset_version()
+        index = self._counter_index
+        if index is not None and (version is None or index.version == version):
+            return index
+        async with self._counter_index_lock:
+            index = self._counter_index
+            if index is None or (version is not None and index.version != version):
+                index = await self._next_counter_index(index, version or "")
+                self._counter_index = index
+        return index
+
+    async def _next_counter_index(
+        self, index: Optional[CounterIndex], version: str
+    ) -> CounterIndex:
+        """Re-file just the changed pets when the change log covers the gap.
+
+        A changed ability can move every pet that knows it, so any ability
+        change rebuilds the tables.
+        """
+        changes = await self._changes_since(index.version) if index else None
+        if changes is not None and ChangeSet.merge(changes, "abilities").empty:
+            pet_changes = ChangeSet.merge(changes, "battle_pets")
+            pets = await self.db.get_battle_pets_by_ids(pet_changes.upserted)
+            abilities_by_id = await self.abilities_for(pets)
+            return index.updated(pets, pet_changes.deleted, abilities_by_id, version)
+        pets = await self.db.get_all_battle_pets()
+        abilities = await self.db.get_all_abilities()
+        return CounterIndex.build(pets, abilities, version)
+
+    async def sync_search_index(self) -> None:
+        """Re-sync the search indexes in the background once the dataset version moved.
+
+        Searches keep using the current indexes meanwhile; only changed
+        documents are re-read and re-encoded.
+        """
+        synced = self.sem_search.dataset_version
+        if synced is None:
+            return
+        version = await self.dataset_version()
+        if version is not None and version != synced:
+            self._index_syncs.start("search_index", self.sem_search.sync)
 
     async def list_battle_pets(self) -> list[BattlePet]:
         """List all battle pets in the database."""
@@ -43,6 +131,16 @@ class PetManager:
         """List all abilities in the database."""
         return await self.db.get_all_abilities()
 
+    async def battle_pets_page(self, query: PageQuery) -> Page:
+        """One page of battle pets; raises ValueError for a bad sort, field or cursor."""
+        check_query("battle_pets", query)
+        return await self.db.get_battle_pets_page(query)
+
+    async def abilities_page(self, query: PageQuery) -> Page:
+        """One page of abilities; raises ValueError for a bad sort, field or cursor."""
+        check_query("abilities", query)
+        return await self.db.get_abilities_page(query)
+
     async def find_pets_with_ability_type(
         self, ability_type: PetType
     ) -> list[BattlePet]:
@@ -80,88 +178,142 @@ class PetManager:
         self, attack: Ability, defender: PetType
     ) -> bool:
         """Check if an ability is effective against a specific pet type."""
-        # Get the type of the ability
-        ability_type = await self.db.get_ability(attack.id)
-        if not ability_type:
-            return False
-
-        # Check the pet type matrix
-        if defender in pet_type_matrix[ability_type.type]["strong_against"]:
-            return True
-        return False
+        return defender in pet_type_matrix[attack.type]["strong_against"]
+
+    async def pets_by_ids(self, ids: list[int]) -> list[BattlePet]:
+        """Fetch pets in one bulk call, in the order given, repeats included."""
+        pets = {pet.id: pet for pet in await self.db.get_battle_pets_by_ids(ids)}
+        for _id in ids:
+            if _id not in pets:
+                raise ValueError(f"Battle pet with id {_id} not found")
+        return [pets[_id] for _id in ids]
+
+    async def abilities_for(self, pets: list[BattlePet]) -> dict[int, Ability]:
+        """Fetch every ability the given pets use in one bulk call, keyed by id."""
+        ids = sorted({_id for pet in pets for _id in pet.abilities if _id >= 0})
+        if not ids:
+            return {}
+        abilities = await self.db.get_abilities_by_ids(ids)
+        return {ability.id: ability for ability in abilities}
+
+    async def matchup_matrix(
+        self, attackers: list[BattlePet], defenders: list[BattlePet]
+    ) -> np.ndarray:
+        """Best type multiplier of every attacker against every defender."""
+        abilities_by_id = await self.abilities_for(attackers)
+        return effectiveness_matrix(attackers, defenders, abilities_by_id)
+
+    async def matchup_pairs(
+        self, pairs: list[tuple[BattlePet, BattlePet]]
+    ) -> np.ndarray:
+        """Best type multiplier for each (attacker, defender) pair."""
+        abilities_by_id = await self.abilities_for([attacker for attacker, _ in pairs])
+        return pair_effectiveness(pairs, abilities_by_id)
 
     async def attacker_is_effective_against(
         self, attacker: BattlePet, defender: BattlePet
     ) -> bool:
         """Check if an attack from one pet is effective against another."""
-        for ability_id in attacker.abilities:
-            ability = await self.db.get_ability(ability_id)
-            if ability and await self.ability_is_effective_against(
-                ability, defender.type
-            ):
-                return True
-        return False
+        matrix = await self.matchup_matrix([attacker], [defender])
+        return bool(matrix[0, 0] > 1.0)
 
     async def list_pets_strong_against(self, target_type: PetType) -> list[BattlePet]:
         """List pets that have at least one damaging ability that is strong against the given type."""
-        # Step 1: Get ability types strong against the target type
-        strong_ability_types = find_types_strong_against(target_type)
-
-        # Step 2: Fetch abilities of those types
-        abilities = []
-        for ability_type in strong_ability_types:
-            abilities.extend(await self.db.get_ability_by_type(ability_type))
-
-        # Step 3: Filter for damaging abilities
-        damaging_abilities = []
-
-        for ability in abilities:
-            if await is_damage_ability(ability):
-                print(f"✅ Included: {ability.name} (damage = {ability.damage})")
-                damaging_abilities.append(ability)
-            else:
-                print(f"❌ Skipped: {ability.name} (damage = {ability.damage})")
-
-        # Step 4: Collect their IDs
-        damaging_ability_ids = {ability.id for ability in damaging_abilities}
-
-        # Step 5: Get all pets
-        all_pets = await self.db.get_all_battle_pets()
-
-        # Step 6: Filter pets that use at least one damaging strong ability
-        matching_pets = [
-            pet
-            for pet in all_pets
-            if any(ability_id in damaging_ability_ids for ability_id in pet.abilities)
-        ]
-
-        return matching_pets
+        index = await self.counter_index()
+        return index.pets(index.strong[target_type])
 
     async def list_pets_defensive_against(
         self, attack_type: PetType
     ) -> list[BattlePet]:
         """List all pets that are defensively strong (resistant to) a specific attack type."""
-        resistant_types = pet_type_matrix.get(attack_type, {}).get("weak_against", [])
-        pets = []
-        for pet_type in resistant_types:
-            pets.extend(await self.db.get_battle_pet_by_type(pet_type))
-        return pets
+        index = await self.counter_index()
+        return index.pets(index.defensive[attack_type])
 
     async def double_tappers(self, type_to_counter: PetType) -> list[BattlePet]:
         """List all pets that are double-tappers (strong against Aquatic and defensive against Flying)."""
-        list_pets_strong_against = await self.list_pets_strong_against(type_to_counter)
-        list_pets_defensive_against = await self.list_pets_defensive_against(
-            type_to_counter
+        index = await self.counter_index()
+        return index.pets(index.double[type_to_counter])
+
+    async def simulate_battle(
+        self,
+        team_a_ids: list[int],
+        team_b_ids: list[int],
+        battles: int = 1000,
+        seed: Optional[int] = None,
+        max_rounds: int = 100,
+    ) -> SimulationResult:
+        """Monte Carlo simulate a 1v1 up to 3v3 battle between two teams of pet ids."""
+        pets = await self.pets_by_ids(team_a_ids + team_b_ids)
+        team_a, team_b = pets[: len(team_a_ids)], pets[len(team_a_ids) :]
+        abilities_by_id = await self.abilities_for(team_a + team_b)
+        return await asyncio.to_thread(
+            simulate, team_a, team_b, abilities_by_id, battles, seed, max_rounds
+        )
+
+    async def recommend_team(
+        self,
+        enemy_ids: Optional[list[int]] = None,
+        enemy_type: Optional[PetType] = None,
+        time_budget: float = 2.0,
+        tameable_only: bool = False,
+    ) -> TeamSearchResult:
+        """Search for the best three-pet team against an enemy team or a single type."""
+        candidates = await self.db.get_all_battle_pets()
+        if tameable_only:
+            candidates = [pet for pet in candidates if not pet.is_untameable]
+        if enemy_ids:
+            enemies = await self.pets_by_ids(enemy_ids)
+            abilities_by_id = await self.abilities_for(candidates + enemies)
+            enemy_types = [enemy.type for enemy in enemies]
+            attack_masks = damaging_type_mask(enemies, abilities_by_id)
+        elif enemy_type is not None:
+            abilities_by_id = await self.abilities_for(candidates)
+            enemy_types = [enemy_type]
+            attack_masks = type_attack_mask(enemy_type)
+        else:
+            raise ValueError("Give enemy pet ids or an enemy type")
+        return await self.team_builder.recommend(
+            candidates, abilities_by_id, enemy_types, attack_masks, time_budget
         )
-        return list(set(list_pets_strong_against) & set(list_pets_defensive_against))
 
     async def sem_search_abilities(
-        self, query: str, k: int = 5
+        self, query: str, k: int = 5, filters: Optional[SearchFilters] = None
     ) -> list[Ability]:
-        ids, weights = self.sem_search.search_ability(query, k=k)
-        ids = list(map(int, ids))
-        return await self.db.get_abilities_by_ids(ids)
-
+        await self.sync_search_index()
+        ids, weights = await self.ability_search_batcher.search(query, k, filters)
+        # FAISS pads with -1 when the index holds fewer than k documents.
+        ids = [int(_id) for _id in ids if _id >= 0]
+        abilities = {a.id: a for a in await self.db.get_abilities_by_ids(ids)}
+        return [abilities[_id] for _id in ids if _id in abilities]
+
+    async def sem_search_pets(
+        self, query: str, k: int = 5, filters: Optional[SearchFilters] = None
+    ) -> list[BattlePet]:
+        await self.sync_search_index()
+        ids, weights = await self.pet_search_batcher.search(query, k, filters)
+        ids = [int(_id) for _id in ids if _id >= 0]
+        pets = {p.id: p for p in await self.db.get_battle_pets_by_ids(ids)}
+        return [pets[_id] for _id in ids if _id in pets]
+
+    def search_metrics(self) -> dict[str, dict[str, float]]:
+        return {
+            "pet_search_batching": self.pet_search_batcher.metrics.as_dict(),
+            "ability_search_batching": self.ability_search_batcher.metrics.as_dict(),
+            "inference_executor": self.inference.metrics(),
+            **self.sem_search.cache_metrics(),
+        }
+
+    async def add_battle_pet(self, pet: BattlePet) -> None:
+        """Store a pet and re-encode just that pet for search."""
+        await self.db.add_battle_pet(pet)
+        if self.sem_search.battle_pet_index is not None:
+            await self.inference.run(self.sem_search.upsert_battle_pets, [pet])
+
+    async def add_ability(self, ability: Ability) -> None:
+        """Store an ability and re-encode just that ability for search."""
+        await self.db.add_ability(ability)
+        if self.sem_search.ability_index is not None:
+            await self.inference.run(self.sem_search.upsert_abilities, [ability])
 
 
 # test
@@ -173,5 +325,6 @@ async def main():
     response = await manager.sem_search_abilities(ability_query)
     print(response)
 
+
 if __name__ == "__main__":
     asyncio.run(main())
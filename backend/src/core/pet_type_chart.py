@@ -42,3 +42,11 @@ pet_type_matrix = {
         "weak_against": [PetType.AQUATIC],
     },
 }
+
+
+def find_types_strong_against(target_type: PetType) -> list[PetType]:
+    return [
+        pet_type
+        for pet_type, matchup in pet_type_matrix.items()
+        if target_type in matchup.get("strong_against", [])
+    ]
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+
+from src.core.models import SearchFilters
+from src.utils.inference_executor import InferenceExecutor
+
+logger = logging.getLogger(__name__)
+
+BatchSearch = Callable[
+    [list[str], int, Optional[SearchFilters]], tuple[np.ndarray, np.ndarray]
+]
+
+
+@dataclass
+class BatchMetrics:
+    batches: int = 0
+    queries: int = 0
+    max_batch_size: int = 0
+    total_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+
+    def record(self, batch_size: int, queue_waits: list[float]) -> None:
+        self.batches += 1
+        self.queries += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.total_queue_wait += sum(queue_waits)
+        self.max_queue_wait = max(self.max_queue_wait, *queue_waits)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "mean_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "mean_queue_wait_ms": 1000 * self.total_queue_wait / self.queries
+            if self.queries
+            else 0.0,
+            "max_queue_wait_ms": 1000 * self.max_queue_wait,
+        }
+
+
+@dataclass
+class _Pending:
+    query: str
+    k: int
+    filters: Optional[SearchFilters]
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class SearchBatcher:
+    """Collects concurrent queries and answers them with one batched search.
+
+    A batch is sent when ``max_batch_size`` queries are waiting or ``window``
+    seconds after the first one arrived, whichever comes first. ``search``
+    is a blocking batch search such as ``SemanticSearch.search_abilities``;
+    it runs on ``executor`` (or a plain worker thread) so the event loop
+    keeps serving requests. Queries with different filters share a batch
+    but are searched in one call per distinct filter.
+    """
+
+    def __init__(
+        self,
+        search: BatchSearch,
+        window: float = 0.005,
+        max_batch_size: int = 32,
+        executor: Optional[InferenceExecutor] = None,
+    ) -> None:
+        self._search = search
+        self._executor = executor
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.metrics = BatchMetrics()
+        self._pending: list[_Pending] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks.
+        self._running: set[asyncio.Task] = set()
+
+    async def search(
+        self, query: str, k: int = 5, filters: Optional[SearchFilters] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) for one query, batched with any concurrent ones."""
+        loop = asyncio.get_running_loop()
+        pending = _Pending(query, k, filters, loop.create_future())
+        self._pending.append(pending)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await pending.future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            started = time.perf_counter()
+            self.metrics.record(len(batch), [started - p.enqueued for p in batch])
+            groups: dict[Optional[SearchFilters], list[_Pending]] = {}
+            for pending in batch:
+                groups.setdefault(pending.filters, []).append(pending)
+            for filters, group in groups.items():
+                task = asyncio.ensure_future(self._run(group, filters))
+                self._running.add(task)
+                task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Search batch failed", exc_info=task.exception())
+
+    async def _run(
+        self, batch: list[_Pending], filters: Optional[SearchFilters]
+    ) -> None:
+        k = max(p.k for p in batch)
+        try:
+            queries = [p.query for p in batch]
+            if self._executor is not None:
+                ids, scores = await self._executor.run(
+                    self._search, queries, k, filters
+                )
+            else:
+                ids, scores = await asyncio.to_thread(self._search, queries, k, filters)
+            for row, p in enumerate(batch):
+                if not p.future.done():
+                    p.future.set_result((ids[row, : p.k], scores[row, : p.k]))
+        except Exception as e:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
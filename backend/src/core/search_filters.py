@@ -0,0 +1,108 @@
+from typing import Generic, Optional, TypeVar
+
+import numpy as np
+
+from src.core.counter_index import deals_damage
+from src.core.matchup import TYPE_INDEX
+from src.core.models import Ability, BattlePet, SearchFilters
+from src.core.simulation import cooldown_rounds
+
+M = TypeVar("M", Ability, BattlePet)
+
+ABILITY_ONLY_FILTERS = ("damaging", "min_cooldown", "max_cooldown")
+PET_ONLY_FILTERS = ("untameable", "source")
+
+
+class MetadataTable(Generic[M]):
+    """Filterable fields of every indexed document, as column arrays.
+
+    Rows are kept by id so upserts and removals are cheap; the columns are
+    rebuilt on the next query after a change.
+    """
+
+    fields: tuple[str, ...] = ()
+
+    def __init__(self, documents: list[M] = ()) -> None:
+        self._rows: dict[int, tuple] = {}
+        self._columns: Optional[dict[str, np.ndarray]] = None
+        self.upsert(documents)
+
+    def _row(self, document: M) -> tuple:
+        raise NotImplementedError
+
+    def _mask(self, columns: dict[str, np.ndarray], filters: SearchFilters):
+        raise NotImplementedError
+
+    def upsert(self, documents: list[M]) -> None:
+        for document in documents:
+            self._rows[document.id] = self._row(document)
+        self._columns = None
+
+    def remove(self, ids: list[int]) -> None:
+        for _id in ids:
+            self._rows.pop(_id, None)
+        self._columns = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def columns(self) -> dict[str, np.ndarray]:
+        columns = self._columns
+        if columns is None:
+            rows = list(self._rows.values())
+            columns = {"id": np.fromiter(self._rows, dtype=np.int64, count=len(rows))}
+            for position, field in enumerate(self.fields):
+                columns[field] = np.array([row[position] for row in rows])
+            self._columns = columns
+        return columns
+
+    def matching_ids(self, filters: SearchFilters) -> np.ndarray:
+        """Sorted ids of the documents passing every set filter."""
+        columns = self.columns()
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        if filters.type is not None:
+            mask &= columns["type"] == TYPE_INDEX[filters.type]
+        mask &= self._mask(columns, filters)
+        return np.sort(columns["id"][mask])
+
+
+class AbilityMetadata(MetadataTable[Ability]):
+    fields = ("type", "damaging", "cooldown")
+
+    def _row(self, ability: Ability) -> tuple:
+        return TYPE_INDEX[ability.type], deals_damage(ability), cooldown_rounds(ability)
+
+    def _mask(self, columns: dict[str, np.ndarray], filters: SearchFilters):
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        if filters.damaging is not None:
+            mask &= columns["damaging"] == filters.damaging
+        if filters.min_cooldown is not None:
+            mask &= columns["cooldown"] >= filters.min_cooldown
+        if filters.max_cooldown is not None:
+            mask &= columns["cooldown"] <= filters.max_cooldown
+        return mask
+
+
+class PetMetadata(MetadataTable[BattlePet]):
+    fields = ("type", "untameable", "source")
+
+    def _row(self, pet: BattlePet) -> tuple:
+        return TYPE_INDEX[pet.type], pet.is_untameable, pet.source.casefold()
+
+    def _mask(self, columns: dict[str, np.ndarray], filters: SearchFilters):
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        if filters.untameable is not None:
+            mask &= columns["untameable"] == filters.untameable
+        if filters.source is not None:
+            mask &= columns["source"] == filters.source.casefold()
+        return mask
+
+
+def is_unfiltered(filters: Optional[SearchFilters]) -> bool:
+    return filters is None or filters == SearchFilters()
+
+
+def unsupported_filters(filters: SearchFilters, kind: str) -> list[str]:
+    """Names of set filters that do not apply to ``kind`` ("pets" or "abilities")."""
+    other = ABILITY_ONLY_FILTERS if kind == "pets" else PET_ONLY_FILTERS
+    return [name for name in other if getattr(filters, name) is not None]
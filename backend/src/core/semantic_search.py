@@ -1,51 +1,426 @@
-from typing import Optional
-from sentence_transformers import SentenceTransformer
-import faiss
+import contextlib
+import functools
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 import numpy as np
+from src.core.models import Ability, BattlePet, ChangeSet, SearchFilters
+from src.core.query_cache import QueryCache, normalize_query
+from src.core.search_filters import (
+    AbilityMetadata,
+    MetadataTable,
+    PetMetadata,
+    is_unfiltered,
+)
+from src.repository.clients import get_clients
 from src.repository.interface.database import DbBase
 from src.repository.pet_data_handler import PetDataHandler
+from src.utils.inference_executor import InferenceExecutor
+from src.utils.readiness import NotReady
+from src.utils.settings import Settings
+
+# faiss, torch and sentence-transformers take seconds to import; they are
+# loaded on first use so the app can start serving before they are needed.
+if TYPE_CHECKING:
+    from src.core.vector_index import DocumentIndex, IndexConfig
+
+logger = logging.getLogger(__name__)
+
+
+def load_sentence_transformer(model_name: str):
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name)
+
 
 def normalize(vectors):
     return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
 
 
 class SemanticSearch:
-    def __init__(self, db: Optional[DbBase] = None, model_name="all-mpnet-base-v2") -> None:
-        self.battle_pet_index = None
-        self.ability_index = None
+    def __init__(
+        self,
+        db: Optional[DbBase] = None,
+        model_name="all-mpnet-base-v2",
+        index_dir: Optional[Path] = None,
+        executor: Optional[InferenceExecutor] = None,
+        settings: Optional[Settings] = None,
+    ) -> None:
+        settings = settings or Settings.from_env()
+        self.battle_pet_index: Optional["DocumentIndex"] = None
+        self.ability_index: Optional["DocumentIndex"] = None
+        self.battle_pet_metadata = PetMetadata()
+        self.ability_metadata = AbilityMetadata()
+        # Dataset version the indexes were last synced at; None until the first sync.
+        self.dataset_version: Optional[str] = None
         self.db = db or PetDataHandler()
-        self.model = SentenceTransformer(model_name)
-        self.battle_pet_embeddings = None
-        self.ability_embeddings = None
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.index_dir = index_dir or settings.index_dir
+        self.executor = executor or InferenceExecutor()
+        self.settings = settings
+        self.shared_index = settings.search_shared_index
+        self._stamps: dict[str, Optional[tuple[int, int]]] = {}
+        # Query embeddings depend only on the model; results also on the index
+        # version, which is part of their key.
+        self.embedding_cache: QueryCache[np.ndarray] = QueryCache(
+            settings.search_cache_size, settings.search_cache_ttl_seconds
+        )
+        self.result_cache: QueryCache[tuple[np.ndarray, np.ndarray]] = QueryCache(
+            settings.search_cache_size, settings.search_cache_ttl_seconds
+        )
+        self.shared_cache = None
+        if settings.search_cache_shared:
+            self.shared_cache = get_clients().sync_redis
+        self.shared_cache_ttl = int(settings.search_cache_ttl_seconds)
+
+    def load_model(self):
+        """Load the sentence transformer once, from whichever thread needs it first."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None and self.settings.inference_socket:
+                    from src.core.inference_sidecar import SidecarEncoder
+
+                    logger.info(f"Encoding via {self.settings.inference_socket}")
+                    self._model = SidecarEncoder(self.settings.inference_socket)
+                elif self._model is None:
+                    logger.info(f"Loading model {self.model_name}")
+                    self._model = load_sentence_transformer(self.model_name)
+        return self._model
+
+    @property
+    def model(self):
+        return self.load_model()
+
+    @property
+    def ready(self) -> bool:
+        return self.battle_pet_index is not None and self.ability_index is not None
+
+    @functools.cached_property
+    def index_config(self) -> "IndexConfig":
+        from src.core.vector_index import IndexConfig
+
+        return IndexConfig(
+            index_type=self.settings.search_index_type,
+            hnsw_m=self.settings.search_hnsw_m,
+            hnsw_ef_search=self.settings.search_hnsw_ef_search,
+            ivf_nprobe=self.settings.search_ivf_nprobe,
+            pq_m=self.settings.search_pq_m,
+        )
+
+    def _path(self, kind: str) -> Path:
+        model_key = hashlib.sha256(self.model_name.encode("utf-8")).hexdigest()[:16]
+        return self.index_dir / f"{kind}-{model_key}-{self.index_config.index_type}"
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        return normalize(self.model.encode(texts)).astype(np.float32)
+
+    @contextlib.contextmanager
+    def _index_lock(self, exclusive: bool):
+        """In shared mode, one writer or many readers of the index files across processes."""
+        if not self.shared_index:
+            yield
+            return
+        import fcntl  # Unix only, like the shared mode itself
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.index_dir / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stamp(self, kind: str) -> Optional[tuple[int, int]]:
+        """Identity of the stored files; every save replaces them with new inodes."""
+        try:
+            stat = os.stat(self._path(kind).with_suffix(".json"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _map(
+        self, kind: str, index: Optional["DocumentIndex"]
+    ) -> Optional["DocumentIndex"]:
+        """Swap ``index`` for a read-only mapping of its stored file, shared with other workers."""
+        from src.core.vector_index import DocumentIndex
+
+        self._stamps[kind] = self._stamp(kind)
+        mapped = DocumentIndex.load(self._path(kind), self.index_config, mapped=True)
+        return mapped or index
+
+    def _apply(
+        self,
+        kind: str,
+        index: Optional["DocumentIndex"],
+        changed: dict[int, str],
+        removed: list[int],
+    ) -> Optional["DocumentIndex"]:
+        """Re-encode ``changed``, drop ``removed`` and persist, if there is anything to do."""
+        from src.core.vector_index import DocumentIndex
+
+        if changed:
+            logger.info(f"Encoding {len(changed)} changed {kind} documents")
+            vectors = self._encode(list(changed.values()))
+            index = index or DocumentIndex.create(self.index_config, vectors)
+            index.upsert(changed, vectors)
+        if removed and index is not None:
+            index.remove(removed)
+        if index is not None and (changed or removed):
+            index.save(self._path(kind))
+        if self.shared_index:
+            return self._map(kind, index)
+        return index
 
+    def _update(
+        self,
+        kind: str,
+        index: Optional["DocumentIndex"],
+        changed: dict[int, str],
+        removed: list[int],
+    ) -> Optional["DocumentIndex"]:
+        """``_apply`` under the writer lock, on top of any other worker's changes."""
+        from src.core.vector_index import DocumentIndex
 
+        if not changed and not removed:
+            return index
+        with self._index_lock(exclusive=True):
+            if self.shared_index:
+                stored = DocumentIndex.load(self._path(kind), self.index_config)
+                index = stored or index
+            return self._apply(kind, index, changed, removed)
+
+    def _refresh(
+        self, kind: str, index: Optional["DocumentIndex"]
+    ) -> Optional["DocumentIndex"]:
+        """In shared mode, remap ``kind`` if another worker saved a newer index."""
+        if not self.shared_index or index is None:
+            return index
+        if self._stamp(kind) == self._stamps.get(kind):
+            return index
+        with self._index_lock(exclusive=False):
+            return self._map(kind, index)
+
+    def _sync(self, kind: str, documents: dict[int, str]) -> Optional["DocumentIndex"]:
+        """Bring the stored index for ``kind`` in line with ``documents``, re-encoding only changes.
+
+        In shared mode the first worker to start does the work; the others
+        find nothing changed and just map the stored file.
+        """
+        from src.core.vector_index import DocumentIndex
+
+        with self._index_lock(exclusive=True):
+            index = DocumentIndex.load(self._path(kind), self.index_config)
+            if index is None:
+                return self._apply(kind, None, documents, [])
+            changed, removed = index.changes(documents)
+            return self._apply(kind, index, changed, removed)
 
     async def set_embeddings(self):
+        # Read the version first: a write during the sync leaves it behind,
+        # so the next check syncs again.
+        try:
+            version = await self.db.get_dataset_version()
+        except NotImplementedError:
+            version = ""
         all_battle_pets = await self.db.get_all_battle_pets()
-        battle_pets_texts = [str(pet) for pet in all_battle_pets]
-        self.battle_pet_embeddings = self.model.encode(battle_pets_texts)
-        self.battle_pet_embeddings = normalize(self.battle_pet_embeddings)
-        self.battle_pet_index = faiss.IndexFlatIP(self.battle_pet_embeddings.shape[1])
-        self.battle_pet_index.add(self.battle_pet_embeddings)
+        self.battle_pet_metadata = PetMetadata(all_battle_pets)
+        self.battle_pet_index = await self.executor.run(
+            self._sync, "battle_pets", {pet.id: str(pet) for pet in all_battle_pets}
+        )
 
         all_abilities = await self.db.get_all_abilities()
-        ability_texts = [str(ability) for ability in all_abilities]
-        self.ability_embeddings = self.model.encode(ability_texts)
-        self.ability_embeddings = normalize(self.ability_embeddings)
-        self.ability_index = faiss.IndexFlatIP(self.ability_embeddings.shape[1])
-        self.ability_index.add(self.ability_embeddings)
-
-
-    def search_pet(self, search_query: str, k=5):
-        """Search for the top k most similar documents to the query."""
-        query_vector = self.model.encode([search_query])
-        D, I = self.battle_pet_index.search(query_vector, k)
-        return I[0], D[0]  # Return indices and distances
-
-    def search_ability(self, search_query: str, k=5):
-        """Search for the top k most similar documents to the query."""
-        query_vector = normalize(self.model.encode([search_query]))
-        D, I = self.ability_index.search(query_vector, k)
+        self.ability_metadata = AbilityMetadata(all_abilities)
+        self.ability_index = await self.executor.run(
+            self._sync,
+            "abilities",
+            {ability.id: str(ability) for ability in all_abilities},
+        )
+        self.dataset_version = version
+
+    async def sync(self) -> None:
+        """Catch the indexes up with the dataset.
+
+        Applies just the logged changes since the last sync when the
+        database can list them; otherwise re-reads everything.
+        """
+        changes = None
+        if self.dataset_version is not None:
+            try:
+                version = await self.db.get_dataset_version()
+                changes = await self.db.get_changes_since(self.dataset_version)
+            except NotImplementedError:
+                changes = None
+        if changes is None:
+            await self.set_embeddings()
+            return
+        pets = ChangeSet.merge(changes, "battle_pets")
+        if pets.upserted:
+            upserted = await self.db.get_battle_pets_by_ids(pets.upserted)
+            await self.executor.run(self.upsert_battle_pets, upserted)
+        if pets.deleted:
+            await self.executor.run(self.remove_battle_pets, pets.deleted)
+        abilities = ChangeSet.merge(changes, "abilities")
+        if abilities.upserted:
+            upserted = await self.db.get_abilities_by_ids(abilities.upserted)
+            await self.executor.run(self.upsert_abilities, upserted)
+        if abilities.deleted:
+            await self.executor.run(self.remove_abilities, abilities.deleted)
+        self.dataset_version = version
+
+    def upsert_battle_pets(self, pets: list[BattlePet]) -> None:
+        """Re-encode only the given pets whose text changed."""
+        index = self.battle_pet_index
+        documents = {pet.id: str(pet) for pet in pets}
+        changed = index.changes(documents)[0] if index else documents
+        self.battle_pet_metadata.upsert(pets)
+        self.battle_pet_index = self._update("battle_pets", index, changed, [])
+
+    def upsert_abilities(self, abilities: list[Ability]) -> None:
+        """Re-encode only the given abilities whose text changed."""
+        index = self.ability_index
+        documents = {ability.id: str(ability) for ability in abilities}
+        changed = index.changes(documents)[0] if index else documents
+        self.ability_metadata.upsert(abilities)
+        self.ability_index = self._update("abilities", index, changed, [])
+
+    def remove_battle_pets(self, ids: list[int]) -> None:
+        self.battle_pet_metadata.remove(ids)
+        self.battle_pet_index = self._update(
+            "battle_pets", self.battle_pet_index, {}, ids
+        )
+
+    def remove_abilities(self, ids: list[int]) -> None:
+        self.ability_metadata.remove(ids)
+        self.ability_index = self._update("abilities", self.ability_index, {}, ids)
+
+    def _shared_key(self, query: str) -> str:
+        from src.core.vector_index import text_hash
+
+        model_key = hashlib.sha256(self.model_name.encode("utf-8")).hexdigest()[:16]
+        return f"query_embedding:{model_key}:{text_hash(query)}"
+
+    def _query_vectors(self, queries: list[str]) -> np.ndarray:
+        """Normalized embeddings for normalized queries, encoding only cache misses."""
+        vectors: dict[str, np.ndarray] = {}
+        for query in queries:
+            cached = self.embedding_cache.get(query)
+            if cached is not None:
+                vectors[query] = cached
+        missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+        if missing and self.shared_cache is not None:
+            shared = self.shared_cache.mget([self._shared_key(q) for q in missing])
+            for query, raw in zip(missing, shared):
+                if raw is not None:
+                    vectors[query] = np.frombuffer(raw, dtype=np.float32)
+                    self.embedding_cache.set(query, vectors[query])
+            missing = [q for q in missing if q not in vectors]
+        if missing:
+            encoded = normalize(self.model.encode(missing)).astype(np.float32)
+            for query, vector in zip(missing, encoded):
+                vectors[query] = vector
+                self.embedding_cache.set(query, vector)
+            if self.shared_cache is not None:
+                with self.shared_cache.pipeline(transaction=False) as pipe:
+                    for query, vector in zip(missing, encoded):
+                        pipe.set(
+                            self._shared_key(query),
+                            vector.tobytes(),
+                            ex=self.shared_cache_ttl,
+                        )
+                    pipe.execute()
+        return np.stack([vectors[q] for q in queries])
+
+    def _search(
+        self,
+        kind: str,
+        index: Optional["DocumentIndex"],
+        metadata: MetadataTable,
+        search_queries: list[str],
+        k,
+        filters: Optional[SearchFilters] = None,
+    ):
+        """Batched search answering repeated (query, k, filters) from the result cache.
+
+        Filters become an id allow-list that FAISS applies while searching,
+        so filtered rows still hold k hits when k documents match.
+        """
+        if index is None:
+            raise NotReady(f"The {kind} search index is still loading")
+        if is_unfiltered(filters):
+            filters = None
+        queries = [normalize_query(q) for q in search_queries]
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.zeros((len(queries), k), dtype=np.float32)
+        missing_rows = []
+        for row, query in enumerate(queries):
+            cached = self.result_cache.get((kind, index.version, query, k, filters))
+            if cached is None:
+                missing_rows.append(row)
+            else:
+                ids[row], scores[row] = cached
+        if missing_rows:
+            vectors = self._query_vectors([queries[row] for row in missing_rows])
+            allowed = None if filters is None else metadata.matching_ids(filters)
+            D, I = index.search(vectors, k, allowed)
+            ids[missing_rows], scores[missing_rows] = I, D
+            for row, found, found_scores in zip(missing_rows, I, D):
+                self.result_cache.set(
+                    (kind, index.version, queries[row], k, filters),
+                    (found, found_scores),
+                )
+        return ids, scores
+
+    def search_pets(
+        self, search_queries: list[str], k=5, filters: Optional[SearchFilters] = None
+    ):
+        """Batched pet search: (ids, scores) arrays with one row per query."""
+        self.battle_pet_index = self._refresh("battle_pets", self.battle_pet_index)
+        return self._search(
+            "battle_pets",
+            self.battle_pet_index,
+            self.battle_pet_metadata,
+            search_queries,
+            k,
+            filters,
+        )
+
+    def search_abilities(
+        self, search_queries: list[str], k=5, filters: Optional[SearchFilters] = None
+    ):
+        """Batched ability search: (ids, scores) arrays with one row per query."""
+        self.ability_index = self._refresh("abilities", self.ability_index)
+        return self._search(
+            "abilities",
+            self.ability_index,
+            self.ability_metadata,
+            search_queries,
+            k,
+            filters,
+        )
+
+    def cache_metrics(self) -> dict[str, dict[str, float]]:
+        return {
+            "query_embedding_cache": self.embedding_cache.metrics(),
+            "search_result_cache": self.result_cache.metrics(),
+        }
+
+    def search_pet(
+        self, search_query: str, k=5, filters: Optional[SearchFilters] = None
+    ):
+        """Search for the top k most similar pets; returns pet ids and scores."""
+        I, D = self.search_pets([search_query], k, filters)
+        return I[0], D[0]
+
+    def search_ability(
+        self, search_query: str, k=5, filters: Optional[SearchFilters] = None
+    ):
+        """Search for the top k most similar abilities; returns ability ids and scores."""
+        I, D = self.search_abilities([search_query], k, filters)
         return I[0], D[0]
 
 
@@ -0,0 +1,204 @@
+"""Vectorized Monte Carlo pet battle simulation.
+
+Every simulated battle is one row of the state arrays, and each round is
+resolved for all rows at once. The model is deliberately simple:
+
+- damage per hit is ``base * (1 + power / 20) * type multiplier``
+- each round, the active pet uses the ready ability with the best expected damage
+- the faster active pet acts first (ties are a coin flip per battle and round)
+- a missed accuracy roll deals no damage but still starts the cooldown
+- when the active pet dies, the next living pet in team order comes in
+
+Healing, damage over time, buffs and pet family passives are not modelled.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+import numpy as np
+
+from src.core.matchup import TYPE_ADVANTAGE, TYPE_INDEX
+from src.core.models import Ability, BattlePet, PetType
+
+ABILITY_SLOTS = 6
+DRAW = -1
+
+_NUMBER = re.compile(r"\d+")
+_DESCRIPTION_DAMAGE = re.compile(
+    r"\b(\d+)\s+(?:" + "|".join([pt.value for pt in PetType]) + r")\s+damage\b",
+    re.IGNORECASE,
+)
+
+
+def _first_number(value: str) -> Optional[int]:
+    match = _NUMBER.search(value or "")
+    return int(match.group()) if match else None
+
+
+def base_damage(ability: Ability) -> int:
+    """Damage column, or the first "<n> <Type> damage" in the description."""
+    damage = _first_number(ability.damage)
+    if damage is not None:
+        return damage
+    match = _DESCRIPTION_DAMAGE.search(ability.description)
+    return int(match.group(1)) if match else 0
+
+
+def cooldown_rounds(ability: Ability) -> int:
+    return _first_number(ability.cooldown) or 0
+
+
+def hit_chance(ability: Ability) -> float:
+    accuracy = _first_number(ability.accuracy)
+    return 1.0 if accuracy is None else min(accuracy / 100.0, 1.0)
+
+
+@dataclass(frozen=True)
+class Team:
+    """Per-pet arrays for one side; ability arrays are (pets, ABILITY_SLOTS)."""
+
+    health: np.ndarray
+    speed: np.ndarray
+    pet_type: np.ndarray
+    hit_damage: np.ndarray
+    ability_type: np.ndarray
+    accuracy: np.ndarray
+    cooldown: np.ndarray
+
+    @classmethod
+    def build(
+        cls, pets: list[BattlePet], abilities_by_id: Mapping[int, Ability]
+    ) -> "Team":
+        shape = (len(pets), ABILITY_SLOTS)
+        hit_damage = np.zeros(shape, dtype=np.float64)
+        ability_type = np.zeros(shape, dtype=np.intp)
+        accuracy = np.zeros(shape, dtype=np.float64)
+        cooldown = np.zeros(shape, dtype=np.int32)
+        for row, pet in enumerate(pets):
+            for slot, ability_id in enumerate(pet.abilities[:ABILITY_SLOTS]):
+                ability = abilities_by_id.get(ability_id)
+                if ability is None:
+                    continue
+                hit_damage[row, slot] = base_damage(ability) * (1 + pet.power / 20)
+                ability_type[row, slot] = TYPE_INDEX[ability.type]
+                accuracy[row, slot] = hit_chance(ability)
+                cooldown[row, slot] = cooldown_rounds(ability)
+        return cls(
+            health=np.array([pet.health for pet in pets], dtype=np.float64),
+            speed=np.array([pet.speed for pet in pets], dtype=np.float64),
+            pet_type=np.array([TYPE_INDEX[pet.type] for pet in pets], dtype=np.intp),
+            hit_damage=hit_damage,
+            ability_type=ability_type,
+            accuracy=accuracy,
+            cooldown=cooldown,
+        )
+
+    def damage_against(self, other: "Team") -> np.ndarray:
+        """(own pets, other pets, slots) damage per hit, after type multipliers."""
+        multiplier = TYPE_ADVANTAGE[
+            self.ability_type[:, None, :], other.pet_type[None, :, None]
+        ]
+        return self.hit_damage[:, None, :] * multiplier
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    """Outcome of each simulated battle: ``winner`` is 0, 1 or ``DRAW``."""
+
+    winner: np.ndarray
+    rounds: np.ndarray
+
+    @property
+    def battles(self) -> int:
+        return len(self.winner)
+
+    def win_rate(self, side: int) -> float:
+        return float(np.mean(self.winner == side)) if self.battles else 0.0
+
+    def rounds_histogram(self, side: int) -> dict[int, int]:
+        """How many battles ``side`` won after each number of rounds."""
+        values, counts = np.unique(self.rounds[self.winner == side], return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+
+def simulate(
+    team_a: list[BattlePet],
+    team_b: list[BattlePet],
+    abilities_by_id: Mapping[int, Ability],
+    battles: int = 1000,
+    seed: Optional[int] = None,
+    max_rounds: int = 100,
+) -> SimulationResult:
+    """Run ``battles`` independent fights between two teams of one to three pets."""
+    if not team_a or not team_b:
+        raise ValueError("Both teams need at least one pet")
+    rng = np.random.default_rng(seed)
+    teams = (Team.build(team_a, abilities_by_id), Team.build(team_b, abilities_by_id))
+    size = max(len(team_a), len(team_b))
+
+    # Pad both sides to the same team size with pets that start dead.
+    damage = np.zeros((2, size, size, ABILITY_SLOTS))
+    accuracy = np.zeros((2, size, ABILITY_SLOTS))
+    cooldown = np.zeros((2, size, ABILITY_SLOTS), dtype=np.int32)
+    speed = np.zeros((2, size))
+    start_health = np.zeros((2, size))
+    for side, (own, other) in enumerate((teams, teams[::-1])):
+        n, m = len(own.health), len(other.health)
+        damage[side, :n, :m] = own.damage_against(other)
+        accuracy[side, :n] = own.accuracy
+        cooldown[side, :n] = own.cooldown
+        speed[side, :n] = own.speed
+        start_health[side, :n] = own.health
+
+    rows = np.arange(battles)
+    health = np.broadcast_to(start_health, (battles, 2, size)).copy()
+    ready_in = np.zeros((battles, 2, size, ABILITY_SLOTS), dtype=np.int32)
+    active = np.zeros((battles, 2), dtype=np.intp)
+    finished = np.zeros(battles, dtype=bool)
+    rounds = np.full(battles, max_rounds, dtype=np.int32)
+
+    for round_number in range(1, max_rounds + 1):
+        pet_speed = speed[[0, 1], active]
+        coin = rng.random(battles) < 0.5
+        first = np.where(
+            pet_speed[:, 0] == pet_speed[:, 1], coin, pet_speed[:, 1] > pet_speed[:, 0]
+        )
+        for actor in (first.astype(np.intp), 1 - first.astype(np.intp)):
+            target = 1 - actor
+            own = active[rows, actor]
+            enemy = active[rows, target]
+            can_act = (
+                ~finished
+                & (health[rows, actor, own] > 0)
+                & (health[rows, target, enemy] > 0)
+            )
+
+            hit = damage[actor, own, enemy]
+            ready = (ready_in[rows, actor, own] == 0) & (hit > 0)
+            expected = np.where(ready, hit * accuracy[actor, own], -1.0)
+            slot = expected.argmax(axis=1)
+            acts = can_act & ready[rows, slot]
+
+            lands = acts & (rng.random(battles) < accuracy[actor, own, slot])
+            health[rows, target, enemy] -= np.where(lands, hit[rows, slot], 0.0)
+            ready_in[rows[acts], actor[acts], own[acts], slot[acts]] = cooldown[
+                actor[acts], own[acts], slot[acts]
+            ]
+
+        np.maximum(ready_in - 1, 0, out=ready_in)
+
+        alive = health > 0
+        side_alive = alive.any(axis=2)
+        active = alive.argmax(axis=2)
+        done = ~finished & ~(side_alive[:, 0] & side_alive[:, 1])
+        rounds[done] = round_number
+        finished |= done
+        if finished.all():
+            break
+
+    side_alive = (health > 0).any(axis=2)
+    winner = np.full(battles, DRAW, dtype=np.int8)
+    winner[side_alive[:, 0] & ~side_alive[:, 1]] = 0
+    winner[side_alive[:, 1] & ~side_alive[:, 0]] = 1
+    return SimulationResult(winner=winner, rounds=rounds)
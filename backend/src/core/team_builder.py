@@ -0,0 +1,270 @@
+"""Search for the best three-pet team against an enemy team or pet type.
+
+Each candidate pet gets a matchup value against every enemy: the best type
+multiplier its damaging abilities bring, divided by the multiplier the enemy's
+attacks deal to it (the same chart ``find_types_strong_against`` and
+``list_pets_defensive_against`` read). A team scores, for every enemy, its
+best member's matchup value, plus a small bonus for raw stats. The score
+only grows when any member's values grow, which makes two exact pruning
+steps possible:
+
+- dominance: a pet that three other pets match or beat on every axis can
+  always be swapped for one of them, so it is dropped before the search
+- branch and bound: partial teams whose optimistic bound cannot beat the
+  best team found so far are skipped
+
+The remaining search is sharded by first team member across a process pool,
+and every shard stops at a shared deadline with the best team it has so far.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Mapping, Optional
+
+import numpy as np
+
+from src.core.counter_index import deals_damage
+from src.core.matchup import TYPE_ADVANTAGE, TYPE_INDEX, best_multiplier_by_type
+from src.core.models import Ability, BattlePet, PetType
+
+TEAM_SIZE = 3
+STAT_WEIGHT = 0.1
+
+
+@dataclass(frozen=True)
+class TeamSearchResult:
+    pets: list[BattlePet]
+    score: float
+    candidates: int
+    complete: bool
+
+
+def damaging_type_mask(
+    pets: list[BattlePet], abilities_by_id: Mapping[int, Ability]
+) -> np.ndarray:
+    """(pets, types) mask of the ability types each pet can deal damage with."""
+    mask = np.zeros((len(pets), len(TYPE_INDEX)), dtype=bool)
+    for row, pet in enumerate(pets):
+        for ability_id in pet.abilities:
+            ability = abilities_by_id.get(ability_id)
+            if ability is not None and deals_damage(ability):
+                mask[row, TYPE_INDEX[ability.type]] = True
+    return mask
+
+
+def type_attack_mask(pet_type: PetType) -> np.ndarray:
+    """Attack mask for an enemy known only by type: it attacks with its own type."""
+    mask = np.zeros((1, len(TYPE_INDEX)), dtype=bool)
+    mask[0, TYPE_INDEX[pet_type]] = True
+    return mask
+
+
+def matchup_values(
+    candidates: list[BattlePet],
+    abilities_by_id: Mapping[int, Ability],
+    enemy_types: list[PetType],
+    enemy_attack_masks: np.ndarray,
+) -> np.ndarray:
+    """(candidates, enemies) offense over incoming multiplier.
+
+    ``enemy_attack_masks`` is an (enemies, types) mask of the ability types
+    each enemy attacks with.
+    """
+    enemy_columns = [TYPE_INDEX[t] for t in enemy_types]
+    offense = best_multiplier_by_type(damaging_type_mask(candidates, abilities_by_id))
+    offense = offense[:, enemy_columns]
+    candidate_types = [TYPE_INDEX[pet.type] for pet in candidates]
+    # Worst case incoming multiplier: the enemy picks its best type against us.
+    incoming = np.where(
+        enemy_attack_masks[:, :, None], TYPE_ADVANTAGE[None, :, candidate_types], 0.0
+    ).max(axis=1)
+    incoming = np.where(incoming > 0, incoming, 1.0).T
+    return offense / incoming
+
+
+def stat_values(candidates: list[BattlePet]) -> np.ndarray:
+    stats = np.array(
+        [[pet.health, pet.power, pet.speed] for pet in candidates], dtype=np.float64
+    )
+    peak = stats.max(axis=0)
+    return STAT_WEIGHT * (stats / np.where(peak > 0, peak, 1.0)).mean(axis=1)
+
+
+def undominated(
+    values: np.ndarray, stats: np.ndarray, keep: int = TEAM_SIZE
+) -> np.ndarray:
+    """Indices of candidates dominated by fewer than ``keep`` others.
+
+    Ties on every axis are broken by position, so identical pets cannot all
+    survive when there are more than ``keep`` of them.
+    """
+    features = np.column_stack([values, stats])
+    geq = (features[:, None, :] >= features[None, :, :]).all(axis=2)
+    gt = (features[:, None, :] > features[None, :, :]).any(axis=2)
+    order = np.arange(len(features))
+    dominates = geq & (gt | (order[:, None] < order[None, :]))
+    np.fill_diagonal(dominates, False)
+    return np.flatnonzero(dominates.sum(axis=0) < keep)
+
+
+def _score(values: np.ndarray, stats: np.ndarray, team: tuple[int, ...]) -> float:
+    return float(values[list(team)].max(axis=0).sum() + stats[list(team)].sum())
+
+
+def greedy_team(values: np.ndarray, stats: np.ndarray) -> tuple[int, ...]:
+    """Build a team one best addition at a time, used as the starting incumbent."""
+    team: list[int] = []
+    best = np.zeros(values.shape[1])
+    for _ in range(min(TEAM_SIZE, len(values))):
+        gains = np.maximum(values, best).sum(axis=1) + stats
+        gains[team] = -np.inf
+        pick = int(gains.argmax())
+        team.append(pick)
+        best = np.maximum(best, values[pick])
+    return tuple(team)
+
+
+def search_shard(
+    values: np.ndarray,
+    stats: np.ndarray,
+    first_members: list[int],
+    incumbent: float,
+    deadline: float,
+) -> tuple[float, Optional[tuple[int, int, int]], bool]:
+    """Branch and bound over teams ``i < j < k`` whose first member is in ``first_members``.
+
+    Runs in a worker process. Returns the best score above ``incumbent``, its
+    team (None if nothing beat the incumbent) and whether the shard finished
+    before ``deadline``.
+    """
+    n = len(values)
+    # suffix_max[k] is the best value per enemy among candidates k.., and
+    # suffix_stats[k] the two largest stat bonuses among them.
+    suffix_max = np.maximum.accumulate(values[::-1], axis=0)[::-1]
+    suffix_stats = np.zeros((n + 1, 2))
+    for k in range(n - 1, -1, -1):
+        suffix_stats[k] = np.sort(np.append(suffix_stats[k + 1], stats[k]))[::-1][:2]
+
+    best_score, best_team = incumbent, None
+    for i in first_members:
+        if time.time() > deadline:
+            return best_score, best_team, False
+        if i + TEAM_SIZE > n:
+            continue
+        bound = (
+            np.maximum(values[i], suffix_max[i + 1]).sum()
+            + stats[i]
+            + suffix_stats[i + 1].sum()
+        )
+        if bound <= best_score:
+            continue
+        for j in range(i + 1, n - 1):
+            if time.time() > deadline:
+                return best_score, best_team, False
+            pair = np.maximum(values[i], values[j])
+            pair_stats = stats[i] + stats[j]
+            bound = (
+                np.maximum(pair, suffix_max[j + 1]).sum()
+                + pair_stats
+                + suffix_stats[j + 1, 0]
+            )
+            if bound <= best_score:
+                continue
+            scores = np.maximum(pair, values[j + 1 :]).sum(axis=1) + stats[j + 1 :]
+            k = int(scores.argmax())
+            if scores[k] + pair_stats > best_score:
+                best_score = float(scores[k] + pair_stats)
+                best_team = (i, j, j + 1 + k)
+    return best_score, best_team, True
+
+
+class TeamBuilder:
+    """Runs team searches on a process pool that lives as long as the builder."""
+
+    def __init__(self, max_workers: Optional[int] = None) -> None:
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork: the API process holds model and client threads.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    async def recommend(
+        self,
+        candidates: list[BattlePet],
+        abilities_by_id: Mapping[int, Ability],
+        enemy_types: list[PetType],
+        enemy_attack_masks: np.ndarray,
+        time_budget: float = 2.0,
+    ) -> TeamSearchResult:
+        """Find the highest scoring team of distinct candidates within ``time_budget`` seconds."""
+        deadline = time.time() + time_budget
+        values = matchup_values(
+            candidates, abilities_by_id, enemy_types, enemy_attack_masks
+        )
+        stats = stat_values(candidates)
+        kept = undominated(values, stats)
+        # Strongest candidates first, so good teams are found early and bound well.
+        kept = kept[
+            np.argsort(-(values[kept].sum(axis=1) + stats[kept]), kind="stable")
+        ]
+        values, stats = values[kept], stats[kept]
+        if len(kept) < TEAM_SIZE:
+            team = tuple(range(len(kept)))
+            return TeamSearchResult(
+                pets=[candidates[kept[i]] for i in team],
+                score=_score(values, stats, team) if team else 0.0,
+                candidates=len(kept),
+                complete=True,
+            )
+
+        best_team = greedy_team(values, stats)
+        best_score = _score(values, stats, best_team)
+        shards = min(self.max_workers * 4, len(kept))
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                self._pool(),
+                search_shard,
+                values,
+                stats,
+                list(range(shard, len(kept), shards)),
+                best_score,
+                deadline,
+            )
+            for shard in range(shards)
+        ]
+        # Shards check the deadline between first members; leave them a moment
+        # to report before giving up on them.
+        done, pending = await asyncio.wait(
+            futures, timeout=max(deadline - time.time(), 0) + 0.5
+        )
+        for future in pending:
+            future.cancel()
+
+        complete = not pending
+        for future in done:
+            score, team, finished = future.result()
+            complete = complete and finished
+            if team is not None and score > best_score:
+                best_score, best_team = score, team
+        return TeamSearchResult(
+            pets=[candidates[kept[i]] for i in best_team],
+            score=best_score,
+            candidates=len(kept),
+            complete=complete,
+        )
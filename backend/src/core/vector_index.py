@@ -0,0 +1,337 @@
+import contextlib
+import hashlib
+import itertools
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import faiss
+import numpy as np
+
+# Shared across DocumentIndex instances, so a replaced index never reuses a
+# version that cached results were stored under.
+_index_versions = itertools.count(1)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "sq8", "sq_fp16", "pq", "ivf_pq")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _replace_atomically(path: Path, write) -> None:
+    """Write through ``write(tmp_path)`` and rename, so readers never see half a file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    """Which FAISS index to build, and its search-time knobs.
+
+    - ``flat``: exact search over float32 vectors (the baseline)
+    - ``hnsw``: graph search, fast but larger; removals rebuild the graph
+    - ``ivf``: clustered float32 vectors, ``ivf_nprobe`` clusters scanned
+    - ``sq8`` / ``sq_fp16``: exact scan over 8-bit or 16-bit scalar codes
+    - ``pq`` / ``ivf_pq``: product-quantized codes, smallest and least exact
+    """
+
+    index_type: str = "flat"
+    hnsw_m: int = 32
+    hnsw_ef_search: int = 64
+    ivf_nprobe: int = 8
+    pq_m: int = 16
+
+    def __post_init__(self) -> None:
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type {self.index_type!r}, expected one of {INDEX_TYPES}"
+            )
+
+    def factory_string(self, dimension: int, n_vectors: int) -> str:
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+        pq_m = math.gcd(self.pq_m, dimension)
+        # FAISS wants ~39 training vectors per centroid, for IVF lists and PQ codes
+        # alike; its PQ distance tables need at least 16 centroids.
+        pq_bits = max(4, min(8, int(math.log2(max(n_vectors // 39, 2)))))
+        body = {
+            "flat": "Flat",
+            "hnsw": f"HNSW{self.hnsw_m}",
+            "ivf": f"IVF{nlist},Flat",
+            "sq8": "SQ8",
+            "sq_fp16": "SQfp16",
+            "pq": f"PQ{pq_m}x{pq_bits}",
+            "ivf_pq": f"IVF{nlist},PQ{pq_m}x{pq_bits}",
+        }[self.index_type]
+        # IVF lists store ids natively, and their removals would desync an IDMap.
+        return body if body.startswith("IVF") else f"IDMap2,{body}"
+
+    def build(self, training_vectors: np.ndarray) -> faiss.Index:
+        """An empty, trained inner-product index for vectors like ``training_vectors``."""
+        n_vectors, dimension = training_vectors.shape
+        index = faiss.index_factory(
+            dimension,
+            self.factory_string(dimension, n_vectors),
+            faiss.METRIC_INNER_PRODUCT,
+        )
+        if not index.is_trained:
+            index.train(training_vectors)
+        self.tune(index)
+        return index
+
+    def search_parameters(
+        self, selector: faiss.IDSelector, full_scan: bool = False
+    ) -> faiss.SearchParameters:
+        """Parameters restricting a search to ``selector``, with this config's knobs.
+
+        Explicit parameters override the ones set on the index, so they carry
+        ``nprobe``/``efSearch`` too; ``full_scan`` probes every IVF list.
+        """
+        if self.index_type in ("ivf", "ivf_pq"):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = 1 << 30 if full_scan else self.ivf_nprobe
+        elif self.index_type == "hnsw":
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = self.hnsw_ef_search
+        else:
+            params = faiss.SearchParameters()
+        params.sel = selector
+        return params
+
+    def tune(self, index: faiss.Index) -> None:
+        params = faiss.ParameterSpace()
+        if self.index_type in ("ivf", "ivf_pq"):
+            params.set_index_parameter(index, "nprobe", self.ivf_nprobe)
+        elif self.index_type == "hnsw":
+            params.set_index_parameter(index, "efSearch", self.hnsw_ef_search)
+
+
+class _ReadWriteLock:
+    """Any number of readers, or one writer; waiting writers go first."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextlib.contextmanager
+    def reading(self):
+        with self._condition:
+            while self._writing or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def writing(self):
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class DocumentIndex:
+    """Inner-product FAISS index keyed by pet or ability id.
+
+    Remembers a hash of each document's text, so callers can tell which
+    documents changed and re-encode only those. ``version`` changes on every
+    modification, which invalidates cached search results.
+
+    FAISS allows concurrent searches but nothing alongside a modification,
+    so searches share a lock that ``upsert`` and ``remove`` take alone.
+    """
+
+    def __init__(
+        self,
+        index: faiss.Index,
+        doc_hashes: dict[int, str],
+        config: IndexConfig = IndexConfig(),
+    ) -> None:
+        self.index = index
+        self.doc_hashes = doc_hashes
+        self.config = config
+        self.mapped = False
+        self.version = next(_index_versions)
+        self._lock = _ReadWriteLock()
+
+    @classmethod
+    def create(
+        cls, config: IndexConfig, training_vectors: np.ndarray
+    ) -> "DocumentIndex":
+        return cls(config.build(training_vectors), {}, config)
+
+    @classmethod
+    def load(
+        cls, path: Path, config: IndexConfig = IndexConfig(), mapped: bool = False
+    ) -> Optional["DocumentIndex"]:
+        """Read a stored index, or with ``mapped`` map its vectors in place.
+
+        A mapped index shares the file's pages with every other process
+        mapping it, and is copied into memory before its first modification.
+        """
+        flags = faiss.IO_FLAG_MMAP_IFC if mapped else faiss.IO_FLAG_MMAP
+        try:
+            hashes = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+            index = faiss.read_index(str(path.with_suffix(".faiss")), flags)
+        except (FileNotFoundError, RuntimeError):
+            return None
+        config.tune(index)
+        loaded = cls(index, {int(_id): h for _id, h in hashes.items()}, config)
+        loaded.mapped = mapped
+        return loaded
+
+    def _own(self) -> None:
+        """Copy a mapped index into memory; FAISS cannot resize mapped vectors."""
+        if self.mapped:
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            self.config.tune(self.index)
+            self.mapped = False
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock.reading():
+            _replace_atomically(
+                path.with_suffix(".faiss"),
+                lambda tmp: faiss.write_index(self.index, tmp),
+            )
+            _replace_atomically(
+                path.with_suffix(".json"),
+                lambda tmp: Path(tmp).write_text(
+                    json.dumps(self.doc_hashes), encoding="utf-8"
+                ),
+            )
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def changes(self, documents: dict[int, str]) -> tuple[dict[int, str], list[int]]:
+        """Documents whose text is new or different, and ids no longer present."""
+        changed = {
+            _id: text
+            for _id, text in documents.items()
+            if self.doc_hashes.get(_id) != text_hash(text)
+        }
+        removed = [_id for _id in self.doc_hashes if _id not in documents]
+        return changed, removed
+
+    def _remove_ids(self, ids: list[int]) -> None:
+        present = [_id for _id in ids if _id in self.doc_hashes]
+        if not present:
+            return
+        try:
+            self.index.remove_ids(np.asarray(present, dtype=np.int64))
+        except RuntimeError:
+            # HNSW graphs cannot drop nodes: rebuild from the vectors we keep.
+            removed = set(present)
+            keep = np.array(
+                [_id for _id in self.doc_hashes if _id not in removed], dtype=np.int64
+            )
+            vectors = np.stack([self.index.reconstruct(int(_id)) for _id in keep])
+            self.index = self.config.build(vectors)
+            self.index.add_with_ids(vectors, keep)
+
+    def upsert(self, documents: dict[int, str], vectors: np.ndarray) -> None:
+        ids = np.fromiter(documents, dtype=np.int64, count=len(documents))
+        with self._lock.writing():
+            self._own()
+            self._remove_ids(list(documents))
+            self.index.add_with_ids(vectors, ids)
+            for _id, text in documents.items():
+                self.doc_hashes[_id] = text_hash(text)
+            self.version = next(_index_versions)
+
+    def remove(self, ids: list[int]) -> None:
+        with self._lock.writing():
+            self._own()
+            self._remove_ids(ids)
+            for _id in ids:
+                self.doc_hashes.pop(_id, None)
+            self.version = next(_index_versions)
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        allowed_ids: Optional[np.ndarray] = None,
+    ):
+        """Top ``k`` (scores, ids) per query, only among ``allowed_ids`` if given.
+
+        Filtering happens inside FAISS, so every row holds ``k`` matching hits
+        whenever at least ``k`` documents are allowed.
+        """
+        with self._lock.reading():
+            return self._search(query_vectors, k, allowed_ids)
+
+    def _search(
+        self,
+        query_vectors: np.ndarray,
+        k: int,
+        allowed_ids: Optional[np.ndarray],
+    ):
+        if allowed_ids is None:
+            return self.index.search(query_vectors, k)
+        n_queries = len(query_vectors)
+        if len(allowed_ids) == 0:
+            return (
+                np.zeros((n_queries, k), dtype=np.float32),
+                np.full((n_queries, k), -1, dtype=np.int64),
+            )
+        if self.config.index_type == "pq":
+            return self._search_oversampled(query_vectors, k, allowed_ids)
+        selector = faiss.IDSelectorBatch(allowed_ids)
+        scores, ids = self.index.search(
+            query_vectors, k, params=self.config.search_parameters(selector)
+        )
+        expected = min(k, len(allowed_ids))
+        if (
+            self.config.index_type in ("ivf", "ivf_pq")
+            and ((ids >= 0).sum(axis=1) < expected).any()
+        ):
+            # The probed lists held too few matches; scan them all instead.
+            scores, ids = self.index.search(
+                query_vectors,
+                k,
+                params=self.config.search_parameters(selector, full_scan=True),
+            )
+        return scores, ids
+
+    def _search_oversampled(
+        self, query_vectors: np.ndarray, k: int, allowed_ids: np.ndarray
+    ):
+        """Filter after the fact for indexes without selector support, widening until full."""
+        allowed = np.asarray(allowed_ids, dtype=np.int64)
+        depth = max(min(k * 4, self.ntotal), 1)
+        while True:
+            scores, ids = self.index.search(query_vectors, depth)
+            keep = np.isin(ids, allowed)
+            if depth >= self.ntotal or (keep.sum(axis=1) >= min(k, len(allowed))).all():
+                break
+            depth = min(depth * 4, self.ntotal)
+        out_scores = np.zeros((len(ids), k), dtype=np.float32)
+        out_ids = np.full((len(ids), k), -1, dtype=np.int64)
+        for row in range(len(ids)):
+            row_ids = ids[row][keep[row]][:k]
+            out_ids[row, : len(row_ids)] = row_ids
+            out_scores[row, : len(row_ids)] = scores[row][keep[row]][:k]
+        return out_scores, out_ids
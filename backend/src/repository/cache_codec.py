@@ -0,0 +1,180 @@
+"""Encoding of cached values: serializer, optional zstd, and model rebuilding.
+
+Every encoded value starts with one header byte: the wire format in the low
+bits and a flag for zstd compression. Values in a format this process
+cannot read (including plain JSON from before the header existed) decode
+as a cache miss, so they are simply fetched again and overwritten.
+
+``orjson``, ``msgpack`` and ``zstandard`` are dependencies but imported
+lazily: an environment without one still reads and writes stdlib JSON.
+"""
+
+import functools
+import json
+import logging
+from typing import Any, Callable, Optional, TypeVar
+
+from pydantic import BaseModel, TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+JSON_FORMAT = 1
+MSGPACK_FORMAT = 2
+_COMPRESSED = 0x80
+
+
+class Serializer:
+    def __init__(
+        self,
+        name: str,
+        wire_format: int,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any],
+    ) -> None:
+        self.name = name
+        self.wire_format = wire_format
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _stdlib_json() -> Serializer:
+    return Serializer(
+        "json",
+        JSON_FORMAT,
+        lambda value: json.dumps(value, separators=(",", ":")).encode("utf-8"),
+        json.loads,
+    )
+
+
+def _orjson() -> Serializer:
+    import orjson
+
+    return Serializer("orjson", JSON_FORMAT, orjson.dumps, orjson.loads)
+
+
+def _msgpack() -> Serializer:
+    import msgpack
+
+    return Serializer(
+        "msgpack",
+        MSGPACK_FORMAT,
+        functools.partial(msgpack.packb, use_bin_type=True),
+        functools.partial(msgpack.unpackb, raw=False),
+    )
+
+
+SERIALIZERS: dict[str, Callable[[], Serializer]] = {
+    "json": _stdlib_json,
+    "orjson": _orjson,
+    "msgpack": _msgpack,
+}
+
+
+def _reader_for(wire_format: int) -> Optional[Serializer]:
+    """Fastest installed serializer that reads ``wire_format``."""
+    candidates = {JSON_FORMAT: ("orjson", "json"), MSGPACK_FORMAT: ("msgpack",)}
+    for name in candidates.get(wire_format, ()):
+        try:
+            return SERIALIZERS[name]()
+        except ImportError:
+            continue
+    return None
+
+
+@functools.cache
+def _list_adapter(model_cls: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model_cls])
+
+
+class CacheCodec:
+    """Turns cache values into bytes and back.
+
+    Values of at least ``compress_threshold`` bytes are zstd-compressed
+    (0 disables compression).
+    """
+
+    def __init__(
+        self,
+        serializer: str = "json",
+        compress_threshold: int = 0,
+        compression_level: int = 3,
+    ) -> None:
+        self.serializer = SERIALIZERS[serializer]()
+        self.compress_threshold = compress_threshold
+        self._compressor = None
+        self._decompressor = None
+        self._readers: dict[int, Optional[Serializer]] = {
+            self.serializer.wire_format: self.serializer
+        }
+        try:
+            import zstandard
+
+            self._compressor = zstandard.ZstdCompressor(level=compression_level)
+            self._decompressor = zstandard.ZstdDecompressor()
+        except ImportError:
+            if compress_threshold:
+                logger.warning(
+                    "zstandard is not installed; cache values stay uncompressed"
+                )
+            self.compress_threshold = 0
+
+    @property
+    def name(self) -> str:
+        if self.compress_threshold:
+            return f"{self.serializer.name}+zstd"
+        return self.serializer.name
+
+    def encode(self, value: Any) -> bytes:
+        if isinstance(value, BaseModel):
+            value = value.model_dump()
+        elif isinstance(value, list) and value and isinstance(value[0], BaseModel):
+            value = [v.model_dump() for v in value]
+        payload = self.serializer.dumps(value)
+        header = self.serializer.wire_format
+        if self.compress_threshold and len(payload) >= self.compress_threshold:
+            payload = self._compressor.compress(payload)
+            header |= _COMPRESSED
+        return bytes([header]) + payload
+
+    def _payload(self, raw: bytes) -> Optional[tuple[Serializer, bytes]]:
+        """Reader and uncompressed payload, or None for an unreadable value."""
+        if not raw:
+            return None
+        header, payload = raw[0], raw[1:]
+        wire_format = header & ~_COMPRESSED
+        if wire_format not in self._readers:
+            self._readers[wire_format] = _reader_for(wire_format)
+        reader = self._readers[wire_format]
+        if reader is None:
+            return None
+        if header & _COMPRESSED:
+            if self._decompressor is None:
+                return None
+            payload = self._decompressor.decompress(payload)
+        return reader, payload
+
+    def decode(self, raw: bytes) -> Optional[Any]:
+        """The cached value, or None if it is in a format this process cannot read."""
+        decoded = self._payload(raw)
+        if decoded is None:
+            return None
+        reader, payload = decoded
+        return reader.loads(payload)
+
+    def decode_models(self, raw: bytes, model_cls: type[T]) -> Optional[T | list[T]]:
+        decoded = self._payload(raw)
+        if decoded is None:
+            return None
+        reader, payload = decoded
+        if reader.wire_format == JSON_FORMAT:
+            # pydantic-core parses and validates JSON in one pass, faster than
+            # loading it first and faster even than model_construct.
+            if payload[:1] == b"[":
+                return _list_adapter(model_cls).validate_json(payload)
+            return model_cls.model_validate_json(payload)
+        data = reader.loads(payload)
+        if isinstance(data, list):
+            return _list_adapter(model_cls).validate_python(data)
+        return model_cls.model_validate(data)
@@ -0,0 +1,273 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional
+
+from src.core.models import Ability, BattlePet, ChangeSet, Page, PageQuery, PetType
+from src.core.pagination import paginate
+from src.repository.csv_ingest import DEFAULT_BATCH_SIZE, IngestReport
+from src.repository.interface.database import DbBase
+from src.utils.timing import log_execution_time
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(pets: list[BattlePet], abilities: list[Ability]) -> str:
+    """Content hash used as the version when the source cannot report one."""
+    digest = hashlib.sha256()
+    for model in (*pets, *abilities):
+        digest.update(model.model_dump_json().encode("utf-8"))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """Immutable in-memory copy of every pet and ability, with lookup indexes.
+
+    The models are shared between callers, so treat them as read-only.
+    """
+
+    version: str
+    pets: tuple[BattlePet, ...]
+    abilities: tuple[Ability, ...]
+    pets_by_id: Mapping[int, BattlePet]
+    abilities_by_id: Mapping[int, Ability]
+    pets_by_type: Mapping[PetType, tuple[BattlePet, ...]]
+    abilities_by_type: Mapping[PetType, tuple[Ability, ...]]
+    pets_by_ability: Mapping[int, tuple[int, ...]]
+
+    @classmethod
+    def build(
+        cls, pets: list[BattlePet], abilities: list[Ability], version: str
+    ) -> "CatalogSnapshot":
+        pets_by_type: dict[PetType, list[BattlePet]] = {t: [] for t in PetType}
+        pets_by_ability: dict[int, list[int]] = {}
+        for pet in pets:
+            pets_by_type[pet.type].append(pet)
+            for ability_id in pet.abilities:
+                if ability_id >= 0:
+                    pets_by_ability.setdefault(ability_id, []).append(pet.id)
+
+        abilities_by_type: dict[PetType, list[Ability]] = {t: [] for t in PetType}
+        for ability in abilities:
+            abilities_by_type[ability.type].append(ability)
+
+        return cls(
+            version=version,
+            pets=tuple(pets),
+            abilities=tuple(abilities),
+            pets_by_id=MappingProxyType({pet.id: pet for pet in pets}),
+            abilities_by_id=MappingProxyType({a.id: a for a in abilities}),
+            pets_by_type=MappingProxyType(
+                {t: tuple(v) for t, v in pets_by_type.items()}
+            ),
+            abilities_by_type=MappingProxyType(
+                {t: tuple(v) for t, v in abilities_by_type.items()}
+            ),
+            pets_by_ability=MappingProxyType(
+                {a: tuple(sorted(set(v))) for a, v in pets_by_ability.items()}
+            ),
+        )
+
+
+class CatalogDataHandler(DbBase):
+    """Serves every read from an in-memory ``CatalogSnapshot``.
+
+    The snapshot is loaded once from ``source`` and replaced wholesale when the
+    source's dataset version changes, so a reader always sees one consistent
+    version. The source defaults to ``MongoDb``: the snapshot takes the place
+    of the Redis layer, and reloading through it could pick up stale entries.
+    """
+
+    def __init__(
+        self, source: Optional[DbBase] = None, refresh_interval: float = 60.0
+    ) -> None:
+        if source is None:
+            from src.repository.mongo_db import MongoDb
+
+            source = MongoDb()
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._load_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    async def _source_version(self) -> Optional[str]:
+        try:
+            return await self.source.get_dataset_version()
+        except NotImplementedError:
+            return None
+
+    @log_execution_time("catalog_load")
+    async def load(self) -> CatalogSnapshot:
+        """Load a fresh snapshot from the source and swap it in."""
+        async with self._load_lock:
+            return await self._load()
+
+    async def _load(self) -> CatalogSnapshot:
+        # Read the version first: if the data moves underneath us the next
+        # refresh sees a newer version and reloads again.
+        version = await self._source_version()
+        pets = await self.source.get_all_battle_pets()
+        abilities = await self.source.get_all_abilities()
+        snapshot = CatalogSnapshot.build(
+            pets, abilities, version or fingerprint(pets, abilities)
+        )
+        self._snapshot = snapshot
+        logger.info(
+            f"Catalog loaded {len(snapshot.pets)} pets and "
+            f"{len(snapshot.abilities)} abilities (version {snapshot.version})"
+        )
+        return snapshot
+
+    async def refresh(self) -> bool:
+        """Reload when the source version moved. Returns True if a new snapshot was swapped in."""
+        current = self._snapshot
+        version = await self._source_version()
+        if current is not None and version is not None and version == current.version:
+            return False
+        snapshot = await self.load()
+        return current is None or snapshot.version != current.version
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Catalog refresh failed, keeping current snapshot: {e}")
+
+    def start(self) -> None:
+        """Start polling the source for version changes in the background."""
+        if self._refresh_task is None and self.refresh_interval > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._refresh_task
+            self._refresh_task = None
+
+    async def _current(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            async with self._load_lock:
+                snapshot = self._snapshot or await self._load()
+        return snapshot
+
+    async def get_battle_pet(self, _id: int) -> BattlePet:
+        snapshot = await self._current()
+        pet = snapshot.pets_by_id.get(_id)
+        if pet is None:
+            raise ValueError(f"Battle pet with id {_id} not found")
+        return pet
+
+    async def get_ability(self, _id: int) -> Ability:
+        snapshot = await self._current()
+        ability = snapshot.abilities_by_id.get(_id)
+        if ability is None:
+            raise ValueError(f"Ability with id {_id} not found")
+        return ability
+
+    async def get_abilities_by_ids(self, ids: list[int]) -> list[Ability]:
+        snapshot = await self._current()
+        return [
+            snapshot.abilities_by_id[_id]
+            for _id in dict.fromkeys(ids)
+            if _id in snapshot.abilities_by_id
+        ]
+
+    async def get_battle_pets_by_ids(self, ids: list[int]) -> list[BattlePet]:
+        snapshot = await self._current()
+        return [
+            snapshot.pets_by_id[_id]
+            for _id in dict.fromkeys(ids)
+            if _id in snapshot.pets_by_id
+        ]
+
+    async def get_all_battle_pets(self) -> list[BattlePet]:
+        return list((await self._current()).pets)
+
+    async def get_all_abilities(self) -> list[Ability]:
+        return list((await self._current()).abilities)
+
+    async def get_battle_pet_by_type(self, pet_type: PetType) -> list[BattlePet]:
+        return list((await self._current()).pets_by_type.get(pet_type, ()))
+
+    async def get_ability_by_type(self, ability_type: PetType) -> list[Ability]:
+        return list((await self._current()).abilities_by_type.get(ability_type, ()))
+
+    async def get_battle_pets_page(self, query: PageQuery) -> Page:
+        return paginate((await self._current()).pets, query)
+
+    async def get_abilities_page(self, query: PageQuery) -> Page:
+        return paginate((await self._current()).abilities, query)
+
+    async def get_pets_with_ability(self, ability_id: int) -> list[BattlePet]:
+        """Return every pet that can use the given ability."""
+        snapshot = await self._current()
+        return [
+            snapshot.pets_by_id[pet_id]
+            for pet_id in snapshot.pets_by_ability.get(ability_id, ())
+        ]
+
+    async def get_dataset_version(self) -> str:
+        return (await self._current()).version
+
+    async def ensure_indexes(self) -> None:
+        await self.source.ensure_indexes()
+
+    async def add_battle_pet(self, pet: BattlePet) -> None:
+        await self.source.add_battle_pet(pet)
+        await self.load()
+
+    async def add_ability(self, ability: Ability) -> None:
+        await self.source.add_ability(ability)
+        await self.load()
+
+    async def populate_battle_pets(
+        self,
+        battle_pets_file: Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        report = await self.source.populate_battle_pets(
+            battle_pets_file, batch_size, progress
+        )
+        if report.changed:
+            await self.load()
+        return report
+
+    async def populate_abilities(
+        self,
+        abilities_file: Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        report = await self.source.populate_abilities(
+            abilities_file, batch_size, progress
+        )
+        if report.changed:
+            await self.load()
+        return report
+
+    async def apply_changes(
+        self, changes: list[ChangeSet], models: Mapping[str, list[BattlePet | Ability]]
+    ) -> None:
+        await self.source.apply_changes(changes, models)
+        await self.load()
+
+    async def get_changes_since(self, version: str) -> Optional[list[ChangeSet]]:
+        return await self.source.get_changes_since(version)
+
+    async def get_content_hashes(self, collection: str) -> dict[int, Optional[str]]:
+        return await self.source.get_content_hashes(collection)
@@ -0,0 +1,124 @@
+from typing import Optional
+
+import redis.asyncio as aioredis
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from redis import BlockingConnectionPool, Redis
+
+from src.utils.settings import Settings
+
+
+def _milliseconds(seconds: float) -> Optional[int]:
+    return int(seconds * 1000) if seconds else None
+
+
+class Clients:
+    """The Mongo and Redis clients every repository class in a process shares.
+
+    Each client is built on first use from ``settings``, with bounded
+    connection pools and timeouts. Building one does no I/O; connections
+    are opened as requests need them and kept for reuse. The app closes the
+    registry on shutdown.
+
+    Clients passed in are used as they are, e.g. fakes in tests.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        mongo: Optional[AsyncIOMotorClient] = None,
+        redis: Optional[aioredis.Redis] = None,
+        sync_redis: Optional[Redis] = None,
+    ) -> None:
+        self.settings = settings or Settings.from_env()
+        self._mongo = mongo
+        self._redis = redis
+        self._sync_redis = sync_redis
+
+    @property
+    def mongo(self) -> AsyncIOMotorClient:
+        if self._mongo is None:
+            s = self.settings
+            self._mongo = AsyncIOMotorClient(
+                s.mongo_uri,
+                uuidrepresentation="standard",
+                maxPoolSize=s.mongo_max_pool_size,
+                minPoolSize=s.mongo_min_pool_size,
+                maxIdleTimeMS=_milliseconds(s.mongo_max_idle_seconds),
+                connectTimeoutMS=_milliseconds(s.mongo_connect_timeout_seconds),
+                serverSelectionTimeoutMS=_milliseconds(
+                    s.mongo_server_selection_timeout_seconds
+                ),
+                socketTimeoutMS=_milliseconds(s.mongo_socket_timeout_seconds),
+            )
+        return self._mongo
+
+    @property
+    def database(self) -> AsyncIOMotorDatabase:
+        """The database named in the Mongo URI."""
+        return self.mongo.get_default_database()
+
+    def _redis_options(self) -> dict:
+        s = self.settings
+        return {
+            "max_connections": s.redis_max_connections,
+            # Callers wait this long for a free connection instead of opening more.
+            "timeout": s.redis_pool_timeout_seconds,
+            "socket_connect_timeout": s.redis_connect_timeout_seconds or None,
+            "socket_timeout": s.redis_socket_timeout_seconds or None,
+            "health_check_interval": s.redis_health_check_seconds,
+        }
+
+    @property
+    def redis(self) -> aioredis.Redis:
+        """Async client for the cache."""
+        if self._redis is None:
+            pool = aioredis.BlockingConnectionPool.from_url(
+                self.settings.redis_url, **self._redis_options()
+            )
+            self._redis = aioredis.Redis.from_pool(pool)
+        return self._redis
+
+    @property
+    def sync_redis(self) -> Redis:
+        """Blocking client for code running in worker threads."""
+        if self._sync_redis is None:
+            pool = BlockingConnectionPool.from_url(
+                self.settings.redis_url, **self._redis_options()
+            )
+            self._sync_redis = Redis.from_pool(pool)
+        return self._sync_redis
+
+    async def close(self) -> None:
+        """Close every client that was built, releasing its pooled connections."""
+        if self._mongo is not None:
+            self._mongo.close()
+            self._mongo = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+        if self._sync_redis is not None:
+            self._sync_redis.close()
+            self._sync_redis = None
+
+
+_clients: Optional[Clients] = None
+
+
+def get_clients() -> Clients:
+    global _clients
+    if _clients is None:
+        _clients = Clients()
+    return _clients
+
+
+def set_clients(clients: Clients) -> None:
+    global _clients
+    _clients = clients
+
+
+async def close_clients() -> None:
+    """Close the shared clients; the next ``get_clients`` builds new ones."""
+    global _clients
+    if _clients is not None:
+        await _clients.close()
+        _clients = None
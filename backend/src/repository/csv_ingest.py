@@ -0,0 +1,275 @@
+"""Bulk, idempotent loading of the scraped CSVs into Mongo.
+
+Run from ``backend/``::
+
+    python -m src.repository.csv_ingest --pets data/mop_battle_pets.csv \
+        --abilities data/mop_battle_pet_abilities.csv --errors errors.csv
+
+Rows are validated a chunk at a time and written as unordered ``bulk_write``
+upserts keyed on ``id``, so rerunning a file changes nothing and a bad row
+or duplicate id does not stop the rest of the batch.
+"""
+
+import argparse
+import ast
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator, Optional, TypeVar
+
+from pydantic import BaseModel, ValidationError
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from src.core.models import Ability, BattlePet, PetType
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+DEFAULT_BATCH_SIZE = 1000
+# The scraped CSVs shipped with the repo.
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+# Stored next to each document so a refresh can tell what changed without
+# reading whole documents back; reads project it away.
+CONTENT_HASH_FIELD = "content_hash"
+
+
+def content_hash(model: BaseModel) -> str:
+    return hashlib.sha256(model.model_dump_json().encode("utf-8")).hexdigest()[:16]
+
+
+def stored_document(model: BaseModel) -> dict:
+    """The document written for ``model``, with its content hash."""
+    return {**model.model_dump(), CONTENT_HASH_FIELD: content_hash(model)}
+
+
+def _ability_ids(cell: str) -> list[int]:
+    # The scraper writes Python list literals, which are also valid JSON.
+    try:
+        ids = json.loads(cell)
+    except ValueError:
+        ids = ast.literal_eval(cell)
+    return sorted(ids)
+
+
+def parse_pet_row(row: dict[str, str]) -> BattlePet:
+    return BattlePet(
+        id=int(row["ID"]),
+        name=row["Name"],
+        level=int(row["Level"]),
+        health=int(row["Health"]),
+        power=int(row["Power"]),
+        speed=int(row["Speed"]),
+        breed=row["Breed"],
+        abilities=_ability_ids(row["Abilities"]),
+        source=row["Source"],
+        type=PetType(row["Type"]),
+        popularity=int(row["Popularity"]),
+        is_untameable=row["Untameable"].strip().lower() == "true",
+    )
+
+
+def parse_ability_row(row: dict[str, str]) -> Ability:
+    return Ability(
+        id=int(row["ID"]),
+        name=row["Name"],
+        damage=row["Damage"],
+        healing=row["Healing"],
+        duration=row["Duration"],
+        cooldown=row["Cooldown"],
+        accuracy=row["Accuracy"],
+        type=PetType(row["Type"]),
+        popularity=int(row["Popularity"]),
+        description=row["Description"],
+    )
+
+
+@dataclass
+class RowError:
+    line: int
+    id: Optional[str]
+    error: str
+
+
+@dataclass
+class IngestReport:
+    source: str
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list[RowError] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.source}: {self.rows} rows, {self.inserted} inserted, "
+            f"{self.updated} updated, {self.unchanged} unchanged, "
+            f"{len(self.errors)} errors in {self.seconds:.2f}s "
+            f"({self.rows_per_second:.0f} rows/s)"
+        )
+
+
+def read_chunks(
+    path: Path, parse: Callable[[dict[str, str]], M], chunk_size: int
+) -> Iterator[tuple[list[tuple[int, M]], list[RowError]]]:
+    """Yield ``(line, model)`` pairs and the rows that failed, a chunk at a time.
+
+    Lines count the header as line 1 and each record as one line.
+    """
+    with path.open(encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        line = 1
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            models, errors = [], []
+            for number, row in enumerate(rows, start=line + 1):
+                try:
+                    models.append((number, parse(row)))
+                except (ValidationError, ValueError, SyntaxError, KeyError) as e:
+                    errors.append(RowError(number, row.get("ID"), repr(e)))
+            line += len(rows)
+            yield models, errors
+
+
+async def _write_batch(
+    collection, batch: list[tuple[int, M]], report: IngestReport
+) -> None:
+    if not batch:
+        # Every row of the chunk failed to parse; bulk_write rejects no requests.
+        return
+    requests = [
+        ReplaceOne({"id": model.id}, stored_document(model), upsert=True)
+        for _, model in batch
+    ]
+    try:
+        result = await collection.bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for write_error in details.get("writeErrors", []):
+            line, model = batch[write_error["index"]]
+            report.errors.append(RowError(line, str(model.id), write_error["errmsg"]))
+    report.inserted += details.get("nUpserted", 0)
+    report.updated += details.get("nModified", 0)
+    report.unchanged += details.get("nMatched", 0) - details.get("nModified", 0)
+
+
+async def ingest_csv(
+    collection,
+    path: Path,
+    parse: Callable[[dict[str, str]], M],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[IngestReport], None]] = None,
+) -> IngestReport:
+    """Upsert every valid row of ``path`` into ``collection`` in unordered batches.
+
+    Parsing the next chunk overlaps with writing the previous one.
+    """
+    report = IngestReport(source=path.name)
+    started = time.perf_counter()
+    pending: Optional[asyncio.Task] = None
+    for batch, errors in read_chunks(path, parse, batch_size):
+        report.rows += len(batch) + len(errors)
+        report.errors.extend(errors)
+        if pending is not None:
+            await pending
+            if progress is not None:
+                progress(report)
+        pending = asyncio.create_task(_write_batch(collection, batch, report))
+        # Let the write go out before parsing the next chunk.
+        await asyncio.sleep(0)
+    if pending is not None:
+        await pending
+    report.seconds = time.perf_counter() - started
+    if progress is not None:
+        progress(report)
+    return report
+
+
+def _load_rows(path: Path, parse: Callable[[dict[str, str]], M]) -> list[M]:
+    """Parse every CSV row, skipping the rows the Mongo loaders reject."""
+    models = []
+    for batch, _ in read_chunks(path, parse, chunk_size=DEFAULT_BATCH_SIZE):
+        models.extend(model for _, model in batch)
+    return models
+
+
+def load_pets(path: Path = DATA_DIR / "mop_battle_pets.csv") -> list[BattlePet]:
+    """Every valid pet in ``path``, without touching Mongo."""
+    return _load_rows(path, parse_pet_row)
+
+
+def load_abilities(
+    path: Path = DATA_DIR / "mop_battle_pet_abilities.csv",
+) -> list[Ability]:
+    """Every valid ability in ``path``, without touching Mongo."""
+    return _load_rows(path, parse_ability_row)
+
+
+def write_error_report(reports: list[IngestReport], path: Path) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["source", "line", "id", "error"])
+        for report in reports:
+            for error in report.errors:
+                writer.writerow([report.source, error.line, error.id, error.error])
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Load the pet and ability CSVs")
+    parser.add_argument("--pets", type=Path)
+    parser.add_argument("--abilities", type=Path)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--errors", type=Path, help="Write rejected rows here")
+    args = parser.parse_args()
+
+    from src.repository.clients import close_clients
+    from src.repository.mongo_db import MongoDb
+    from src.repository.pet_data_handler import PetDataHandler
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Through the cache layer, so a load that changed rows also evicts and announces.
+    db = PetDataHandler(MongoDb())
+
+    def progress(report: IngestReport) -> None:
+        logger.info(f"{report.source}: {report.rows} rows read")
+
+    reports = []
+    try:
+        await db.ensure_indexes()
+        if args.pets:
+            reports.append(
+                await db.populate_battle_pets(args.pets, args.batch_size, progress)
+            )
+        if args.abilities:
+            reports.append(
+                await db.populate_abilities(args.abilities, args.batch_size, progress)
+            )
+    finally:
+        await close_clients()
+    for report in reports:
+        logger.info(report.summary())
+    if args.errors:
+        write_error_report(reports, args.errors)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
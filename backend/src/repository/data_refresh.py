@@ -0,0 +1,161 @@
+"""Refresh the stored pets and abilities from a new scrape, writing only what changed.
+
+Run from ``backend/``::
+
+    python -m src.repository.data_refresh --pets data/mop_battle_pets.csv \
+        --abilities data/mop_battle_pet_abilities.csv [--dry-run]
+
+Each incoming row is hashed and compared with the hash stored next to its
+document. Only inserted, updated and deleted ids are written, as one new
+dataset generation whose change set is logged. Caches evict just those ids,
+and the counter tables and search indexes re-file just those documents.
+"""
+
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Mapping, Optional, TypeVar
+
+from src.core.models import Ability, BattlePet, ChangeSet
+from src.repository.csv_ingest import (
+    RowError,
+    content_hash,
+    parse_ability_row,
+    parse_pet_row,
+    read_chunks,
+)
+from src.repository.interface.database import DbBase
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", BattlePet, Ability)
+
+_CHUNK_SIZE = 1000
+
+
+def read_models(
+    path: Path, parse: Callable[[dict[str, str]], M]
+) -> tuple[dict[int, M], list[RowError]]:
+    """Every valid row by id, the last row winning for repeated ids, and the rows that failed."""
+    models: dict[int, M] = {}
+    errors: list[RowError] = []
+    for batch, failed in read_chunks(path, parse, _CHUNK_SIZE):
+        models.update((model.id, model) for _, model in batch)
+        errors.extend(failed)
+    return models, errors
+
+
+def diff(
+    collection: str,
+    incoming: Mapping[int, M],
+    stored: Mapping[int, Optional[str]],
+    keep: frozenset[int] = frozenset(),
+) -> ChangeSet:
+    """Compare incoming models with stored content hashes.
+
+    Stored ids missing from ``incoming`` are deleted unless they are in
+    ``keep``. Documents stored without a hash count as updated.
+    """
+    inserted, updated = [], []
+    for _id, model in incoming.items():
+        if _id not in stored:
+            inserted.append(_id)
+        elif stored[_id] != content_hash(model):
+            updated.append(_id)
+    deleted = [_id for _id in stored if _id not in incoming and _id not in keep]
+    return ChangeSet(
+        collection=collection,
+        inserted=sorted(inserted),
+        updated=sorted(updated),
+        deleted=sorted(deleted),
+    )
+
+
+def _failed_ids(errors: list[RowError]) -> frozenset[int]:
+    # A row that failed to parse is not a deletion.
+    return frozenset(
+        int(error.id) for error in errors if error.id and error.id.isdigit()
+    )
+
+
+@dataclass
+class RefreshPlan:
+    changes: list[ChangeSet] = field(default_factory=list)
+    models: dict[str, list[BattlePet | Ability]] = field(default_factory=dict)
+    errors: dict[str, list[RowError]] = field(default_factory=dict)
+
+    @property
+    def empty(self) -> bool:
+        return all(change.empty for change in self.changes)
+
+    def summary(self) -> str:
+        return "; ".join(
+            f"{c.collection}: {len(c.inserted)} inserted, {len(c.updated)} updated, "
+            f"{len(c.deleted)} deleted, {len(self.errors[c.collection])} bad rows"
+            for c in self.changes
+        )
+
+
+async def plan_refresh(
+    db: DbBase, pets: Optional[Path] = None, abilities: Optional[Path] = None
+) -> RefreshPlan:
+    """Work out what a refresh from the given CSVs would change, without writing."""
+    plan = RefreshPlan()
+    sources = [
+        ("battle_pets", pets, parse_pet_row),
+        ("abilities", abilities, parse_ability_row),
+    ]
+    for collection, path, parse in sources:
+        if path is None:
+            continue
+        incoming, errors = read_models(path, parse)
+        stored = await db.get_content_hashes(collection)
+        change = diff(collection, incoming, stored, _failed_ids(errors))
+        plan.changes.append(change)
+        plan.models[collection] = [incoming[_id] for _id in change.upserted]
+        plan.errors[collection] = errors
+    return plan
+
+
+async def refresh(
+    db: DbBase,
+    pets: Optional[Path] = None,
+    abilities: Optional[Path] = None,
+    dry_run: bool = False,
+) -> RefreshPlan:
+    """Apply only what changed between the CSVs and ``db``; a no-op when nothing did."""
+    plan = await plan_refresh(db, pets, abilities)
+    if not plan.empty and not dry_run:
+        await db.apply_changes(plan.changes, plan.models)
+    return plan
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Apply a new scrape incrementally")
+    parser.add_argument("--pets", type=Path)
+    parser.add_argument("--abilities", type=Path)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report the changes without writing"
+    )
+    args = parser.parse_args()
+
+    from src.repository.clients import close_clients
+    from src.repository.mongo_db import MongoDb
+    from src.repository.pet_data_handler import PetDataHandler
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Through the cache layer, so the change set also evicts and announces.
+    db = PetDataHandler(MongoDb())
+    try:
+        plan = await refresh(db, args.pets, args.abilities, args.dry_run)
+        logger.info(plan.summary())
+        if not plan.empty and not args.dry_run:
+            logger.info(f"Dataset version is now {await db.get_dataset_version()}")
+    finally:
+        await close_clients()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,14 @@
 from pathlib import Path
-from typing import Protocol
-from src.core.models import Ability, BattlePet, PetType
+from typing import Callable, Mapping, Optional, Protocol
+from src.core.models import Ability, BattlePet, ChangeSet, Page, PageQuery, PetType
+from src.repository.csv_ingest import DEFAULT_BATCH_SIZE, IngestReport
 
 
 class DbBase(Protocol):
+    async def ensure_indexes(self) -> None:
+        """Create the indexes the queries rely on."""
+        raise NotImplementedError()
+
     async def get_battle_pet(self, _id: int) -> BattlePet:
         """Retrieve a battle pet by its name."""
         raise NotImplementedError()
@@ -16,6 +21,10 @@ class DbBase(Protocol):
         """Retrieve abilities by their IDs."""
         raise NotImplementedError()
 
+    async def get_battle_pets_by_ids(self, ids: list[int]) -> list[BattlePet]:
+        """Retrieve battle pets by their IDs."""
+        raise NotImplementedError()
+
     async def add_battle_pet(self, pet: BattlePet) -> None:
         """Add a new battle pet to the database."""
         raise NotImplementedError()
@@ -24,10 +33,24 @@ class DbBase(Protocol):
         """Add a new ability to the database."""
         raise NotImplementedError()
 
-    async def populate_battle_pets(self, battle_pets_file: Path) -> None:
+    async def populate_battle_pets(
+        self,
+        battle_pets_file: Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
         """Populate the database with battle pets."""
         raise NotImplementedError()
 
+    async def populate_abilities(
+        self,
+        abilities_file: Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        """Populate the database with abilities."""
+        raise NotImplementedError()
+
     async def get_all_battle_pets(self) -> list[BattlePet]:
         """Retrieve all battle pets from the database."""
         raise NotImplementedError()
@@ -36,6 +59,14 @@ class DbBase(Protocol):
         """Retrieve all abilities from the database."""
         raise NotImplementedError()
 
+    async def get_battle_pets_page(self, query: PageQuery) -> Page:
+        """Retrieve one page of battle pets, sorted and projected as ``query`` asks."""
+        raise NotImplementedError()
+
+    async def get_abilities_page(self, query: PageQuery) -> Page:
+        """Retrieve one page of abilities, sorted and projected as ``query`` asks."""
+        raise NotImplementedError()
+
     async def get_battle_pet_by_type(self, pet_type: PetType) -> list[BattlePet]:
         """Retrieve all battle pets of a specific type."""
         raise NotImplementedError()
@@ -43,3 +74,21 @@ class DbBase(Protocol):
     async def get_ability_by_type(self, ability_type: PetType) -> list[Ability]:
         """Retrieve all abilities of a specific type."""
         raise NotImplementedError()
+
+    async def get_dataset_version(self) -> str:
+        """Return a token that changes whenever the stored pets or abilities change."""
+        raise NotImplementedError()
+
+    async def get_changes_since(self, version: str) -> Optional[list[ChangeSet]]:
+        """Return the change sets written after ``version``, or None if they are not all known."""
+        raise NotImplementedError()
+
+    async def get_content_hashes(self, collection: str) -> dict[int, Optional[str]]:
+        """Return the content hash of every stored pet or ability, by id."""
+        raise NotImplementedError()
+
+    async def apply_changes(
+        self, changes: list[ChangeSet], models: Mapping[str, list[BattlePet | Ability]]
+    ) -> None:
+        """Write the upserted models and delete the deleted ids as one dataset version."""
+        raise NotImplementedError()
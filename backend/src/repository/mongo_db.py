@@ -1,143 +1,346 @@
 import asyncio
-import csv
-import ast
 from pathlib import Path
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import MongoClient  # Used for creating indexes
-from src.core.models import BattlePet, PetType, Ability
+from typing import Any, AsyncIterator, Callable, Iterable, Mapping, Optional, TypeVar
+
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DeleteMany, IndexModel, ReplaceOne, ReturnDocument
+from src.core.models import BattlePet, ChangeSet, Page, PageQuery, PetType, Ability
+from src.core.pagination import SORT_FIELDS, decode_cursor, page_of, returned_fields
+from src.repository.csv_ingest import (
+    CONTENT_HASH_FIELD,
+    DEFAULT_BATCH_SIZE as DEFAULT_INGEST_BATCH_SIZE,
+    IngestReport,
+    ingest_csv,
+    parse_ability_row,
+    parse_pet_row,
+    stored_document,
+)
+from src.repository.clients import close_clients, get_clients
 from src.repository.interface.database import DbBase
 
+M = TypeVar("M", BattlePet, Ability)
+
+# The dataset generation lives in this document of the ``meta`` collection.
+DATASET_META_ID = "dataset"
+# Documents per round trip while a cursor streams.
+DEFAULT_BATCH_SIZE = 500
+# Generations whose change sets are kept; consumers further behind rebuild.
+CHANGE_LOG_LENGTH = 100
+_RAW_BSON = CodecOptions(document_class=RawBSONDocument)
+
+
+def projection(fields: Optional[Iterable[str]] = None) -> dict[str, bool]:
+    """Server-side projection that never returns ``_id``; None keeps every model field."""
+    if fields is None:
+        return {"_id": False, CONTENT_HASH_FIELD: False}
+    return {"_id": False, **{field: True for field in fields}}
+
+
+def keyset_filter(query: PageQuery) -> dict[str, Any]:
+    """Match only the documents after the query's cursor in its sort order."""
+    if query.cursor is None:
+        return {}
+    value, _id = decode_cursor(query.cursor, query)
+    after = "$lt" if query.descending else "$gt"
+    if query.sort == "id":
+        return {"id": {after: _id}}
+    return {
+        "$or": [
+            {query.sort: {after: value}},
+            {query.sort: value, "id": {after: _id}},
+        ]
+    }
+
 
 class MongoDb(DbBase):
-    def __init__(self):
-        # Ensure indexes synchronously with PyMongo
-        pymongo_client = MongoClient("mongodb://localhost:3000/petdb")
-        pm_db = pymongo_client.get_default_database()
-        pm_db.abilities.create_index("id", unique=True)
-        pm_db.battle_pets.create_index("id", unique=True)
-
-        client = AsyncIOMotorClient(
-            "mongodb://localhost:3000/petdb",
-            uuidrepresentation="standard",
+    def __init__(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        database: Optional[AsyncIOMotorDatabase] = None,
+    ):
+        self.batch_size = batch_size
+        self._database = database
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        """``database`` if given, else the database of the shared client.
+
+        Looked up on each use, so every instance shares the connection pool
+        and picks up a registry rebuilt after shutdown.
+        """
+        if self._database is not None:
+            return self._database
+        return get_clients().database
+
+    async def stream_documents(
+        self,
+        collection: str,
+        query: Optional[Mapping[str, Any]] = None,
+        fields: Optional[Iterable[str]] = None,
+        raw: bool = False,
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[Mapping[str, Any]]:
+        """Yield documents as the cursor fetches them, one batch in memory at a time.
+
+        ``fields`` limits what the server sends. With ``raw`` the documents
+        are ``RawBSONDocument``s that keep the BSON bytes and decode only
+        when read, for callers that pass them on or touch a few fields.
+        """
+        source = self.db[collection]
+        if raw:
+            source = source.with_options(codec_options=_RAW_BSON)
+        cursor = source.find(
+            dict(query or {}),
+            projection(fields),
+            batch_size=batch_size or self.batch_size,
+        )
+        async for document in cursor:
+            yield document
+
+    async def stream_models(
+        self,
+        collection: str,
+        model_cls: type[M],
+        query: Optional[Mapping[str, Any]] = None,
+    ) -> AsyncIterator[M]:
+        """Yield validated models one at a time."""
+        async for document in self.stream_documents(collection, query):
+            yield model_cls.model_validate(document)
+
+    def stream_battle_pets(
+        self, query: Optional[Mapping[str, Any]] = None
+    ) -> AsyncIterator[BattlePet]:
+        return self.stream_models("battle_pets", BattlePet, query)
+
+    def stream_abilities(
+        self, query: Optional[Mapping[str, Any]] = None
+    ) -> AsyncIterator[Ability]:
+        return self.stream_models("abilities", Ability, query)
+
+    async def _find_models(
+        self,
+        collection: str,
+        model_cls: type[M],
+        query: Optional[Mapping[str, Any]] = None,
+    ) -> list[M]:
+        return [m async for m in self.stream_models(collection, model_cls, query)]
+
+    async def ensure_indexes(self) -> None:
+        """Create the unique id indexes and one (field, id) index per sortable field.
+
+        The change log is indexed on generation, which every bump trims by
+        and every incremental update reads by. A no-op for indexes that
+        already exist.
+        """
+        for collection, sort_fields in SORT_FIELDS.items():
+            await self.db[collection].create_indexes(
+                [IndexModel("id", unique=True)]
+                + [
+                    IndexModel([(field, ASCENDING), ("id", ASCENDING)])
+                    for field in sort_fields
+                    if field != "id"
+                ]
+            )
+        await self.db["changes"].create_indexes([IndexModel("generation", unique=True)])
+
+    async def _page(self, collection: str, query: PageQuery) -> Page:
+        # Both directions walk the same (field, id) index.
+        direction = -1 if query.descending else 1
+        fields = returned_fields(query)
+        cursor = (
+            self.db[collection]
+            .find(keyset_filter(query), projection(fields), batch_size=query.limit + 1)
+            .sort([(query.sort, direction), ("id", direction)])
+            .limit(query.limit + 1)
         )
-        self.db = client.get_default_database()
-        # self.db.abilities.create_index("id", unique=True) # pyright: ignore[reportUnusedCoroutine]
-        # self.db.battle_pets.create_index("id", unique=True) # pyright: ignore[reportUnusedCoroutine]
+        return page_of(await cursor.to_list(query.limit + 1), query)
+
+    async def get_battle_pets_page(self, query: PageQuery) -> Page:
+        """One page of battle pets, sorted and cut by the server."""
+        return await self._page("battle_pets", query)
+
+    async def get_abilities_page(self, query: PageQuery) -> Page:
+        """One page of abilities, sorted and cut by the server."""
+        return await self._page("abilities", query)
 
     async def get_battle_pet(self, _id: int) -> BattlePet:
         """Retrieve a battle pet by its id."""
-        data = await self.db.battle_pets.find_one({"id": _id})
+        data = await self.db.battle_pets.find_one({"id": _id}, projection())
         if data is None:
             raise ValueError(f"Battle pet with id {_id} not found")
-        data.pop("_id", None)
-        return BattlePet(**data)
+        return BattlePet.model_validate(data)
 
     async def get_ability(self, _id: int) -> Ability:
         """Retrieve an ability by its ID."""
-        data = await self.db.abilities.find_one({"id": _id})
+        data = await self.db.abilities.find_one({"id": _id}, projection())
         if data is None:
             raise ValueError(f"Ability with id {_id} not found")
-        return Ability(**data)
+        return Ability.model_validate(data)
 
     async def get_abilities_by_ids(self, ids: list[int]) -> list[Ability]:
         """Retrieve abilities by their IDs."""
-        cursor = self.db.abilities.find({"id": {"$in": ids}})
-        abilities = []
-        async for document in cursor:
-            document.pop("_id", None)
-            abilities.append(Ability(**document))
-        return abilities
+        return await self._find_models("abilities", Ability, {"id": {"$in": ids}})
+
+    async def get_battle_pets_by_ids(self, ids: list[int]) -> list[BattlePet]:
+        """Retrieve battle pets by their IDs."""
+        return await self._find_models("battle_pets", BattlePet, {"id": {"$in": ids}})
 
     async def add_battle_pet(self, pet: BattlePet) -> None:
         """Add a new battle pet to the database."""
-        await self.db.battle_pets.insert_one(pet.model_dump())
+        await self.db.battle_pets.insert_one(stored_document(pet))
+        await self.bump_dataset_version(
+            [ChangeSet(collection="battle_pets", inserted=[pet.id])]
+        )
 
     async def add_ability(self, ability: Ability) -> None:
         """Add a new ability to the database."""
-        await self.db.abilities.insert_one(ability.model_dump())
+        await self.db.abilities.insert_one(stored_document(ability))
+        await self.bump_dataset_version(
+            [ChangeSet(collection="abilities", inserted=[ability.id])]
+        )
 
     async def get_all_battle_pets(self) -> list[BattlePet]:
         """Retrieve all battle pets from the database."""
-        cursor = self.db.battle_pets.find()
-        pets = []
-        async for document in cursor:
-            document.pop("_id", None)  # <- remove MongoDB's internal _id
-            pets.append(BattlePet(**document))
-        return pets
+        return await self._find_models("battle_pets", BattlePet)
 
     async def get_all_abilities(self) -> list[Ability]:
         """Retrieve all abilities from the database."""
-        cursor = self.db.abilities.find()
-        abilities = []
-        async for document in cursor:
-            document.pop("_id", None)  # <- remove MongoDB's internal _id
-            abilities.append(Ability(**document))
-        return abilities
+        return await self._find_models("abilities", Ability)
 
     async def get_battle_pet_by_type(self, pet_type: PetType) -> list[BattlePet]:
         """Retrieve all battle pets of a specific type."""
-        cursor = self.db.battle_pets.find({"type": pet_type})
-        pets = []
-        async for document in cursor:
-            document.pop("_id", None)  # <- remove MongoDB's internal _id
-            pets.append(BattlePet(**document))
-        return pets
+        return await self._find_models("battle_pets", BattlePet, {"type": pet_type})
 
     async def get_ability_by_type(self, ability_type: PetType) -> list[Ability]:
         """Retrieve all abilities of a specific type."""
-        cursor = self.db.abilities.find({"type": ability_type})
-        abilities = []
-        async for document in cursor:
-            document.pop("_id", None)
-            abilities.append(Ability(**document))
-        return abilities
-
-    async def populate_battle_pets(self, battle_pets_file: Path) -> None:
-        """Populate the database with battle pets."""
-        with battle_pets_file.open(encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    pet = BattlePet(
-                        id=int(row["ID"]),
-                        name=row["Name"],
-                        level=int(row["Level"]),
-                        health=int(row["Health"]),
-                        power=int(row["Power"]),
-                        speed=int(row["Speed"]),
-                        breed=row["Breed"],
-                        abilities=sorted(ast.literal_eval(row["Abilities"])),
-                        source=row["Source"],
-                        type=PetType(row["Type"]),
-                        popularity=int(row["Popularity"]),
-                        is_untameable=row["Untameable"].strip().lower() == "true",
-                    )
-                    # Now do something with the validated pet object
-                    await self.add_battle_pet(pet)  # or add to DB
-                except Exception as e:
-                    print(f"Failed to load pet {row.get('Name', '?')}: {e}")
-
-    async def populate_abilities(self, abilities_file: Path) -> None:
-        """Populate the database with abilities."""
-        with abilities_file.open(encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    ability = Ability(
-                        id=int(row["ID"]),
-                        name=row["Name"],
-                        damage=row["Damage"],
-                        healing=row["Healing"],
-                        duration=row["Duration"],
-                        cooldown=row["Cooldown"],
-                        accuracy=row["Accuracy"],
-                        type=PetType(row["Type"]),
-                        popularity=int(row["Popularity"]),
-                        description=row["Description"],
-                    )
-                    await self.add_ability(ability)
-                except Exception as e:
-                    print(f"Failed to load ability {row.get('Name', '?')}: {e}")
+        return await self._find_models("abilities", Ability, {"type": ability_type})
+
+    async def get_dataset_version(self) -> str:
+        """Return the dataset generation, which every write through this class bumps.
+
+        A single indexed read, unlike hashing both collections.
+        """
+        meta = await self.db.meta.find_one({"_id": DATASET_META_ID})
+        return str(meta["generation"]) if meta else "0"
+
+    async def bump_dataset_version(
+        self, changes: Optional[list[ChangeSet]] = None
+    ) -> str:
+        """Atomically advance the dataset generation and return the new one.
+
+        ``changes`` is logged under the new generation for consumers that
+        update incrementally; None logs a write whose changes are unknown.
+        """
+        meta = await self.db.meta.find_one_and_update(
+            {"_id": DATASET_META_ID},
+            {"$inc": {"generation": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        generation = meta["generation"]
+        await self.db.changes.insert_one(
+            {
+                "generation": generation,
+                "changes": None
+                if changes is None
+                else [change.model_dump() for change in changes],
+            }
+        )
+        await self.db.changes.delete_many(
+            {"generation": {"$lte": generation - CHANGE_LOG_LENGTH}}
+        )
+        return str(generation)
+
+    async def get_changes_since(self, version: str) -> Optional[list[ChangeSet]]:
+        """Every change set logged after ``version``, oldest first.
+
+        None when the log cannot account for each generation since, e.g. a
+        bulk load or an entry that fell off the end of the log.
+        """
+        if not version.isdigit():
+            return None
+        since, until = int(version), int(await self.get_dataset_version())
+        if since > until:
+            return None
+        entries = await self.db.changes.find(
+            {"generation": {"$gt": since, "$lte": until}}, projection()
+        ).to_list(None)
+        if len(entries) != until - since:
+            return None
+        changes = []
+        for entry in sorted(entries, key=lambda e: e["generation"]):
+            if entry["changes"] is None:
+                return None
+            changes.extend(ChangeSet.model_validate(c) for c in entry["changes"])
+        return changes
+
+    async def get_content_hashes(self, collection: str) -> dict[int, Optional[str]]:
+        """Content hash of every stored document, None for documents stored without one."""
+        return {
+            document["id"]: document.get(CONTENT_HASH_FIELD)
+            async for document in self.stream_documents(
+                collection, fields=["id", CONTENT_HASH_FIELD]
+            )
+        }
+
+    async def apply_changes(
+        self, changes: list[ChangeSet], models: Mapping[str, list[BattlePet | Ability]]
+    ) -> None:
+        """Write a refresh and log it as one new generation.
+
+        ``models`` holds the new version of each upserted document, by
+        collection; the deleted ids are removed.
+        """
+        for change in changes:
+            requests = [
+                ReplaceOne({"id": model.id}, stored_document(model), upsert=True)
+                for model in models.get(change.collection, [])
+            ]
+            if change.deleted:
+                requests.append(DeleteMany({"id": {"$in": change.deleted}}))
+            if requests:
+                await self.db[change.collection].bulk_write(requests, ordered=False)
+        await self.bump_dataset_version(changes)
+
+    async def _populate(
+        self,
+        collection: str,
+        path: Path,
+        parse,
+        batch_size: int,
+        progress: Optional[Callable[[IngestReport], None]],
+    ) -> IngestReport:
+        report = await ingest_csv(
+            self.db[collection], path, parse, batch_size, progress
+        )
+        # A rerun of the same file changes nothing, so caches stay valid.
+        if report.changed:
+            await self.bump_dataset_version()
+        return report
+
+    async def populate_battle_pets(
+        self,
+        battle_pets_file: Path,
+        batch_size: int = DEFAULT_INGEST_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        """Upsert every battle pet in the CSV; safe to rerun."""
+        return await self._populate(
+            "battle_pets", battle_pets_file, parse_pet_row, batch_size, progress
+        )
+
+    async def populate_abilities(
+        self,
+        abilities_file: Path,
+        batch_size: int = DEFAULT_INGEST_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        """Upsert every ability in the CSV; safe to rerun."""
+        return await self._populate(
+            "abilities", abilities_file, parse_ability_row, batch_size, progress
+        )
 
 
 # test the populate_battle_pets method
@@ -153,6 +356,7 @@ async def main():
     await mongo_db.populate_battle_pets(battle_pets_file)
     await mongo_db.populate_abilities(abilities_file)
     print(await mongo_db.get_abilities_by_ids([593, 934, 519]))
+    await close_clients()
 
 
 if __name__ == "__main__":
@@ -1,102 +1,367 @@
+import asyncio
+import contextlib
+import logging
+import math
+import random
+import time
 from pathlib import Path
+from typing import Awaitable, Callable, Mapping, Optional, TypeVar
 
+from src.repository.csv_ingest import DEFAULT_BATCH_SIZE, IngestReport
 from src.repository.interface.database import DbBase
-from src.repository.mongo_db import MongoDb
-from src.repository.redis_cache import get_cached, set_cached
-from src.core.models import BattlePet, Ability, PetType
+from src.repository.redis_cache import (
+    get_cached_entry,
+    get_many_cached,
+    invalidate,
+    invalidate_prefix,
+    listen_for_invalidations,
+    set_cached,
+    set_many_cached,
+)
+from src.core.models import BattlePet, Ability, ChangeSet, Page, PageQuery, PetType
+from src.utils.settings import Settings
+from src.utils.single_flight import SingleFlight
 from src.utils.timing import log_execution_time
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", BattlePet, Ability)
+
+# Assumed cost of a load that has not been timed yet, for early refresh.
+_DEFAULT_LOAD_SECONDS = 0.1
+# Without a cache TTL, how long entries of a past generation linger in Redis.
+_GENERATION_KEY_SECONDS = 24 * 3600.0
+
+# Per-id key prefix and aggregate key prefix of each collection.
+_KEY_PREFIXES = {
+    "battle_pets": ("battle_pet", "battle_pets"),
+    "abilities": ("ability", "abilities"),
+}
+
+
+def changed_keys(changes: list[ChangeSet]) -> list[str]:
+    """Every per-id cache key a set of changes can make stale.
+
+    Aggregate and per-type keys carry the generation, so a write moves
+    readers to new keys instead of deleting the old ones.
+    """
+    keys: dict[str, None] = {}
+    for change in changes:
+        if change.empty:
+            continue
+        single, _ = _KEY_PREFIXES[change.collection]
+        for _id in change.upserted + change.deleted:
+            keys[f"{single}:{_id}"] = None
+    return list(keys)
+
 
 class PetDataHandler(DbBase):
-    def __init__(self) -> None:
-        self.db = MongoDb()
+    """Reads through a local cache and Redis to ``db``; writes invalidate both.
+
+    Concurrent misses for one key share a single database load. With a
+    cache TTL, an entry in its last ``cache_stale_seconds`` is still served
+    while one background load replaces it, and hot entries are refreshed a
+    little early at random so they do not all expire at once.
+
+    Writes bump the dataset generation in ``db`` and evict only the per-id
+    keys they affect. Aggregate and per-type keys end in the generation, so
+    a load that raced another worker's write can only repopulate a key of
+    the generation it read. Call ``start`` so that writes made by other
+    workers clear this worker's local cache too and announce their
+    generation; the version is then answered without asking ``db`` for up
+    to ``cache_generation_ttl_seconds``, which bounds how long a missed
+    announcement, or a writer that does not publish, goes unnoticed.
+    """
+
+    def __init__(
+        self, db: Optional[DbBase] = None, settings: Optional[Settings] = None
+    ) -> None:
+        if db is None:
+            from src.repository.mongo_db import MongoDb
+
+            db = MongoDb()
+        settings = settings or Settings.from_env()
+        self.db = db
+        self.ttl = settings.cache_ttl_seconds
+        self.stale_seconds = settings.cache_stale_seconds if self.ttl else 0.0
+        self.early_refresh_beta = settings.cache_early_refresh_beta
+        self.generation_ttl = settings.cache_generation_ttl_seconds
+        self.flights = SingleFlight()
+        self._load_seconds: dict[str, float] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._generation: Optional[str] = None
+        self._generation_at = 0.0
+        # Bumped on every write seen, so loads that raced one skip the write-back.
+        self._writes_seen = 0
+
+    def start(self) -> None:
+        """Listen for cache invalidations from other workers in the background."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(
+                listen_for_invalidations(self._saw_write)
+            )
+            self._listener.add_done_callback(self._listener_done)
+
+    @staticmethod
+    def _listener_done(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Cache invalidation listener stopped", exc_info=task.exception()
+            )
+
+    def _saw_write(self, generation: Optional[str]) -> None:
+        self._writes_seen += 1
+        current = self._generation
+        if (
+            generation is not None
+            and current is not None
+            and generation.isdigit()
+            and current.isdigit()
+            and int(generation) < int(current)
+        ):
+            return
+        self._generation = generation
+        self._generation_at = time.monotonic()
+
+    async def _written(
+        self, keys: Optional[list[str]] = None, prefix: Optional[str] = None
+    ) -> None:
+        generation = await self.db.get_dataset_version()
+        self._saw_write(generation)
+        if prefix is not None:
+            await invalidate_prefix(prefix, generation)
+        else:
+            await invalidate(keys, generation)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+
+    @property
+    def _redis_ttl(self) -> Optional[float]:
+        return self.ttl + self.stale_seconds if self.ttl else None
+
+    def _refresh_due(self, key: str, remaining: float) -> bool:
+        """Whether a hit should also start a background reload.
+
+        Always once the entry is stale; before that with a probability that
+        grows as expiry nears and with how long the load takes (XFetch).
+        """
+        until_stale = remaining - self.stale_seconds
+        if until_stale <= 0:
+            return True
+        if self.early_refresh_beta <= 0:
+            return False
+        load_seconds = self._load_seconds.get(key, _DEFAULT_LOAD_SECONDS)
+        jitter = -math.log(1.0 - random.random())
+        return load_seconds * self.early_refresh_beta * jitter >= until_stale
+
+    async def _load(
+        self, key: str, load: Callable[[], Awaitable], ttl: Optional[float]
+    ):
+        print(f"Fetching {key} from database")
+        writes_seen = self._writes_seen
+        started = time.perf_counter()
+        value = await load()
+        self._load_seconds[key] = time.perf_counter() - started
+        if self._writes_seen == writes_seen:
+            await set_cached(key, value, ttl)
+        return value
+
+    async def _read_through(
+        self, key: str, model_cls: type[T], load: Callable[[], Awaitable]
+    ):
+        return await self._read_through_for(key, model_cls, load, self._redis_ttl)
+
+    async def _read_through_generation(
+        self, key: str, model_cls: type[T], load: Callable[[], Awaitable]
+    ):
+        """Read ``key`` as of the current dataset generation.
+
+        Entries of past generations are never read again, so they expire
+        even when no cache TTL is set.
+        """
+        key = f"{key}:{await self.get_dataset_version()}"
+        ttl = self._redis_ttl or _GENERATION_KEY_SECONDS
+        return await self._read_through_for(key, model_cls, load, ttl)
+
+    async def _read_through_for(
+        self,
+        key: str,
+        model_cls: type[T],
+        load: Callable[[], Awaitable],
+        ttl: Optional[float],
+    ):
+        value, remaining = await get_cached_entry(key, model_cls)
+        if value is None:
+            return await self.flights.run(key, lambda: self._load(key, load, ttl))
+        if remaining is not None and self._refresh_due(key, remaining):
+            self.flights.start(key, lambda: self._load(key, load, ttl))
+        return value
+
+    async def _get_many_by_ids(
+        self,
+        ids: list[int],
+        key_prefix: str,
+        model_cls: type[T],
+        fetch: Callable[[list[int]], Awaitable[list[T]]],
+    ) -> list[T]:
+        """Look up each id under its own cache key, fetching only the misses.
+
+        One MGET for the cache, one bulk query for the misses and one
+        pipelined write-back, whatever the number of ids. Results follow the
+        order of ``ids`` without duplicates; unknown ids are left out.
+        """
+        ids = list(dict.fromkeys(ids))
+        cached = await get_many_cached(
+            [f"{key_prefix}:{_id}" for _id in ids], model_cls
+        )
+        found = {model.id: model for model in cached.values()}
+        missing = [_id for _id in ids if _id not in found]
+        if missing:
+            print(
+                f"Fetching {len(missing)} of {len(ids)} {key_prefix} ids from database"
+            )
+            writes_seen = self._writes_seen
+            fetched = await fetch(missing)
+            found.update((model.id, model) for model in fetched)
+            if self._writes_seen == writes_seen:
+                await set_many_cached(
+                    {f"{key_prefix}:{m.id}": m for m in fetched}, self._redis_ttl
+                )
+        return [found[_id] for _id in ids if _id in found]
 
     @log_execution_time("get_all_battle_pets")
     async def get_all_battle_pets(self) -> list[BattlePet]:
-        cache_key = f"battle_pets:all"
-        cached = await get_cached(cache_key, BattlePet)
-        if cached:
-            print("Returning cached battle pets")
-            return cached
-        print("Fetching battle pets from database")
-        db_pets = await self.db.get_all_battle_pets()
-        await set_cached(cache_key, db_pets)
-        return db_pets
+        return await self._read_through_generation(
+            "battle_pets:all", BattlePet, self.db.get_all_battle_pets
+        )
 
     @log_execution_time("get_battle_pet")
     async def get_battle_pet(self, _id: int) -> BattlePet:
-        cache_key = f"battle_pet:{_id}"
-        cached = await get_cached(cache_key, BattlePet)
-        if cached:
-            print(f"Returning cached battle pet with id {_id}")
-            return cached
-        print(f"Fetching battle pet with id {_id} from database")
-        db_pet = await self.db.get_battle_pet(_id)
-        await set_cached(cache_key, db_pet.model_dump())
-        return db_pet
+        return await self._read_through(
+            f"battle_pet:{_id}", BattlePet, lambda: self.db.get_battle_pet(_id)
+        )
 
     @log_execution_time("get_ability")
     async def get_ability(self, _id: int) -> Ability:
-        cache_key = f"ability:{_id}"
-        cached = await get_cached(cache_key, Ability)
-        if cached:
-            print(f"Returning cached ability with id {_id}")
-            return cached
-        db_ability = await self.db.get_ability(_id)
-        await set_cached(cache_key, db_ability)
-        return db_ability
+        return await self._read_through(
+            f"ability:{_id}", Ability, lambda: self.db.get_ability(_id)
+        )
 
     @log_execution_time("get_abilities_by_ids")
     async def get_abilities_by_ids(self, ids: list[int]) -> list[Ability]:
-        cache_key = f"abilities:ids:{','.join(map(str, ids))}"
-        cached = await get_cached(cache_key, Ability)
-        if cached:
-            print(f"Returning cached abilities with ids {ids}")
-            return cached
-        print(f"Fetching abilities with ids {ids} from database")
-        db_abilities = await self.db.get_abilities_by_ids(ids)
-        await set_cached(cache_key, db_abilities)
-        return db_abilities
+        return await self._get_many_by_ids(
+            ids, "ability", Ability, self.db.get_abilities_by_ids
+        )
+
+    @log_execution_time("get_battle_pets_by_ids")
+    async def get_battle_pets_by_ids(self, ids: list[int]) -> list[BattlePet]:
+        return await self._get_many_by_ids(
+            ids, "battle_pet", BattlePet, self.db.get_battle_pets_by_ids
+        )
+
+    async def add_battle_pet(self, pet: BattlePet) -> None:
+        await self.db.add_battle_pet(pet)
+        await self._written([f"battle_pet:{pet.id}"])
+
+    async def add_ability(self, ability: Ability) -> None:
+        await self.db.add_ability(ability)
+        await self._written([f"ability:{ability.id}"])
 
     @log_execution_time("populate_battle_pets")
-    async def populate_battle_pets(self, battle_pets_file: Path) -> None:
-        """Populate the database with battle pets from a file. Do nothing for cache"""
-        await self.db.populate_battle_pets(battle_pets_file)
+    async def populate_battle_pets(
+        self,
+        battle_pets_file: Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        """Load battle pets from a file, then drop every cached pet if any changed.
+
+        Rerunning an unchanged file leaves the caches alone.
+        """
+        report = await self.db.populate_battle_pets(
+            battle_pets_file, batch_size, progress
+        )
+        if report.changed:
+            await self._written(prefix="battle_pet:")
+        return report
+
+    @log_execution_time("populate_abilities")
+    async def populate_abilities(
+        self,
+        abilities_file: Path,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[IngestReport], None]] = None,
+    ) -> IngestReport:
+        """Load abilities from a file, then drop every cached ability if any changed."""
+        report = await self.db.populate_abilities(abilities_file, batch_size, progress)
+        if report.changed:
+            await self._written(prefix="ability:")
+        return report
 
     @log_execution_time("get_all_abilities")
     async def get_all_abilities(self) -> list[Ability]:
-        cache_key = f"abilities:all"
-        cached = await get_cached(cache_key, Ability)
-        if cached:
-            print("Returning cached abilities")
-            return cached
-        print("Fetching abilities from database")
-        db_abilities = await self.db.get_all_abilities()
-        await set_cached(cache_key, db_abilities)
-        return db_abilities
+        return await self._read_through_generation(
+            "abilities:all", Ability, self.db.get_all_abilities
+        )
+
+    async def get_battle_pets_page(self, query: PageQuery) -> Page:
+        """One page of battle pets, cut by ``db`` along its (field, id) index.
+
+        Not cached here; the app caches each page's response per dataset version.
+        """
+        return await self.db.get_battle_pets_page(query)
+
+    async def get_abilities_page(self, query: PageQuery) -> Page:
+        """One page of abilities, cut by ``db``."""
+        return await self.db.get_abilities_page(query)
 
     @log_execution_time("get_ability_by_type")
     async def get_ability_by_type(self, ability_type: PetType) -> list[Ability]:
-        cache_key = f"abilities:type:{ability_type}"
-        cached = await get_cached(cache_key, Ability)
-        if cached:
-            print(f"Returning cached abilities of type {ability_type}")
-            return cached
-        print(f"Fetching abilities of type {ability_type} from database")
-        db_abilities = await self.db.get_ability_by_type(ability_type)
-        await set_cached(cache_key, db_abilities)
-        return db_abilities
+        return await self._read_through_generation(
+            f"abilities:type:{ability_type}",
+            Ability,
+            lambda: self.db.get_ability_by_type(ability_type),
+        )
 
     @log_execution_time("get_battle_pet_by_type")
     async def get_battle_pet_by_type(self, pet_type: PetType) -> list[BattlePet]:
-        cache_key = f"battle_pets:type:{pet_type}"
-        cached = await get_cached(cache_key, BattlePet)
-        if cached:
-            print(f"Returning cached battle pets of type {pet_type}")
-            return cached
-        print(f"Fetching battle pets of type {pet_type} from database")
-        db_pets = await self.db.get_battle_pet_by_type(pet_type)
-        await set_cached(cache_key, db_pets)
-        return db_pets
+        return await self._read_through_generation(
+            f"battle_pets:type:{pet_type}",
+            BattlePet,
+            lambda: self.db.get_battle_pet_by_type(pet_type),
+        )
+
+    async def apply_changes(
+        self, changes: list[ChangeSet], models: Mapping[str, list[BattlePet | Ability]]
+    ) -> None:
+        """Write a refresh, then evict only the keys its changes touch."""
+        await self.db.apply_changes(changes, models)
+        await self._written(changed_keys(changes))
+
+    async def get_changes_since(self, version: str) -> Optional[list[ChangeSet]]:
+        return await self.db.get_changes_since(version)
+
+    async def get_content_hashes(self, collection: str) -> dict[int, Optional[str]]:
+        return await self.db.get_content_hashes(collection)
 
+    async def ensure_indexes(self) -> None:
+        await self.db.ensure_indexes()
 
+    async def get_dataset_version(self) -> str:
+        """The dataset generation, asked of ``db`` only while no listener keeps it current."""
+        if self._listener is None or self._listener.done():
+            return await self.db.get_dataset_version()
+        expired = time.monotonic() - self._generation_at >= self.generation_ttl
+        if self._generation is None or expired:
+            writes_seen = self._writes_seen
+            generation = await self.db.get_dataset_version()
+            if self._writes_seen == writes_seen:
+                self._generation = generation
+                self._generation_at = time.monotonic()
+            return generation
+        return self._generation
@@ -1,40 +1,291 @@
 import asyncio
+import json
+import logging
+from typing import Callable, Iterable, Mapping, Optional, Type, TypeVar
 
-from typing import Type, TypeVar
 import redis.asyncio as redis
-import json
+from src.core.query_cache import QueryCache
+from src.repository.cache_codec import CacheCodec
+from src.repository.clients import get_clients
+from src.utils.settings import Settings
+
+logger = logging.getLogger(__name__)
+
 T = TypeVar("T")
 
-redis_client = redis.Redis(host="localhost", port=6379, decode_responses=True)
+# Workers publish the keys they invalidate here, with the dataset generation
+# their write produced; "*" drops every local entry.
+INVALIDATION_CHANNEL = "battler:cache:invalidate"
+
+_codec: Optional[CacheCodec] = None
+_local: Optional[QueryCache] = None
+
+
+class TierCounters:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def metrics(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+redis_counters = TierCounters()
+
+
+def get_codec() -> CacheCodec:
+    global _codec
+    if _codec is None:
+        settings = Settings.from_env()
+        _codec = CacheCodec(
+            settings.cache_codec,
+            compress_threshold=settings.cache_compress_threshold,
+        )
+    return _codec
+
+
+def set_codec(codec: CacheCodec) -> None:
+    global _codec
+    _codec = codec
+
+
+def get_local_cache() -> QueryCache:
+    """In-process tier in front of Redis, bounded in size and age.
+
+    The TTL caps staleness if an invalidation message is ever missed. Lists
+    are stored as tuples and the models are shared, so treat them as
+    read-only.
+    """
+    global _local
+    if _local is None:
+        settings = Settings.from_env()
+        _local = QueryCache(settings.cache_local_size, settings.cache_local_ttl_seconds)
+    return _local
+
+
+def set_local_cache(cache: QueryCache) -> None:
+    global _local
+    _local = cache
+
+
+def _remember(key: str, value) -> None:
+    get_local_cache().set(key, tuple(value) if isinstance(value, list) else value)
+
+
+def _recall(key: str):
+    value = get_local_cache().get(key)
+    return list(value) if isinstance(value, tuple) else value
+
+
+async def metrics() -> dict[str, dict[str, float]]:
+    """Hits, misses and evictions of both tiers.
+
+    Redis evictions come from ``INFO stats`` and count every key the server
+    dropped under ``maxmemory``, not only this app's; they are left out
+    while Redis cannot be reached.
+    """
+    redis_metrics = redis_counters.metrics()
+    try:
+        stats = await _redis().info("stats")
+        redis_metrics["evictions"] = stats.get("evicted_keys", 0)
+    except (redis.ConnectionError, redis.TimeoutError) as e:
+        logger.warning(f"Could not read Redis eviction stats: {e}")
+    return {
+        "local_cache": get_local_cache().metrics(),
+        "redis_cache": redis_metrics,
+    }
+
+
+def _redis() -> redis.Redis:
+    return get_clients().redis
+
+
+def _milliseconds(ttl: Optional[float]) -> Optional[int]:
+    return int(ttl * 1000) if ttl else None
+
+
+async def set_cached(key: str, value, ttl: Optional[float] = None) -> None:
+    """Store ``value``; Redis drops it after ``ttl`` seconds if one is given."""
+    # Pydantic models and lists of them are dumped by the codec
+    await _redis().set(key, get_codec().encode(value), px=_milliseconds(ttl))
+    _remember(key, value)
+
+
+async def get_cached_entry(
+    key: str, model_cls: type[T]
+) -> tuple[T | list[T] | None, Optional[float]]:
+    """The cached value and the seconds Redis keeps it for, in one round trip.
+
+    The seconds are None for local hits and keys without a TTL.
+    """
+    value = _recall(key)
+    if value is not None:
+        return value, None
+    async with _redis().pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        pipe.pttl(key)
+        raw, remaining_ms = await pipe.execute()
+    # Values in an unreadable format decode to None and count as a miss
+    value = get_codec().decode_models(raw, model_cls) if raw else None
+    if value is None:
+        redis_counters.misses += 1
+        return None, None
+    redis_counters.hits += 1
+    _remember(key, value)
+    return value, remaining_ms / 1000 if remaining_ms >= 0 else None
 
-async def set_cached(key: str, value) -> None:
-    # Automatically serialize Pydantic models or lists of them
-    if hasattr(value, "model_dump"):
-        value = value.model_dump()
-    elif isinstance(value, list) and hasattr(value[0], "model_dump"):
-        value = [v.model_dump() for v in value]
-    await redis_client.set(key, json.dumps(value))
 
 async def get_cached(key: str, model_cls: type[T]) -> T | list[T] | None:
-    raw = await redis_client.get(key)
-    if not raw:
+    value = _recall(key)
+    if value is not None:
+        return value
+    raw = await _redis().get(key)
+    # Values in an unreadable format decode to None and count as a miss
+    value = get_codec().decode_models(raw, model_cls) if raw else None
+    if value is None:
+        redis_counters.misses += 1
         return None
-    data = json.loads(raw)
-    # If it's a list of objects (like list of BattlePets)
-    if isinstance(data, list):
-        return [model_cls.model_validate(item) for item in data]
+    redis_counters.hits += 1
+    _remember(key, value)
+    return value
 
-    return model_cls.model_validate(data)
 
 async def get_cached_list(key: str, model_cls: Type[T]) -> list[T] | None:
-    raw = await redis_client.get(key)
-    if not raw:
-        return None
-    data = json.loads(raw)
+    return await get_cached(key, model_cls)
+
+
+async def get_many_cached(keys: Iterable[str], model_cls: Type[T]) -> dict[str, T]:
+    """Fetch several single-model keys, local hits first and the rest in one MGET.
+
+    Misses are left out.
+    """
+    found = {}
+    remote = []
+    for key in dict.fromkeys(keys):
+        value = _recall(key)
+        if value is None:
+            remote.append(key)
+        else:
+            found[key] = value
+    if not remote:
+        return found
+    codec = get_codec()
+    for key, raw in zip(remote, await _redis().mget(remote)):
+        model = codec.decode_models(raw, model_cls) if raw else None
+        if model is None:
+            redis_counters.misses += 1
+            continue
+        redis_counters.hits += 1
+        found[key] = model
+        _remember(key, model)
+    return found
+
+
+async def set_many_cached(
+    values: Mapping[str, object], ttl: Optional[float] = None
+) -> None:
+    """Write several keys in one pipelined round trip."""
+    if not values:
+        return
+    codec = get_codec()
+    async with _redis().pipeline(transaction=False) as pipe:
+        for key, value in values.items():
+            pipe.set(key, codec.encode(value), px=_milliseconds(ttl))
+        await pipe.execute()
+    for key, value in values.items():
+        _remember(key, value)
+
+
+def _invalidation(keys, generation: Optional[str]) -> str:
+    return json.dumps({"keys": keys, "generation": generation})
+
+
+async def invalidate(keys: Iterable[str], generation: Optional[str] = None) -> None:
+    """Delete ``keys`` from Redis and from every worker's local cache.
+
+    ``generation`` is the dataset generation the write produced, passed on
+    to the other workers.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    get_local_cache().discard(keys)
+    await _redis().delete(*keys)
+    await _redis().publish(INVALIDATION_CHANNEL, _invalidation(keys, generation))
+
+
+async def invalidate_prefix(prefix: str, generation: Optional[str] = None) -> None:
+    """Delete every Redis key starting with ``prefix`` and clear all local caches.
+
+    For bulk writes whose affected keys are not known up front.
+    """
+    get_local_cache().clear()
+    keys = [key async for key in _redis().scan_iter(match=f"{prefix}*")]
+    if keys:
+        await _redis().delete(*keys)
+    await _redis().publish(INVALIDATION_CHANNEL, _invalidation("*", generation))
+
+
+def apply_invalidation(message: bytes) -> Optional[str]:
+    """Drop the local entries named in an invalidation message.
+
+    Returns the dataset generation it announces, if any.
+    """
+    invalidation = json.loads(message)
+    if invalidation["keys"] == "*":
+        get_local_cache().clear()
+    else:
+        get_local_cache().discard(invalidation["keys"])
+    return invalidation["generation"]
+
+
+async def listen_for_invalidations(
+    on_generation: Callable[[Optional[str]], None],
+    retry_seconds: float = 1.0,
+    poll_seconds: float = 1.0,
+) -> None:
+    """Apply invalidations published by other workers until cancelled.
+
+    ``on_generation`` hears every announced dataset generation, and None
+    after a reconnect, when announcements may have been missed.
 
-    if isinstance(data, list):
-        return [model_cls.model_validate(item) for item in data]
-    return model_cls.model_validate(data)
+    Messages are read with an explicit ``poll_seconds`` timeout: older
+    redis-py versions apply the pool's ``socket_timeout`` to ``listen()``
+    and would drop the subscription whenever the channel is quiet.
+    """
+    while True:
+        try:
+            async with _redis().pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Anything published while we were not subscribed is lost.
+                get_local_cache().clear()
+                on_generation(None)
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=poll_seconds
+                    )
+                    if message is None or message["type"] != "message":
+                        continue
+                    try:
+                        generation = apply_invalidation(message["data"])
+                    except (ValueError, KeyError, TypeError) as e:
+                        # Something was written, but not what: drop it all.
+                        logger.warning(
+                            f"Unreadable cache invalidation {message['data']!r}: {e}"
+                        )
+                        get_local_cache().clear()
+                        on_generation(None)
+                        continue
+                    if generation is not None:
+                        on_generation(generation)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            logger.warning(f"Cache invalidation listener lost Redis: {e}")
+            await asyncio.sleep(retry_seconds)
 
 
 async def main():
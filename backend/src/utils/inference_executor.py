@@ -0,0 +1,69 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ExecutorSaturated(Exception):
+    """Raised instead of queueing when the inference executor is full."""
+
+
+class InferenceExecutor:
+    """Bounded thread pool for model inference and FAISS work.
+
+    Encoding and FAISS searches release the GIL for most of their run time,
+    so threads keep them off the event loop without copying the model into
+    other processes. At most ``max_workers`` jobs run and ``max_queue_depth``
+    more wait; anything beyond that is rejected with ``ExecutorSaturated``
+    so callers can shed load instead of piling up latency.
+
+    With more than one worker, jobs run concurrently: whatever they share
+    must be thread-safe, as ``DocumentIndex`` is through its lock.
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue_depth: int = 16) -> None:
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._in_flight - self.max_workers, 0)
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        if self._in_flight >= self.max_workers + self.max_queue_depth:
+            self.rejected += 1
+            raise ExecutorSaturated(
+                f"Inference queue is full ({self.max_queue_depth} waiting)"
+            )
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="inference"
+            )
+        self._in_flight += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(fn, *args, **kwargs)
+            )
+            self.completed += 1
+            return result
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
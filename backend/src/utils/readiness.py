@@ -0,0 +1,72 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class NotReady(Exception):
+    """Raised by a subsystem that is still warming up."""
+
+
+@dataclass
+class SubsystemState:
+    state: str = PENDING
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        seconds = None
+        if self.started is not None:
+            seconds = (self.finished or time.perf_counter()) - self.started
+        return {"state": self.state, "seconds": seconds, "error": self.error}
+
+
+class Readiness:
+    """Warm-up state of each named subsystem, for the readiness endpoint."""
+
+    def __init__(self, names: list[str]) -> None:
+        self.subsystems = {name: SubsystemState() for name in names}
+
+    async def run(self, name: str, warm_up: Callable[[], Awaitable]) -> bool:
+        """Run ``warm_up`` and record how it went; failures are logged, not raised."""
+        subsystem = self.subsystems[name]
+        subsystem.state = LOADING
+        subsystem.started = time.perf_counter()
+        try:
+            await warm_up()
+        except Exception as e:
+            subsystem.state = FAILED
+            subsystem.error = repr(e)
+            logger.exception(f"Warm-up of {name} failed")
+            return False
+        finally:
+            subsystem.finished = time.perf_counter()
+        subsystem.state = READY
+        logger.info(f"{name} ready in {subsystem.finished - subsystem.started:.2f}s")
+        return True
+
+    def skip(self, name: str, reason: str) -> None:
+        subsystem = self.subsystems[name]
+        subsystem.state = FAILED
+        subsystem.error = reason
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        if name is not None:
+            return self.subsystems[name].state == READY
+        return all(s.state == READY for s in self.subsystems.values())
+
+    def report(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "subsystems": {
+                name: subsystem.as_dict() for name, subsystem in self.subsystems.items()
+            },
+        }
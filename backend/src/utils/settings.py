@@ -0,0 +1,174 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Runtime configuration, read from ``BATTLER_*`` environment variables."""
+
+    catalog_mode: bool = False
+    catalog_refresh_seconds: float = 60.0
+    index_dir: Path = BACKEND_DIR / ".index_cache"
+    search_batch_window_ms: float = 5.0
+    search_batch_max_size: int = 32
+    inference_workers: int = 1
+    inference_queue_depth: int = 16
+    search_cache_size: int = 1024
+    search_cache_ttl_seconds: float = 3600.0
+    search_cache_shared: bool = False
+    search_index_type: str = "flat"
+    search_hnsw_m: int = 32
+    search_hnsw_ef_search: int = 64
+    search_ivf_nprobe: int = 8
+    search_pq_m: int = 16
+    search_shared_index: bool = False
+    inference_socket: Optional[Path] = None
+    cache_codec: str = "json"
+    cache_compress_threshold: int = 0
+    cache_local_size: int = 1024
+    cache_local_ttl_seconds: float = 30.0
+    cache_ttl_seconds: float = 0.0
+    cache_stale_seconds: float = 0.0
+    cache_early_refresh_beta: float = 1.0
+    cache_generation_ttl_seconds: float = 5.0
+    mongo_uri: str = "mongodb://localhost:3000/petdb"
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 2
+    mongo_max_idle_seconds: float = 300.0
+    mongo_connect_timeout_seconds: float = 5.0
+    mongo_server_selection_timeout_seconds: float = 5.0
+    mongo_socket_timeout_seconds: float = 30.0
+    redis_url: str = "redis://localhost:6379/0"
+    redis_max_connections: int = 50
+    redis_pool_timeout_seconds: float = 5.0
+    redis_connect_timeout_seconds: float = 2.0
+    redis_socket_timeout_seconds: float = 5.0
+    redis_health_check_seconds: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            catalog_mode=_env_bool("BATTLER_CATALOG_MODE", cls.catalog_mode),
+            catalog_refresh_seconds=_env_float(
+                "BATTLER_CATALOG_REFRESH_SECONDS", cls.catalog_refresh_seconds
+            ),
+            index_dir=Path(os.environ.get("BATTLER_INDEX_DIR", cls.index_dir)),
+            search_batch_window_ms=_env_float(
+                "BATTLER_SEARCH_BATCH_WINDOW_MS", cls.search_batch_window_ms
+            ),
+            search_batch_max_size=_env_int(
+                "BATTLER_SEARCH_BATCH_MAX_SIZE", cls.search_batch_max_size
+            ),
+            inference_workers=_env_int(
+                "BATTLER_INFERENCE_WORKERS", cls.inference_workers
+            ),
+            inference_queue_depth=_env_int(
+                "BATTLER_INFERENCE_QUEUE_DEPTH", cls.inference_queue_depth
+            ),
+            search_cache_size=_env_int(
+                "BATTLER_SEARCH_CACHE_SIZE", cls.search_cache_size
+            ),
+            search_cache_ttl_seconds=_env_float(
+                "BATTLER_SEARCH_CACHE_TTL_SECONDS", cls.search_cache_ttl_seconds
+            ),
+            search_cache_shared=_env_bool(
+                "BATTLER_SEARCH_CACHE_SHARED", cls.search_cache_shared
+            ),
+            search_index_type=os.environ.get(
+                "BATTLER_SEARCH_INDEX_TYPE", cls.search_index_type
+            ),
+            search_hnsw_m=_env_int("BATTLER_SEARCH_HNSW_M", cls.search_hnsw_m),
+            search_hnsw_ef_search=_env_int(
+                "BATTLER_SEARCH_HNSW_EF_SEARCH", cls.search_hnsw_ef_search
+            ),
+            search_ivf_nprobe=_env_int(
+                "BATTLER_SEARCH_IVF_NPROBE", cls.search_ivf_nprobe
+            ),
+            search_pq_m=_env_int("BATTLER_SEARCH_PQ_M", cls.search_pq_m),
+            search_shared_index=_env_bool(
+                "BATTLER_SEARCH_SHARED_INDEX", cls.search_shared_index
+            ),
+            inference_socket=Path(os.environ["BATTLER_INFERENCE_SOCKET"])
+            if os.environ.get("BATTLER_INFERENCE_SOCKET")
+            else cls.inference_socket,
+            cache_codec=os.environ.get("BATTLER_CACHE_CODEC", cls.cache_codec),
+            cache_compress_threshold=_env_int(
+                "BATTLER_CACHE_COMPRESS_THRESHOLD", cls.cache_compress_threshold
+            ),
+            cache_local_size=_env_int("BATTLER_CACHE_LOCAL_SIZE", cls.cache_local_size),
+            cache_local_ttl_seconds=_env_float(
+                "BATTLER_CACHE_LOCAL_TTL_SECONDS", cls.cache_local_ttl_seconds
+            ),
+            cache_ttl_seconds=_env_float(
+                "BATTLER_CACHE_TTL_SECONDS", cls.cache_ttl_seconds
+            ),
+            cache_stale_seconds=_env_float(
+                "BATTLER_CACHE_STALE_SECONDS", cls.cache_stale_seconds
+            ),
+            cache_early_refresh_beta=_env_float(
+                "BATTLER_CACHE_EARLY_REFRESH_BETA", cls.cache_early_refresh_beta
+            ),
+            cache_generation_ttl_seconds=_env_float(
+                "BATTLER_CACHE_GENERATION_TTL_SECONDS",
+                cls.cache_generation_ttl_seconds,
+            ),
+            mongo_uri=os.environ.get("BATTLER_MONGO_URI", cls.mongo_uri),
+            mongo_max_pool_size=_env_int(
+                "BATTLER_MONGO_MAX_POOL_SIZE", cls.mongo_max_pool_size
+            ),
+            mongo_min_pool_size=_env_int(
+                "BATTLER_MONGO_MIN_POOL_SIZE", cls.mongo_min_pool_size
+            ),
+            mongo_max_idle_seconds=_env_float(
+                "BATTLER_MONGO_MAX_IDLE_SECONDS", cls.mongo_max_idle_seconds
+            ),
+            mongo_connect_timeout_seconds=_env_float(
+                "BATTLER_MONGO_CONNECT_TIMEOUT_SECONDS",
+                cls.mongo_connect_timeout_seconds,
+            ),
+            mongo_server_selection_timeout_seconds=_env_float(
+                "BATTLER_MONGO_SERVER_SELECTION_TIMEOUT_SECONDS",
+                cls.mongo_server_selection_timeout_seconds,
+            ),
+            mongo_socket_timeout_seconds=_env_float(
+                "BATTLER_MONGO_SOCKET_TIMEOUT_SECONDS", cls.mongo_socket_timeout_seconds
+            ),
+            redis_url=os.environ.get("BATTLER_REDIS_URL", cls.redis_url),
+            redis_max_connections=_env_int(
+                "BATTLER_REDIS_MAX_CONNECTIONS", cls.redis_max_connections
+            ),
+            redis_pool_timeout_seconds=_env_float(
+                "BATTLER_REDIS_POOL_TIMEOUT_SECONDS", cls.redis_pool_timeout_seconds
+            ),
+            redis_connect_timeout_seconds=_env_float(
+                "BATTLER_REDIS_CONNECT_TIMEOUT_SECONDS",
+                cls.redis_connect_timeout_seconds,
+            ),
+            redis_socket_timeout_seconds=_env_float(
+                "BATTLER_REDIS_SOCKET_TIMEOUT_SECONDS", cls.redis_socket_timeout_seconds
+            ),
+            redis_health_check_seconds=_env_float(
+                "BATTLER_REDIS_HEALTH_CHECK_SECONDS", cls.redis_health_check_seconds
+            ),
+        )
@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent loads of the same key into one call.
+
+    The first caller for a key starts ``load`` in a task; everyone who asks
+    for that key before it finishes awaits the same task. A caller that is
+    cancelled does not cancel the load for the others.
+    """
+
+    def __init__(self) -> None:
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.loads = 0
+        self.coalesced = 0
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def _task(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        self.loads += 1
+        task = asyncio.create_task(load())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return task
+
+    async def run(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        return await asyncio.shield(self._task(key, load))
+
+    def start(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> None:
+        """Load ``key`` in the background unless a load is already running."""
+        if key not in self._in_flight:
+            self._task(key, load).add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh failed: {task.exception()!r}")
+
+    def metrics(self) -> dict[str, float]:
+        return {"loads": self.loads, "coalesced": self.coalesced}
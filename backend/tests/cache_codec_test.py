@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from src.core.models import Ability, BattlePet, PetType
+from src.repository.cache_codec import SERIALIZERS, CacheCodec
+from tests.fakes import load_abilities, load_pets
+
+PETS = load_pets()[:50]
+ABILITIES = load_abilities()[:50]
+
+
+def codecs():
+    for name in SERIALIZERS:
+        for threshold in (0, 1):
+            try:
+                yield CacheCodec(name, compress_threshold=threshold)
+            except ImportError:
+                continue
+
+
+@pytest.mark.parametrize("codec", list(codecs()), ids=lambda c: c.name)
+def test_round_trips_models_and_lists(codec):
+    assert codec.decode_models(codec.encode(PETS), BattlePet) == PETS
+    abilities = codec.decode_models(codec.encode(ABILITIES), Ability)
+    assert [a.model_dump() for a in abilities] == [a.model_dump() for a in ABILITIES]
+    pet = codec.decode_models(codec.encode(PETS[0]), BattlePet)
+    assert pet == PETS[0]
+    # PetType members are dict keys elsewhere, so the enum has to come back
+    assert type(pet.type) is PetType
+    assert codec.decode(codec.encode({"a": [1, 2]})) == {"a": [1, 2]}
+
+
+def test_compresses_only_values_over_threshold():
+    pytest.importorskip("zstandard")
+    codec = CacheCodec("json", compress_threshold=1024)
+    small, large = codec.encode(PETS[0]), codec.encode(PETS)
+    assert len(small) < 1024 and small[0] == 1
+    assert len(large) < len(CacheCodec("json").encode(PETS)) and large[0] & 0x80
+
+
+def test_reads_values_written_by_another_serializer():
+    pytest.importorskip("orjson")
+    raw = CacheCodec("orjson").encode(PETS)
+    assert CacheCodec("json").decode_models(raw, BattlePet) == PETS
+
+
+def test_unreadable_values_are_misses():
+    codec = CacheCodec("json")
+    legacy = json.dumps([p.model_dump() for p in PETS]).encode("utf-8")
+    assert codec.decode_models(legacy, BattlePet) is None
+    assert codec.decode_models(b"\x7fgarbage", BattlePet) is None
+    assert codec.decode(b"") is None
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from src.core.models import BattlePet, PetType
+from src.repository.catalog import CatalogDataHandler
+from tests.fakes import InMemoryDb, load_abilities, load_pets
+
+
+def make_catalog() -> tuple[InMemoryDb, CatalogDataHandler]:
+    source = InMemoryDb(load_pets(), load_abilities())
+    return source, CatalogDataHandler(source=source, refresh_interval=0)
+
+
+def test_reads_match_source_without_round_trips():
+    source, catalog = make_catalog()
+
+    async def run():
+        await catalog.load()
+        loads = dict(source.calls)
+        for pet_type in PetType:
+            assert await catalog.get_battle_pet_by_type(
+                pet_type
+            ) == await source.get_battle_pet_by_type(pet_type)
+        pet = source.pets[0]
+        assert await catalog.get_battle_pet(pet.id) is pet
+        assert len(await catalog.get_all_abilities()) == len(source.abilities)
+        return loads
+
+    loads = asyncio.run(run())
+    assert loads == {"get_all_battle_pets": 1, "get_all_abilities": 1}
+
+
+def test_missing_ids_raise_like_mongo():
+    _, catalog = make_catalog()
+    with pytest.raises(ValueError):
+        asyncio.run(catalog.get_battle_pet(-42))
+
+
+def test_ability_index_points_back_to_pets():
+    source, catalog = make_catalog()
+    pet = source.pets[0]
+    ability_id = pet.abilities[0]
+    owners = asyncio.run(catalog.get_pets_with_ability(ability_id))
+    assert pet in owners
+    assert all(ability_id in owner.abilities for owner in owners)
+
+
+def test_refresh_swaps_only_when_version_changes():
+    source, catalog = make_catalog()
+
+    async def run():
+        first = await catalog.load()
+        assert await catalog.refresh() is False
+        assert catalog.snapshot is first
+
+        new_pet = source.pets[0].model_copy(update={"id": 999999})
+        source.pets.append(new_pet)
+        source.version += 1
+        assert await catalog.refresh() is True
+        assert catalog.snapshot is not first
+        assert isinstance(await catalog.get_battle_pet(999999), BattlePet)
+
+    asyncio.run(run())
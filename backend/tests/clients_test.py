@@ -0,0 +1,43 @@
+import asyncio
+
+from src.repository import clients
+from src.repository.clients import Clients, close_clients, get_clients, set_clients
+from src.repository.mongo_db import MongoDb
+from src.utils.settings import Settings
+
+
+def test_pools_follow_the_settings():
+    settings = Settings(
+        mongo_uri="mongodb://db.example:27017/pets",
+        mongo_max_pool_size=7,
+        mongo_server_selection_timeout_seconds=1.5,
+        redis_url="redis://cache.example:6380/2",
+        redis_max_connections=9,
+        redis_pool_timeout_seconds=0.5,
+    )
+    registry = Clients(settings)
+
+    options = registry.mongo.options
+    assert options.pool_options.max_pool_size == 7
+    assert options.server_selection_timeout == 1.5
+    assert registry.database.name == "pets"
+
+    pool = registry.redis.connection_pool
+    assert pool.max_connections == 9
+    assert pool.timeout == 0.5
+    assert pool.connection_kwargs["host"] == "cache.example"
+    assert registry.sync_redis.connection_pool.max_connections == 9
+    asyncio.run(registry.close())
+
+
+def test_repositories_share_one_client_until_closed(monkeypatch):
+    monkeypatch.setattr(clients, "_clients", None)
+    set_clients(Clients(Settings()))
+    first, second = MongoDb(), MongoDb()
+    assert first.db.client is second.db.client
+
+    before = get_clients()
+    asyncio.run(close_clients())
+    assert clients._clients is None
+    assert get_clients() is not before
+    asyncio.run(close_clients())
@@ -0,0 +1,55 @@
+from src.core.counter_index import CounterIndex, deals_damage
+from src.core.models import PetType
+from src.core.pet_type_chart import find_types_strong_against, pet_type_matrix
+from tests.fakes import load_abilities, load_pets
+
+PETS = load_pets()
+ABILITIES = load_abilities()
+INDEX = CounterIndex.build(PETS, ABILITIES, version="1")
+
+
+def brute_force_strong(target: PetType) -> set[int]:
+    strong_types = set(find_types_strong_against(target))
+    damaging = {a.id for a in ABILITIES if a.type in strong_types and deals_damage(a)}
+    return {p.id for p in PETS if damaging.intersection(p.abilities)}
+
+
+def brute_force_defensive(target: PetType) -> set[int]:
+    resistant = set(pet_type_matrix[target]["weak_against"])
+    return {p.id for p in PETS if p.type in resistant}
+
+
+def test_tables_match_brute_force():
+    for target in PetType:
+        strong = brute_force_strong(target)
+        defensive = brute_force_defensive(target)
+        assert set(INDEX.strong[target].tolist()) == strong
+        assert set(INDEX.defensive[target].tolist()) == defensive
+        assert set(INDEX.double[target].tolist()) == strong & defensive
+
+
+def test_tables_are_sorted_and_read_only():
+    ids = INDEX.double[PetType.AQUATIC]
+    assert ids.tolist() == sorted(ids.tolist())
+    assert not ids.flags.writeable
+
+
+def test_pets_resolves_ids():
+    pets = INDEX.pets(INDEX.double[PetType.BEAST])
+    assert [p.id for p in pets] == INDEX.double[PetType.BEAST].tolist()
+
+
+def test_updated_matches_a_rebuild():
+    abilities_by_id = {a.id: a for a in ABILITIES}
+    moved = PETS[0].model_copy(update={"type": PetType.UNDEAD, "abilities": []})
+    removed = [PETS[1].id, PETS[2].id]
+    pets = [moved] + [p for p in PETS[1:] if p.id not in removed]
+
+    updated = INDEX.updated([moved], removed, abilities_by_id, version="2")
+    rebuilt = CounterIndex.build(pets, ABILITIES, version="2")
+    for target in PetType:
+        assert updated.strong[target].tolist() == rebuilt.strong[target].tolist()
+        assert updated.defensive[target].tolist() == rebuilt.defensive[target].tolist()
+        assert updated.double[target].tolist() == rebuilt.double[target].tolist()
+    assert updated.pets_by_id[moved.id].type == PetType.UNDEAD
+    assert PETS[1].id not in updated.pets_by_id
@@ -0,0 +1,122 @@
+import asyncio
+import csv
+from pathlib import Path
+from types import SimpleNamespace
+
+from pymongo.errors import BulkWriteError, InvalidOperation
+
+from src.repository.csv_ingest import (
+    ingest_csv,
+    parse_pet_row,
+    write_error_report,
+)
+from src.repository.mongo_db import MongoDb
+from tests.fakes import DATA_DIR, load_pets
+
+PETS_CSV = DATA_DIR / "mop_battle_pets.csv"
+
+
+class BulkCollection:
+    """Applies ReplaceOne upserts keyed on ``id`` like an unordered bulk_write."""
+
+    def __init__(self, reject_ids: set[int] = frozenset()) -> None:
+        self.documents: dict[int, dict] = {}
+        self.reject_ids = reject_ids
+        self.batches: list[int] = []
+
+    async def bulk_write(self, requests, ordered: bool):
+        assert ordered is False
+        if not requests:
+            raise InvalidOperation("No operations to execute")
+        self.batches.append(len(requests))
+        result = {"nUpserted": 0, "nMatched": 0, "nModified": 0, "writeErrors": []}
+        for index, request in enumerate(requests):
+            _id = request._filter["id"]
+            if _id in self.reject_ids:
+                result["writeErrors"].append({"index": index, "errmsg": "rejected"})
+            elif _id not in self.documents:
+                result["nUpserted"] += 1
+            else:
+                result["nMatched"] += 1
+                result["nModified"] += self.documents[_id] != request._doc
+            if _id not in self.reject_ids:
+                self.documents[_id] = request._doc
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return SimpleNamespace(bulk_api_result=result)
+
+
+def write_rows(path: Path, rows: list[dict]) -> Path:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def pet_rows(count: int) -> list[dict]:
+    with PETS_CSV.open(encoding="utf-8") as f:
+        return list(csv.DictReader(f))[:count]
+
+
+def test_rerunning_a_file_changes_nothing():
+    collection = BulkCollection()
+    first = asyncio.run(ingest_csv(collection, PETS_CSV, parse_pet_row, 500))
+    pets = load_pets()
+    assert first.inserted == len({p.id for p in pets})
+    assert first.rows == first.inserted + first.unchanged + len(first.errors)
+
+    second = asyncio.run(ingest_csv(collection, PETS_CSV, parse_pet_row, 500))
+    assert not second.changed
+    assert second.unchanged == len(pets)
+    assert max(collection.batches) <= 500
+
+
+def test_bad_rows_are_reported_and_the_rest_still_load(tmp_path):
+    rows = pet_rows(6)
+    rows[1]["Level"] = "not a level"
+    rows[4]["Abilities"] = "[1, 2"
+    path = write_rows(tmp_path / "pets.csv", rows)
+    collection = BulkCollection(reject_ids={int(rows[5]["ID"])})
+
+    report = asyncio.run(ingest_csv(collection, path, parse_pet_row, batch_size=2))
+
+    assert collection.batches == [1, 2, 1]
+    assert report.inserted == 3
+    assert [(e.line, e.id) for e in report.errors] == [
+        (3, rows[1]["ID"]),
+        (6, rows[4]["ID"]),
+        (7, rows[5]["ID"]),
+    ]
+    write_error_report([report], tmp_path / "errors.csv")
+    with (tmp_path / "errors.csv").open() as f:
+        assert len(list(csv.DictReader(f))) == 3
+
+
+def test_a_chunk_of_only_bad_rows_is_reported_not_written(tmp_path):
+    rows = pet_rows(3)
+    rows[1]["Level"] = "not a level"
+    path = write_rows(tmp_path / "pets.csv", rows)
+    collection = BulkCollection()
+
+    report = asyncio.run(ingest_csv(collection, path, parse_pet_row, batch_size=1))
+
+    assert collection.batches == [1, 1]
+    assert report.inserted == 2
+    assert [(e.line, e.id) for e in report.errors] == [(3, rows[1]["ID"])]
+
+
+def test_populate_bumps_the_version_only_when_rows_change(tmp_path):
+    path = write_rows(tmp_path / "pets.csv", pet_rows(5))
+    mongo = MongoDb(database={"battle_pets": BulkCollection()})
+    bumps = []
+
+    async def bump():
+        bumps.append(1)
+        return str(len(bumps))
+
+    mongo.bump_dataset_version = bump
+
+    assert asyncio.run(mongo.populate_battle_pets(path)).inserted == 5
+    assert not asyncio.run(mongo.populate_battle_pets(path)).changed
+    assert len(bumps) == 1
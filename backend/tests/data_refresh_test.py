@@ -0,0 +1,128 @@
+import asyncio
+import csv
+from pathlib import Path
+
+import pytest
+
+from src.core.counter_index import CounterIndex
+from src.core.models import ChangeSet, PetType
+from src.core.pet_manager import PetManager
+from src.core.query_cache import QueryCache
+from src.repository import clients, redis_cache
+from src.repository.cache_codec import CacheCodec
+from src.repository.clients import Clients
+from src.repository.csv_ingest import content_hash
+from src.repository.data_refresh import diff, plan_refresh, refresh
+from src.repository.pet_data_handler import PetDataHandler
+from src.utils.settings import Settings
+from tests.fakes import DATA_DIR, FakeRedis, InMemoryDb, load_abilities, load_pets
+
+PETS = load_pets()[:10]
+ABILITIES = load_abilities()[:10]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(clients, "_clients", Clients(redis=fake))
+    monkeypatch.setattr(redis_cache, "_codec", CacheCodec())
+    monkeypatch.setattr(redis_cache, "_local", QueryCache(max_entries=100, ttl=60))
+    return fake
+
+
+def pet_rows() -> list[dict]:
+    with (DATA_DIR / "mop_battle_pets.csv").open(encoding="utf-8") as f:
+        return list(csv.DictReader(f))[: len(PETS)]
+
+
+def write_rows(path: Path, rows: list[dict]) -> Path:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def test_diff_sorts_ids_into_inserted_updated_and_deleted():
+    stored = {1: "a", 2: "b", 3: "c"}
+    pets = {p.id: p for p in PETS[:2]}
+    stored[PETS[0].id] = content_hash(PETS[0])
+    stored[PETS[1].id] = "stale"
+    change = diff("battle_pets", pets, stored, keep=frozenset({3}))
+    assert change.inserted == []
+    assert change.updated == [PETS[1].id]
+    assert change.deleted == [1, 2]
+
+
+def test_merge_keeps_the_last_write_per_id():
+    changes = [
+        ChangeSet(collection="battle_pets", inserted=[1, 2]),
+        ChangeSet(collection="abilities", deleted=[1]),
+        ChangeSet(collection="battle_pets", deleted=[2, 3]),
+        ChangeSet(collection="battle_pets", updated=[3]),
+    ]
+    merged = ChangeSet.merge(changes, "battle_pets")
+    assert (merged.upserted, merged.deleted) == ([1, 3], [2])
+    assert ChangeSet.merge(changes, "abilities").deleted == [1]
+
+
+def test_refresh_writes_and_evicts_only_what_changed(redis, tmp_path):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+    rows = pet_rows()
+    rows[0]["Popularity"] = "12345"
+    dropped = rows.pop(1)
+    rows[2]["Level"] = "not a level"
+    path = write_rows(tmp_path / "pets.csv", rows)
+
+    asyncio.run(handler.get_battle_pets_by_ids([p.id for p in PETS]))
+    plan = asyncio.run(refresh(handler, pets=path))
+
+    (change,) = plan.changes
+    assert change.updated == [PETS[0].id]
+    assert change.deleted == [int(dropped["ID"])]
+    # The row that failed to parse keeps its stored pet
+    assert [e.id for e in plan.errors["battle_pets"]] == [rows[2]["ID"]]
+    assert f"battle_pet:{PETS[3].id}" in redis.data
+    assert f"battle_pet:{PETS[0].id}" not in redis.data
+    assert asyncio.run(handler.get_battle_pet(PETS[0].id)).popularity == 12345
+    assert asyncio.run(db.get_changes_since("1")) == [change]
+
+    # The same file again changes nothing and leaves the version alone
+    assert asyncio.run(refresh(handler, pets=path)).empty
+    assert db.version == 2
+
+
+def test_dry_run_only_plans(redis):
+    db = InMemoryDb(PETS[:5], ABILITIES)
+    plan = asyncio.run(
+        plan_refresh(db, abilities=DATA_DIR / "mop_battle_pet_abilities.csv")
+    )
+    assert plan.changes[0].collection == "abilities"
+    assert len(plan.changes[0].inserted) > 0
+    assert db.version == 1
+
+
+def test_manager_applies_logged_changes_to_counter_tables():
+    pets, abilities = load_pets()[:100], load_abilities()
+    db = InMemoryDb(pets, abilities)
+    manager = PetManager(db=db, settings=Settings())
+    try:
+        asyncio.run(manager.counter_index())
+        moved = pets[0].model_copy(update={"type": PetType.MAGIC})
+        changes = [
+            ChangeSet(
+                collection="battle_pets", updated=[moved.id], deleted=[pets[1].id]
+            )
+        ]
+        asyncio.run(db.apply_changes(changes, {"battle_pets": [moved]}))
+        calls = dict(db.calls)
+
+        index = asyncio.run(manager.counter_index())
+        assert db.calls.get("get_all_battle_pets") == calls.get("get_all_battle_pets")
+        rebuilt = CounterIndex.build(db.pets, abilities, index.version)
+        for target in PetType:
+            assert index.strong[target].tolist() == rebuilt.strong[target].tolist()
+            assert index.double[target].tolist() == rebuilt.double[target].tolist()
+    finally:
+        manager.inference.shutdown()
@@ -0,0 +1,264 @@
+import asyncio
+import fnmatch
+import time
+from typing import Mapping, Optional
+
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from src.core.models import Ability, BattlePet, ChangeSet, Page, PageQuery, PetType
+from src.core.pagination import paginate
+from src.repository.csv_ingest import (  # noqa: F401 - re-exported for the tests
+    DATA_DIR,
+    content_hash,
+    load_abilities,
+    load_pets,
+)
+from src.repository.interface.database import DbBase
+
+
+class InMemoryDb(DbBase):
+    """DbBase backed by plain lists, counting calls so tests can assert round trips."""
+
+    def __init__(self, pets: list[BattlePet], abilities: list[Ability]) -> None:
+        self.pets = list(pets)
+        self.abilities = list(abilities)
+        self.version = 1
+        # Change sets by the version they produced, like MongoDb's change log
+        self.change_log: dict[int, list[ChangeSet]] = {}
+        self.calls: dict[str, int] = {}
+
+    def _count(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    async def get_battle_pet(self, _id: int) -> BattlePet:
+        self._count("get_battle_pet")
+        for pet in self.pets:
+            if pet.id == _id:
+                return pet
+        raise ValueError(f"Battle pet with id {_id} not found")
+
+    async def get_ability(self, _id: int) -> Ability:
+        self._count("get_ability")
+        for ability in self.abilities:
+            if ability.id == _id:
+                return ability
+        raise ValueError(f"Ability with id {_id} not found")
+
+    async def get_abilities_by_ids(self, ids: list[int]) -> list[Ability]:
+        self._count("get_abilities_by_ids")
+        wanted = set(ids)
+        return [a for a in self.abilities if a.id in wanted]
+
+    async def get_battle_pets_by_ids(self, ids: list[int]) -> list[BattlePet]:
+        self._count("get_battle_pets_by_ids")
+        wanted = set(ids)
+        return [p for p in self.pets if p.id in wanted]
+
+    def _bump(self, changes: list[ChangeSet]) -> None:
+        self.version += 1
+        self.change_log[self.version] = changes
+
+    async def add_battle_pet(self, pet: BattlePet) -> None:
+        self.pets.append(pet)
+        self._bump([ChangeSet(collection="battle_pets", inserted=[pet.id])])
+
+    async def add_ability(self, ability: Ability) -> None:
+        self.abilities.append(ability)
+        self._bump([ChangeSet(collection="abilities", inserted=[ability.id])])
+
+    async def get_changes_since(self, version: str) -> Optional[list[ChangeSet]]:
+        since = int(version)
+        if any(v not in self.change_log for v in range(since + 1, self.version + 1)):
+            return None
+        return [
+            c for v in range(since + 1, self.version + 1) for c in self.change_log[v]
+        ]
+
+    async def get_content_hashes(self, collection: str) -> dict[int, Optional[str]]:
+        models = self.pets if collection == "battle_pets" else self.abilities
+        return {model.id: content_hash(model) for model in models}
+
+    async def apply_changes(
+        self, changes: list[ChangeSet], models: Mapping[str, list[BattlePet | Ability]]
+    ) -> None:
+        for change in changes:
+            stored = self.pets if change.collection == "battle_pets" else self.abilities
+            replaced = {model.id: model for model in models.get(change.collection, [])}
+            kept = [replaced.pop(m.id, m) for m in stored if m.id not in change.deleted]
+            stored[:] = kept + list(replaced.values())
+        self._bump(changes)
+
+    async def get_all_battle_pets(self) -> list[BattlePet]:
+        self._count("get_all_battle_pets")
+        return list(self.pets)
+
+    async def get_all_abilities(self) -> list[Ability]:
+        self._count("get_all_abilities")
+        return list(self.abilities)
+
+    async def get_battle_pets_page(self, query: PageQuery) -> Page:
+        self._count("get_battle_pets_page")
+        return paginate(self.pets, query)
+
+    async def get_abilities_page(self, query: PageQuery) -> Page:
+        self._count("get_abilities_page")
+        return paginate(self.abilities, query)
+
+    async def get_battle_pet_by_type(self, pet_type: PetType) -> list[BattlePet]:
+        self._count("get_battle_pet_by_type")
+        return [p for p in self.pets if p.type == pet_type]
+
+    async def get_ability_by_type(self, ability_type: PetType) -> list[Ability]:
+        self._count("get_ability_by_type")
+        return [a for a in self.abilities if a.type == ability_type]
+
+    async def get_dataset_version(self) -> str:
+        return str(self.version)
+
+
+class FakeRedis:
+    """The slice of ``redis.asyncio.Redis`` the cache uses, counting round trips.
+
+    Expiry follows ``clock``, which tests can replace to move time forward.
+    Blocking pub/sub reads give up after ``socket_timeout``, as they do in
+    older redis-py versions.
+    """
+
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+        self.expires: dict[str, float] = {}
+        self.published: list[tuple[str, bytes]] = []
+        self.subscribers: list["FakePubSub"] = []
+        self.evicted_keys = 0
+        self.round_trips = 0
+        self.clock = time.monotonic
+        self.socket_timeout: Optional[float] = None
+
+    def _get(self, key: str) -> Optional[bytes]:
+        if key in self.expires and self.expires[key] <= self.clock():
+            self._delete(key)
+        return self.data.get(key)
+
+    def _set(self, key: str, value: bytes, px: Optional[int] = None) -> bool:
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if px:
+            self.expires[key] = self.clock() + px / 1000
+        return True
+
+    def _pttl(self, key: str) -> int:
+        if self._get(key) is None:
+            return -2
+        if key not in self.expires:
+            return -1
+        return int((self.expires[key] - self.clock()) * 1000)
+
+    def _delete(self, key: str) -> bool:
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self.round_trips += 1
+        return self._get(key)
+
+    async def set(self, key: str, value: bytes, px: Optional[int] = None) -> bool:
+        self.round_trips += 1
+        return self._set(key, value, px)
+
+    async def mget(self, keys: list[str]) -> list[Optional[bytes]]:
+        self.round_trips += 1
+        return [self._get(key) for key in keys]
+
+    async def delete(self, *keys: str) -> int:
+        self.round_trips += 1
+        return sum(self._delete(key) for key in keys)
+
+    async def publish(self, channel: str, message: str) -> int:
+        self.round_trips += 1
+        data = message.encode("utf-8") if isinstance(message, str) else message
+        self.published.append((channel, data))
+        listeners = [s for s in self.subscribers if channel in s.channels]
+        for subscriber in listeners:
+            subscriber.messages.put_nowait(
+                {"type": "message", "channel": channel, "data": data}
+            )
+        return len(listeners)
+
+    async def scan_iter(self, match: str):
+        self.round_trips += 1
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def info(self, section: str) -> dict[str, int]:
+        self.round_trips += 1
+        return {"evicted_keys": self.evicted_keys}
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    def pubsub(self) -> "FakePubSub":
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    """Delivers what the FakeRedis publishes on the subscribed channels."""
+
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.channels: set[str] = set()
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def __aenter__(self) -> "FakePubSub":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        if self in self.redis.subscribers:
+            self.redis.subscribers.remove(self)
+
+    async def subscribe(self, *channels: str) -> None:
+        self.channels.update(channels)
+        self.redis.subscribers.append(self)
+
+    async def listen(self):
+        while True:
+            try:
+                yield await asyncio.wait_for(
+                    self.messages.get(), self.redis.socket_timeout
+                )
+            except asyncio.TimeoutError:
+                raise RedisTimeoutError("Timeout reading from socket")
+
+    async def get_message(
+        self, ignore_subscribe_messages: bool = False, timeout: Optional[float] = 0.0
+    ):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self.redis = redis
+        self.commands: list = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+    def get(self, key: str) -> None:
+        self.commands.append(lambda: self.redis._get(key))
+
+    def set(self, key: str, value: bytes, px: Optional[int] = None) -> None:
+        self.commands.append(lambda: self.redis._set(key, value, px))
+
+    def pttl(self, key: str) -> None:
+        self.commands.append(lambda: self.redis._pttl(key))
+
+    async def execute(self) -> list:
+        self.redis.round_trips += 1
+        commands, self.commands = self.commands, []
+        return [command() for command in commands]
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.utils.inference_executor import ExecutorSaturated, InferenceExecutor
+
+
+def test_rejects_beyond_queue_depth_without_blocking_the_loop():
+    executor = InferenceExecutor(max_workers=1, max_queue_depth=2)
+    release = threading.Event()
+
+    async def run():
+        jobs = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert executor.queue_depth == 2
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(release.wait)
+        # The loop is still free while the worker is blocked.
+        ticks = 0
+        for _ in range(5):
+            await asyncio.sleep(0)
+            ticks += 1
+        release.set()
+        await asyncio.gather(*jobs)
+        return ticks
+
+    try:
+        assert asyncio.run(run()) == 5
+    finally:
+        executor.shutdown()
+    assert executor.metrics()["rejected"] == 1
+    assert executor.metrics()["completed"] == 3
+    assert executor.metrics()["in_flight"] == 0
@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.core.matchup import (
+    STRONG_MULTIPLIER,
+    TYPE_ADVANTAGE,
+    TYPE_INDEX,
+    effectiveness_matrix,
+    pair_effectiveness,
+)
+from src.core.models import PetType
+from src.core.pet_type_chart import pet_type_matrix
+from tests.fakes import load_abilities, load_pets
+
+PETS = load_pets()
+ABILITIES_BY_ID = {a.id: a for a in load_abilities()}
+
+
+def test_type_advantage_follows_chart():
+    for attack_type, matchup in pet_type_matrix.items():
+        for defender in matchup["strong_against"]:
+            assert (
+                TYPE_ADVANTAGE[TYPE_INDEX[attack_type], TYPE_INDEX[defender]]
+                == STRONG_MULTIPLIER
+            )
+    assert TYPE_ADVANTAGE[
+        TYPE_INDEX[PetType.BEAST], TYPE_INDEX[PetType.BEAST]
+    ] == np.float32(1.0)
+
+
+def test_matrix_matches_per_pair_loop():
+    attackers, defenders = PETS[:40], PETS[40:80]
+    matrix = effectiveness_matrix(attackers, defenders, ABILITIES_BY_ID)
+    assert matrix.shape == (40, 40)
+    for i, attacker in enumerate(attackers):
+        types = {
+            ABILITIES_BY_ID[a].type for a in attacker.abilities if a in ABILITIES_BY_ID
+        }
+        for j, defender in enumerate(defenders):
+            expected = max(
+                (
+                    TYPE_ADVANTAGE[TYPE_INDEX[t], TYPE_INDEX[defender.type]]
+                    for t in types
+                ),
+                default=0.0,
+            )
+            assert matrix[i, j] == expected
+
+
+def test_pairs_agree_with_matrix():
+    attackers, defenders = PETS[:10], PETS[10:20]
+    matrix = effectiveness_matrix(attackers, defenders, ABILITIES_BY_ID)
+    pairs = [(a, d) for a in attackers for d in defenders]
+    flat = pair_effectiveness(pairs, ABILITIES_BY_ID)
+    assert np.array_equal(flat.reshape(10, 10), matrix)
@@ -0,0 +1,118 @@
+import asyncio
+
+import bson
+from bson.raw_bson import RawBSONDocument
+
+from src.core.models import BattlePet
+from src.core.pagination import SORT_FIELDS
+from src.repository.mongo_db import MongoDb, projection
+from tests.fakes import load_pets
+
+PETS = load_pets()[:10]
+
+
+class FakeCursor:
+    def __init__(self, documents: list[dict]) -> None:
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeCollection:
+    """Applies filters on ``id`` and projections the way the server would."""
+
+    def __init__(self, documents: list[dict], raw: bool = False) -> None:
+        self.documents = documents
+        self.raw = raw
+        self.finds: list[tuple[dict, dict, int]] = []
+
+    def with_options(self, codec_options) -> "FakeCollection":
+        view = FakeCollection(self.documents, raw=True)
+        view.finds = self.finds
+        return view
+
+    def find(self, query: dict, fields: dict, batch_size: int) -> FakeCursor:
+        self.finds.append((query, fields, batch_size))
+        wanted = query.get("id", {}).get("$in")
+        kept = [field for field, keep in fields.items() if keep]
+        documents = []
+        for document in self.documents:
+            if wanted is not None and document["id"] not in wanted:
+                continue
+            document = {k: v for k, v in document.items() if k != "_id"}
+            if kept:
+                document = {k: v for k, v in document.items() if k in kept}
+            if self.raw:
+                document = RawBSONDocument(bson.encode(document))
+            documents.append(document)
+        return FakeCursor(documents)
+
+
+def mongo_with_pets() -> tuple[MongoDb, FakeCollection]:
+    collection = FakeCollection(
+        [{"_id": bson.ObjectId(), **p.model_dump(mode="json")} for p in PETS]
+    )
+    mongo = MongoDb(batch_size=4, database={"battle_pets": collection})
+    return mongo, collection
+
+
+def test_projection_always_drops_the_object_id():
+    assert projection() == {"_id": False, "content_hash": False}
+    assert projection(["id", "name"]) == {"_id": False, "id": True, "name": True}
+
+
+def test_models_stream_with_the_configured_batch_size():
+    mongo, collection = mongo_with_pets()
+
+    async def first_two():
+        pets = []
+        async for pet in mongo.stream_battle_pets():
+            pets.append(pet)
+            if len(pets) == 2:
+                break
+        return pets
+
+    assert asyncio.run(first_two()) == PETS[:2]
+    assert asyncio.run(mongo.get_all_battle_pets()) == PETS
+    ids = [PETS[3].id, PETS[1].id]
+    assert {p.id for p in asyncio.run(mongo.get_battle_pets_by_ids(ids))} == set(ids)
+    assert all(batch_size == 4 for _, _, batch_size in collection.finds)
+    assert all(isinstance(p, BattlePet) for p in asyncio.run(first_two()))
+
+
+def test_projected_and_raw_documents():
+    mongo, _ = mongo_with_pets()
+
+    async def collect(**kwargs):
+        return [d async for d in mongo.stream_documents("battle_pets", **kwargs)]
+
+    rows = asyncio.run(collect(fields=["id", "name"]))
+    assert rows[0] == {"id": PETS[0].id, "name": PETS[0].name}
+    raw = asyncio.run(collect(raw=True))
+    assert isinstance(raw[0], RawBSONDocument)
+    assert BattlePet.model_validate(raw[0]) == PETS[0]
+
+
+class IndexedCollection:
+    def __init__(self) -> None:
+        self.indexes: list[dict] = []
+
+    async def create_indexes(self, indexes) -> None:
+        self.indexes.extend(index.document for index in indexes)
+
+
+def test_indexes_cover_ids_sorts_and_the_change_log():
+    database = {name: IndexedCollection() for name in (*SORT_FIELDS, "changes")}
+    asyncio.run(MongoDb(database=database).ensure_indexes())
+
+    pet_keys = [dict(index["key"]) for index in database["battle_pets"].indexes]
+    assert pet_keys[0] == {"id": 1}
+    assert {"speed": 1, "id": 1} in pet_keys
+    (log_index,) = database["changes"].indexes
+    assert dict(log_index["key"]) == {"generation": 1}
+    assert log_index["unique"]
@@ -0,0 +1,78 @@
+import pytest
+
+from src.core.models import PageQuery
+from src.core.pagination import check_query, decode_cursor, encode_cursor, paginate
+from src.repository.mongo_db import keyset_filter
+from tests.fakes import load_abilities, load_pets
+
+PETS = load_pets()
+ABILITIES = load_abilities()
+
+
+def walk(models, **kwargs) -> list[dict]:
+    rows, cursor = [], None
+    while True:
+        page = paginate(models, PageQuery(cursor=cursor, **kwargs))
+        rows.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            return rows
+
+
+@pytest.mark.parametrize("sort", ["id", "speed", "popularity"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_every_pet_once_in_order(sort, descending):
+    rows = walk(PETS, limit=97, sort=sort, descending=descending)
+    expected = sorted(PETS, key=lambda p: (getattr(p, sort), p.id), reverse=descending)
+    assert [row["id"] for row in rows] == [p.id for p in expected]
+
+
+def test_fields_limit_what_is_returned():
+    page = paginate(ABILITIES, PageQuery(limit=3, sort="popularity", fields=("name",)))
+    assert [set(row) for row in page.items] == [{"id", "name"}] * 3
+    assert (
+        page.items[0]["name"] == min(ABILITIES, key=lambda a: (a.popularity, a.id)).name
+    )
+    full = paginate(PETS, PageQuery(limit=1)).items[0]
+    assert full["type"] == min(PETS, key=lambda p: p.id).type.value
+
+
+def test_bad_queries_are_rejected():
+    check_query("battle_pets", PageQuery(sort="speed", fields=("name", "speed")))
+    with pytest.raises(ValueError):
+        check_query("abilities", PageQuery(sort="speed"))
+    with pytest.raises(ValueError):
+        check_query("battle_pets", PageQuery(fields=("name", "password")))
+    with pytest.raises(ValueError):
+        check_query("battle_pets", PageQuery(cursor="not a cursor"))
+
+
+def test_cursors_only_resume_their_own_sort_order():
+    speed = PageQuery(sort="speed")
+    forged = speed.model_copy(update={"cursor": encode_cursor(speed, "abc", 5)})
+    with pytest.raises(ValueError):
+        check_query("battle_pets", forged)
+
+    page = paginate(PETS, PageQuery(limit=5, sort="power"))
+    for reused in (
+        PageQuery(sort="speed", cursor=page.next_cursor),
+        PageQuery(sort="power", descending=True, cursor=page.next_cursor),
+    ):
+        with pytest.raises(ValueError):
+            check_query("battle_pets", reused)
+        with pytest.raises(ValueError):
+            paginate(PETS, reused)
+    check_query("battle_pets", PageQuery(sort="power", cursor=page.next_cursor))
+
+
+def test_cursor_round_trip_and_mongo_filter():
+    by_id, by_speed = PageQuery(descending=True), PageQuery(sort="speed")
+    cursor = encode_cursor(by_speed, 310, 42)
+    assert decode_cursor(cursor, by_speed) == (310, 42)
+    assert keyset_filter(PageQuery()) == {}
+    assert keyset_filter(
+        by_id.model_copy(update={"cursor": encode_cursor(by_id, 42, 42)})
+    ) == {"id": {"$lt": 42}}
+    assert keyset_filter(by_speed.model_copy(update={"cursor": cursor})) == {
+        "$or": [{"speed": {"$gt": 310}}, {"speed": 310, "id": {"$gt": 42}}]
+    }
@@ -0,0 +1,344 @@
+import asyncio
+import contextlib
+from pathlib import Path
+
+import pytest
+
+from src.core.models import PageQuery
+from src.core.query_cache import QueryCache
+from src.repository import clients, redis_cache
+from src.repository.cache_codec import CacheCodec
+from src.repository.clients import Clients
+from src.repository.csv_ingest import IngestReport
+from src.repository.pet_data_handler import PetDataHandler
+from src.utils.settings import Settings
+from tests.fakes import FakeRedis, InMemoryDb, load_abilities, load_pets
+
+PETS = load_pets()[:20]
+ABILITIES = load_abilities()[:20]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(clients, "_clients", Clients(redis=fake))
+    monkeypatch.setattr(redis_cache, "_codec", CacheCodec())
+    monkeypatch.setattr(redis_cache, "_local", QueryCache(max_entries=100, ttl=60))
+    monkeypatch.setattr(redis_cache, "redis_counters", redis_cache.TierCounters())
+    return fake
+
+
+def test_bulk_lookup_fetches_only_misses(redis):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+    ids = [a.id for a in ABILITIES]
+
+    first = asyncio.run(handler.get_abilities_by_ids(ids[:5]))
+    assert [a.id for a in first] == ids[:5]
+    assert set(redis.data) == {f"ability:{_id}" for _id in ids[:5]}
+    # One MGET and one pipelined write, whatever the number of ids
+    assert redis.round_trips == 2
+
+    redis.round_trips = 0
+    second = asyncio.run(handler.get_abilities_by_ids(ids[3:8] + [ids[3], -1]))
+    assert [a.id for a in second] == ids[3:8]
+    assert db.calls["get_abilities_by_ids"] == 2
+    assert redis.round_trips == 2
+
+    # Every id is now in the local cache, so Redis is not asked at all
+    redis.round_trips = 0
+    asyncio.run(handler.get_abilities_by_ids(ids[:8]))
+    assert db.calls["get_abilities_by_ids"] == 2
+    assert redis.round_trips == 0
+
+
+def test_bulk_pet_lookup_shares_single_pet_keys(redis):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+    ids = [p.id for p in PETS[:4]]
+
+    pets = asyncio.run(handler.get_battle_pets_by_ids(list(reversed(ids))))
+    assert [p.id for p in pets] == list(reversed(ids))
+    assert asyncio.run(handler.get_battle_pet(ids[0])) == PETS[0]
+    assert "get_battle_pet" not in db.calls
+
+
+def test_local_cache_serves_hot_reads_without_redis(redis):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+    asyncio.run(handler.get_all_battle_pets())
+    redis.round_trips = 0
+
+    pets = asyncio.run(handler.get_all_battle_pets())
+    pets.append(PETS[0])
+    assert asyncio.run(handler.get_all_battle_pets()) == PETS
+    assert redis.round_trips == 0
+    assert db.calls["get_all_battle_pets"] == 1
+
+    # A restarted worker starts with an empty local cache and reads Redis
+    redis_cache.get_local_cache().clear()
+    assert asyncio.run(handler.get_all_battle_pets()) == PETS
+    assert db.calls["get_all_battle_pets"] == 1
+    redis.evicted_keys = 3
+    metrics = asyncio.run(redis_cache.metrics())
+    assert metrics["local_cache"]["hits"] == 2
+    assert metrics["redis_cache"]["hits"] == 1
+    assert metrics["redis_cache"]["evictions"] == 3
+
+
+def test_writes_invalidate_every_tier(redis):
+    db = InMemoryDb(PETS[:-1], ABILITIES)
+    handler = PetDataHandler(db)
+    new_pet = PETS[-1]
+    asyncio.run(handler.get_all_battle_pets())
+    asyncio.run(handler.get_battle_pet_by_type(new_pet.type))
+
+    asyncio.run(handler.add_battle_pet(new_pet))
+
+    assert asyncio.run(handler.get_all_battle_pets())[-1] == new_pet
+    assert new_pet in asyncio.run(handler.get_battle_pet_by_type(new_pet.type))
+    channel, message = redis.published[-1]
+    assert channel == redis_cache.INVALIDATION_CHANNEL
+    assert f"battle_pet:{new_pet.id}" in message.decode()
+
+
+def test_reloading_an_unchanged_file_keeps_the_caches(redis, monkeypatch):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+    reports = iter(
+        [
+            IngestReport("pets.csv", rows=20, unchanged=20),
+            IngestReport("pets.csv", rows=20, updated=1, unchanged=19),
+        ]
+    )
+
+    async def populate(*_):
+        return next(reports)
+
+    monkeypatch.setattr(db, "populate_battle_pets", populate)
+    asyncio.run(handler.get_battle_pet(PETS[0].id))
+
+    assert not asyncio.run(handler.populate_battle_pets(Path("pets.csv"))).changed
+    assert f"battle_pet:{PETS[0].id}" in redis.data
+    assert not redis.published
+
+    assert asyncio.run(handler.populate_battle_pets(Path("pets.csv"))).changed
+    assert f"battle_pet:{PETS[0].id}" not in redis.data
+    assert redis.published
+
+
+def test_invalidation_from_another_worker_drops_local_entries(redis):
+    handler = PetDataHandler(InMemoryDb(PETS, ABILITIES))
+    asyncio.run(handler.get_all_battle_pets())
+    asyncio.run(handler.get_all_abilities())
+
+    message = b'{"keys": ["battle_pets:all:1"], "generation": "7"}'
+    assert redis_cache.apply_invalidation(message) == "7"
+    assert redis_cache.get_local_cache().get("battle_pets:all:1") is None
+    assert redis_cache.get_local_cache().get("abilities:all:1") is not None
+
+    redis_cache.apply_invalidation(b'{"keys": "*", "generation": null}')
+    assert len(redis_cache.get_local_cache()) == 0
+
+
+def test_unreadable_invalidations_do_not_stop_the_listener(redis):
+    handler = PetDataHandler(InMemoryDb(PETS, ABILITIES))
+
+    async def publish(message: str) -> None:
+        await redis.publish(redis_cache.INVALIDATION_CHANNEL, message)
+        await asyncio.sleep(0.01)
+
+    async def run():
+        handler.start()
+        await asyncio.sleep(0.01)
+        await handler.get_all_battle_pets()
+        handler._saw_write("4")
+        # The old format, a bare list of keys
+        await publish('["battle_pets:all"]')
+        assert redis_cache.get_local_cache().get("battle_pets:all:1") is None
+        assert await handler.get_dataset_version() == "1"
+        await publish('{"keys": [], "generation": "5"}')
+        assert not handler._listener.done()
+        assert await handler.get_dataset_version() == "5"
+        await handler.stop()
+
+        # A listener that stopped no longer vouches for the generation
+        handler._listener = asyncio.get_running_loop().create_future()
+        handler._listener.set_result(None)
+        return await handler.get_dataset_version()
+
+    assert asyncio.run(run()) == "1"
+
+
+def test_a_quiet_channel_keeps_its_subscription(redis):
+    # Quiet for longer than the socket timeout of the shared pool
+    redis.socket_timeout = 0.01
+    generations = []
+
+    async def run():
+        listener = asyncio.create_task(
+            redis_cache.listen_for_invalidations(generations.append, poll_seconds=0.005)
+        )
+        await asyncio.sleep(0.05)
+        await redis.publish(
+            redis_cache.INVALIDATION_CHANNEL, '{"keys": [], "generation": "3"}'
+        )
+        await asyncio.sleep(0.02)
+        listener.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await listener
+
+    asyncio.run(run())
+    # None once, on subscribing: no reconnects in between
+    assert generations == [None, "3"]
+
+
+class SlowDb(InMemoryDb):
+    async def get_all_battle_pets(self):
+        # Read first, answer late: a write meanwhile leaves the answer stale
+        pets = await super().get_all_battle_pets()
+        await asyncio.sleep(0.01)
+        return pets
+
+
+def test_concurrent_misses_share_one_database_load(redis):
+    db = SlowDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+
+    async def run():
+        return await asyncio.gather(*(handler.get_all_battle_pets() for _ in range(20)))
+
+    assert all(pets == PETS for pets in asyncio.run(run()))
+    assert db.calls["get_all_battle_pets"] == 1
+
+
+def test_stale_entries_are_served_while_one_reload_runs(redis):
+    now = [0.0]
+    redis.clock = lambda: now[0]
+    settings = Settings(
+        cache_ttl_seconds=60, cache_stale_seconds=30, cache_early_refresh_beta=0
+    )
+    db = SlowDb(PETS, ABILITIES)
+    handler = PetDataHandler(db, settings)
+
+    async def read_after(seconds):
+        now[0] = seconds
+        redis_cache.get_local_cache().clear()
+        pets = await asyncio.gather(*(handler.get_all_battle_pets() for _ in range(5)))
+        await asyncio.sleep(0.05)
+        return pets
+
+    asyncio.run(read_after(0))
+    # Fresh: served from Redis without touching the database
+    asyncio.run(read_after(50))
+    assert db.calls["get_all_battle_pets"] == 1
+    # Stale: still served, with a single reload behind it
+    assert all(p == PETS for p in asyncio.run(read_after(70)))
+    assert db.calls["get_all_battle_pets"] == 2
+    assert redis.expires["battle_pets:all:1"] == pytest.approx(70 + 90)
+
+
+def test_early_refresh_gets_likelier_near_expiry(redis):
+    settings = Settings(cache_ttl_seconds=60, cache_early_refresh_beta=1.0)
+    handler = PetDataHandler(InMemoryDb(PETS, ABILITIES), settings)
+    handler._load_seconds["key"] = 1.0
+
+    def refresh_rate(remaining):
+        return sum(handler._refresh_due("key", remaining) for _ in range(2000)) / 2000
+
+    assert refresh_rate(0.0) == 1.0
+    assert refresh_rate(0.5) > refresh_rate(3.0) > refresh_rate(30.0)
+    assert refresh_rate(30.0) < 0.01
+
+
+def test_loads_that_race_a_write_are_not_cached(redis):
+    db = SlowDb(PETS[:-1], ABILITIES)
+    handler = PetDataHandler(db)
+
+    async def run():
+        load = asyncio.create_task(handler.get_all_battle_pets())
+        await asyncio.sleep(0.005)
+        await handler.add_battle_pet(PETS[-1])
+        assert await load == PETS[:-1]
+        return await handler.get_all_battle_pets()
+
+    assert asyncio.run(run()) == PETS
+    assert db.calls["get_all_battle_pets"] == 2
+
+
+def test_loads_that_finish_after_another_workers_write_stay_in_their_generation(
+    redis,
+):
+    db = SlowDb(PETS[:-1], ABILITIES)
+    # Neither worker listens, so neither hears of the other's write
+    loader, writer = PetDataHandler(db), PetDataHandler(db)
+
+    async def run():
+        load = asyncio.create_task(loader.get_all_battle_pets())
+        await asyncio.sleep(0.005)
+        await writer.add_battle_pet(PETS[-1])
+        # The loader read before the write but stores after its invalidation
+        assert await load == PETS[:-1]
+        return await writer.get_all_battle_pets()
+
+    assert asyncio.run(run()) == PETS
+    assert set(redis.data) >= {"battle_pets:all:1", "battle_pets:all:2"}
+    assert redis.expires["battle_pets:all:1"] > 0
+
+
+def test_dataset_version_is_answered_locally_while_listening(redis, monkeypatch):
+    db = InMemoryDb(PETS[:-1], ABILITIES)
+    handler = PetDataHandler(db)
+    asked = []
+    get_version = db.get_dataset_version
+
+    async def counting_version():
+        asked.append(1)
+        return await get_version()
+
+    monkeypatch.setattr(db, "get_dataset_version", counting_version)
+
+    async def run():
+        handler._listener = asyncio.get_running_loop().create_future()
+        first = await handler.get_dataset_version()
+        assert await handler.get_dataset_version() == first
+        await handler.add_battle_pet(PETS[-1])
+        # Another worker's write announces a newer generation
+        handler._saw_write("9")
+        handler._saw_write("3")
+        return first, await handler.get_dataset_version()
+
+    assert asyncio.run(run()) == ("1", "9")
+    assert len(asked) == 2
+    _, message = redis.published[-1]
+    assert redis_cache.apply_invalidation(message) == "2"
+
+
+def test_dataset_version_is_reread_once_the_generation_ttl_passes(redis):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db, Settings(cache_generation_ttl_seconds=0.05))
+
+    async def run():
+        handler._listener = asyncio.get_running_loop().create_future()
+        first = await handler.get_dataset_version()
+        # A write whose announcement never arrived
+        db.version += 1
+        missed = await handler.get_dataset_version()
+        await asyncio.sleep(0.06)
+        return first, missed, await handler.get_dataset_version()
+
+    assert asyncio.run(run()) == ("1", "1", "2")
+
+
+def test_pages_are_cut_by_the_database(redis):
+    db = InMemoryDb(PETS, ABILITIES)
+    handler = PetDataHandler(db)
+    first = asyncio.run(handler.get_battle_pets_page(PageQuery(limit=5, sort="power")))
+    second = asyncio.run(
+        handler.get_battle_pets_page(
+            PageQuery(limit=5, sort="power", cursor=first.next_cursor)
+        )
+    )
+    assert len(first.items + second.items) == 10
+    assert db.calls["get_battle_pets_page"] == 2
+    assert "get_all_battle_pets" not in db.calls
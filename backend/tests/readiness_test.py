@@ -0,0 +1,39 @@
+import asyncio
+import subprocess
+import sys
+
+from src.utils.readiness import FAILED, READY, Readiness
+
+
+def test_states_and_failures_are_reported():
+    readiness = Readiness(["database", "search_model"])
+
+    async def fail():
+        raise RuntimeError("no model")
+
+    async def run():
+        return (
+            await readiness.run("database", lambda: asyncio.sleep(0)),
+            await readiness.run("search_model", fail),
+        )
+
+    assert asyncio.run(run()) == (True, False)
+    report = readiness.report()
+    assert report["ready"] is False
+    assert report["subsystems"]["database"]["state"] == READY
+    assert report["subsystems"]["search_model"]["state"] == FAILED
+    assert "no model" in report["subsystems"]["search_model"]["error"]
+
+
+def test_building_the_app_skips_heavy_imports():
+    code = (
+        "import sys\n"
+        "from src.app.battler_app import BattlerApp\n"
+        "BattlerApp()\n"
+        "print(sorted(m for m in ('torch', 'sentence_transformers', 'faiss')"
+        " if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import json
+
+import brotli
+from starlette.requests import Request
+
+from src.app.response_cache import ResponseCache, accepted_encoding
+from src.core.models import PageQuery
+from src.core.pagination import paginate
+from tests.fakes import load_pets
+
+PETS = load_pets()
+
+
+def request(**headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [
+                (name.replace("_", "-").encode(), value.encode())
+                for name, value in headers.items()
+            ],
+        }
+    )
+
+
+class Builds:
+    def __init__(self, limit: int = 50) -> None:
+        self.limit = limit
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return paginate(PETS, PageQuery(limit=self.limit))
+
+
+def test_body_is_serialized_once_per_version():
+    async def run():
+        cache, build = ResponseCache(), Builds()
+        first = await cache.respond(request(), "pets", "v1", build)
+        second = await cache.respond(request(), "pets", "v1", build)
+        assert build.calls == 1
+        assert first.body == second.body
+        assert json.loads(first.body) == (await build()).model_dump(mode="json")
+
+        build.calls = 0
+        await cache.respond(request(), "pets", "v2", build)
+        assert build.calls == 1
+        await cache.respond(request(), "pets", None, build)
+        await cache.respond(request(), "pets", None, build)
+        assert build.calls == 3
+
+    asyncio.run(run())
+
+
+def test_matching_etag_gets_not_modified():
+    async def run():
+        cache, build = ResponseCache(), Builds()
+        response = await cache.respond(request(), "pets", "v1", build)
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"] == "no-cache"
+
+        again = await cache.respond(request(if_none_match=etag), "pets", "v1", build)
+        assert again.status_code == 304
+        assert again.body == b""
+        weak = await cache.respond(
+            request(if_none_match=f'"other", W/{etag}'), "pets", "v1", build
+        )
+        assert weak.status_code == 304
+        assert cache.metrics()["not_modified"] == 2
+
+        # The tag follows the bytes, so only a new version that changed them misses.
+        same = await cache.respond(request(if_none_match=etag), "pets", "v2", build)
+        assert same.status_code == 304
+        build.limit = 49
+        changed = await cache.respond(request(if_none_match=etag), "pets", "v3", build)
+        assert changed.status_code == 200
+
+    asyncio.run(run())
+
+
+def test_compressed_variant_follows_accept_encoding():
+    async def run():
+        cache, build = ResponseCache(), Builds()
+        plain = await cache.respond(request(), "pets", "v1", build)
+        zipped = await cache.respond(
+            request(accept_encoding="gzip, deflate"), "pets", "v1", build
+        )
+        assert zipped.headers["content-encoding"] == "gzip"
+        assert zipped.headers["vary"] == "Accept-Encoding"
+        assert gzip.decompress(zipped.body) == plain.body
+        assert len(zipped.body) < len(plain.body)
+        assert zipped.headers["etag"] != plain.headers["etag"]
+        assert cache.bodies.get(("v1", "pets")).variants.keys() == {"br", "gzip"}
+
+        preferred = await cache.respond(
+            request(accept_encoding="gzip, br"), "pets", "v1", build
+        )
+        assert preferred.headers["content-encoding"] == "br"
+        assert brotli.decompress(preferred.body) == plain.body
+        assert build.calls == 1
+
+        small = await cache.respond(
+            request(accept_encoding="gzip"), "pet", "v1", Builds(limit=1)
+        )
+        assert "content-encoding" not in small.headers
+
+    asyncio.run(run())
+
+
+def test_accepted_encoding_honours_weights():
+    assert accepted_encoding("") is None
+    assert accepted_encoding("gzip;q=0") is None
+    assert accepted_encoding("identity, *;q=0.5") == accepted_encoding("*")
+    assert accepted_encoding("deflate, GZIP;q=0.8") == "gzip"
+    assert accepted_encoding("gzip, br") == "br"
+    assert accepted_encoding("gzip, br;q=0.5") == "gzip"
@@ -0,0 +1,88 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.core.search_batcher import SearchBatcher
+
+
+class RecordingSearch:
+    """Fake batch search: query i gets ids [i*100, i*100+1, ...]."""
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def __call__(self, queries: list[str], k: int, filters=None):
+        self.batches.append(queries)
+        base = np.array([int(q) * 100 for q in queries])[:, None]
+        ids = base + np.arange(k)[None, :]
+        return ids, -ids.astype(np.float32)
+
+
+def test_concurrent_queries_share_one_batch():
+    search = RecordingSearch()
+    batcher = SearchBatcher(search, window=0.01, max_batch_size=64)
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(str(i), k=2) for i in range(10)))
+
+    results = asyncio.run(run())
+    assert len(search.batches) == 1
+    assert [ids.tolist() for ids, _ in results][3] == [300, 301]
+    assert batcher.metrics.as_dict()["mean_batch_size"] == 10
+
+
+def test_size_cap_splits_batches_and_k_is_per_caller():
+    search = RecordingSearch()
+    batcher = SearchBatcher(search, window=1.0, max_batch_size=4)
+
+    async def run():
+        return await asyncio.gather(
+            *(batcher.search(str(i), k=1 + i % 3) for i in range(8))
+        )
+
+    results = asyncio.run(run())
+    assert [len(batch) for batch in search.batches] == [4, 4]
+    assert [len(ids) for ids, _ in results] == [1, 2, 3, 1, 2, 3, 1, 2]
+
+
+def test_errors_reach_every_caller():
+    def failing(queries, k, filters=None):
+        raise RuntimeError("index not loaded")
+
+    batcher = SearchBatcher(failing, window=0.001)
+
+    async def run():
+        return await asyncio.gather(
+            batcher.search("a"), batcher.search("b"), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_malformed_results_fail_callers_instead_of_hanging():
+    def short(queries, k, filters=None):
+        return np.zeros((1, k)), np.zeros((1, k))
+
+    batcher = SearchBatcher(short, window=0.001)
+
+    async def run():
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                batcher.search("a"), batcher.search("b"), return_exceptions=True
+            ),
+            timeout=1,
+        )
+        assert not batcher._running
+        return results
+
+    first, second = asyncio.run(run())
+    assert not isinstance(first, Exception)
+    assert isinstance(second, IndexError)
+
+
+def test_single_query_waits_at_most_the_window():
+    batcher = SearchBatcher(RecordingSearch(), window=0.02)
+    asyncio.run(batcher.search("1"))
+    assert batcher.metrics.max_queue_wait == pytest.approx(0.02, abs=0.05)
@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+
+import numpy as np
+import pytest
+
+import src.core.semantic_search as semantic_search
+from src.core.counter_index import deals_damage
+from src.core.inference_sidecar import SidecarEncoder, serve
+from src.core.models import PetType, SearchFilters
+from src.core.semantic_search import SemanticSearch
+from src.core.simulation import cooldown_rounds
+from src.utils.inference_executor import InferenceExecutor
+from src.utils.settings import Settings
+from tests.fakes import InMemoryDb, load_abilities, load_pets
+
+
+class FakeModel:
+    """Deterministic bag-of-words encoder that counts encoded documents."""
+
+    dimension = 64
+    encoded = 0
+
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        FakeModel.encoded += len(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                bucket = hashlib.md5(word.encode()).digest()[0] % self.dimension
+                vectors[row, bucket] += 1.0
+        return vectors + 1e-3
+
+
+@pytest.fixture(autouse=True)
+def fake_model(monkeypatch):
+    monkeypatch.setattr(semantic_search, "load_sentence_transformer", FakeModel)
+    FakeModel.encoded = 0
+
+
+@pytest.fixture
+def db() -> InMemoryDb:
+    return InMemoryDb(load_pets()[:50], load_abilities()[:80])
+
+
+def test_index_is_reused_from_disk(tmp_path, db):
+    first = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(first.set_embeddings())
+    assert FakeModel.encoded == 130
+
+    second = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(second.set_embeddings())
+    assert FakeModel.encoded == 130
+    assert second.ability_index.ntotal == 80
+
+
+def test_only_changed_documents_are_encoded(tmp_path, db):
+    asyncio.run(SemanticSearch(db=db, index_dir=tmp_path).set_embeddings())
+    db.abilities[0] = db.abilities[0].model_copy(update={"name": "Renamed"})
+    removed = db.abilities.pop()
+    search = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(search.set_embeddings())
+    assert FakeModel.encoded == 130 + 1
+    assert search.ability_index.ntotal == 79
+    assert removed.id not in search.ability_index.doc_hashes
+
+
+def test_search_returns_real_ids(tmp_path, db):
+    search = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(search.set_embeddings())
+    target = db.abilities[17]
+    ids, scores = search.search_ability(str(target), k=3)
+    assert ids[0] == target.id
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_upsert_encodes_only_new_text(tmp_path, db):
+    search = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(search.set_embeddings())
+    search.upsert_abilities(db.abilities[:5])
+    assert FakeModel.encoded == 130
+    new = db.abilities[0].model_copy(update={"id": 999999, "name": "Brand New"})
+    search.upsert_abilities([new])
+    assert FakeModel.encoded == 131
+    assert search.search_ability(str(new), k=1)[0][0] == 999999
+
+
+def test_repeated_queries_skip_the_model(tmp_path, db):
+    search = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(search.set_embeddings())
+    first = search.search_abilities(["Burning  attack", "stun"], k=3)
+    encoded = FakeModel.encoded
+    second = search.search_abilities(["burning attack", "STUN"], k=3)
+    assert FakeModel.encoded == encoded
+    assert np.array_equal(first[0], second[0])
+    assert search.result_cache.metrics()["hits"] == 2
+
+
+def test_index_changes_invalidate_results_but_not_embeddings(tmp_path, db):
+    search = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(search.set_embeddings())
+    new = db.abilities[0].model_copy(update={"id": 999999, "name": "Zap Zap"})
+    search.search_abilities([str(new)], k=1)
+    search.upsert_abilities([new])
+    encoded = FakeModel.encoded
+    ids, _ = search.search_abilities([str(new)], k=1)
+    assert ids[0, 0] == 999999
+    assert FakeModel.encoded == encoded
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "pq"])
+def test_filters_are_applied_inside_the_search(tmp_path, db, index_type):
+    search = SemanticSearch(
+        db=db,
+        index_dir=tmp_path,
+        settings=Settings(search_index_type=index_type, search_ivf_nprobe=1),
+    )
+    asyncio.run(search.set_embeddings())
+    filters = SearchFilters(type=PetType.BEAST, damaging=True)
+    expected = {
+        a.id for a in db.abilities if a.type == PetType.BEAST and deals_damage(a)
+    }
+    ids, _ = search.search_ability("burning attack", k=3, filters=filters)
+    assert len(ids) == 3 and set(ids) <= expected
+
+    ids, _ = search.search_ability("burning attack", k=50, filters=filters)
+    assert set(ids[ids >= 0]) == expected
+
+
+def test_pet_filters_and_cooldown_ranges(tmp_path, db):
+    search = SemanticSearch(db=db, index_dir=tmp_path)
+    asyncio.run(search.set_embeddings())
+    ids, _ = search.search_pet("critter", k=50, filters=SearchFilters(source="drop"))
+    assert set(ids[ids >= 0]) == {pet.id for pet in db.pets if pet.source == "Drop"}
+
+    slow = SearchFilters(min_cooldown=4, max_cooldown=5)
+    ids, _ = search.search_ability("attack", k=80, filters=slow)
+    cooldowns = {a.id: cooldown_rounds(a) for a in db.abilities}
+    assert ids[0] >= 0
+    assert {cooldowns[_id] for _id in ids if _id >= 0} <= {4, 5}
+
+
+def test_shared_index_is_built_once_and_mapped_by_every_worker(tmp_path, db):
+    settings = Settings(search_shared_index=True)
+    first = SemanticSearch(db=db, index_dir=tmp_path, settings=settings)
+    second = SemanticSearch(db=db, index_dir=tmp_path, settings=settings)
+    asyncio.run(first.set_embeddings())
+    asyncio.run(second.set_embeddings())
+    assert FakeModel.encoded == 130
+    assert first.ability_index.mapped and second.ability_index.mapped
+
+    new = db.abilities[0].model_copy(update={"id": 999999, "name": "Zap Zap"})
+    second.upsert_abilities([new])
+    assert first.search_ability(str(new), k=1)[0][0] == 999999
+
+
+def test_sidecar_encodes_for_the_workers(tmp_path):
+    socket_path = tmp_path / "inference.sock"
+    texts = ["burning attack", "stun"]
+
+    async def run():
+        server = await serve(socket_path, FakeModel("m"), InferenceExecutor())
+        async with server:
+            encoder = SidecarEncoder(socket_path)
+            try:
+                return await asyncio.to_thread(encoder.encode, texts)
+            finally:
+                encoder.close()
+
+    assert np.allclose(asyncio.run(run()), FakeModel("m").encode(texts))
+
+
+def test_manager_resyncs_indexes_after_the_dataset_changes(tmp_path, db):
+    from src.core.pet_manager import PetManager
+
+    manager = PetManager(db=db, settings=Settings(index_dir=tmp_path))
+    new_pet = db.pets[0].model_copy(update={"id": 999999, "name": "Zzyzx Wanderer"})
+
+    async def run():
+        await manager.sem_search.set_embeddings()
+        await manager.sync_search_index()
+        assert not manager._index_syncs.in_flight("search_index")
+
+        await db.add_battle_pet(new_pet)
+        await manager.sync_search_index()
+        while manager._index_syncs.in_flight("search_index"):
+            await asyncio.sleep(0.01)
+        return await manager.sem_search_pets(str(new_pet), k=1)
+
+    try:
+        assert [p.id for p in asyncio.run(run())] == [new_pet.id]
+    finally:
+        manager.inference.shutdown()
+    assert FakeModel.encoded == 130 + 1 + 1
+    # The new pet came from the change log, not a full re-read
+    assert db.calls["get_all_battle_pets"] == 1
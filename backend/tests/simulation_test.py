@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from src.core.models import Ability, BattlePet, PetType
+from src.core.simulation import DRAW, base_damage, hit_chance, simulate
+
+
+def make_ability(_id: int, damage: str, cooldown: str = "", accuracy: str = "100%"):
+    return Ability(
+        id=_id,
+        name=f"Ability {_id}",
+        damage=damage,
+        healing="",
+        duration="",
+        cooldown=cooldown,
+        accuracy=accuracy,
+        type=PetType.BEAST,
+        popularity=1,
+        description="",
+    )
+
+
+def make_pet(_id: int, health: int, power: int, speed: int, abilities: list[int]):
+    return BattlePet(
+        id=_id,
+        name=f"Pet {_id}",
+        level=25,
+        health=health,
+        power=power,
+        speed=speed,
+        breed="B/B",
+        abilities=abilities,
+        source="Test",
+        type=PetType.HUMANOID,
+        popularity=1,
+        is_untameable=False,
+    )
+
+
+ABILITIES = {1: make_ability(1, "20"), 2: make_ability(2, "", accuracy="50%")}
+
+
+def test_ability_parsing():
+    described = make_ability(3, "").model_copy(
+        update={"description": "Deals 30 Beast damage to the target."}
+    )
+    assert base_damage(described) == 30
+    assert base_damage(ABILITIES[2]) == 0
+    assert hit_chance(make_ability(4, "1", accuracy="200%")) == 1.0
+
+
+def test_faster_pet_wins_a_mirror_match():
+    fast = make_pet(1, health=1000, power=280, speed=300, abilities=[1])
+    slow = make_pet(2, health=1000, power=280, speed=200, abilities=[1])
+    result = simulate([fast], [slow], ABILITIES, battles=500, seed=7)
+    assert result.win_rate(0) == 1.0
+    # 20 * (1 + 280 / 20) = 300 per hit kills 1000 health on the fourth round.
+    assert result.rounds_histogram(0) == {4: 500}
+
+
+def test_seed_makes_results_reproducible():
+    team_a = [make_pet(i, 1200, 260, 260, [1, 2]) for i in range(3)]
+    team_b = [make_pet(10 + i, 1200, 260, 260, [1, 2]) for i in range(3)]
+    first = simulate(team_a, team_b, ABILITIES, battles=2000, seed=42)
+    second = simulate(team_a, team_b, ABILITIES, battles=2000, seed=42)
+    assert np.array_equal(first.winner, second.winner)
+    assert np.array_equal(first.rounds, second.rounds)
+    assert 0.4 < first.win_rate(0) < 0.6
+
+
+def test_pets_without_damage_draw():
+    idle = make_pet(1, 1000, 280, 280, [2])
+    result = simulate([idle], [idle], {}, battles=10, max_rounds=5)
+    assert (result.winner == DRAW).all()
+
+
+def test_empty_team_is_rejected():
+    with pytest.raises(ValueError):
+        simulate([], [make_pet(1, 1, 1, 1, [1])], ABILITIES)
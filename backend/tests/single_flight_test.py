@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_load():
+    flights = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run():
+        return await asyncio.gather(*(flights.run("key", load) for _ in range(10)))
+
+    assert asyncio.run(run()) == [1] * 10
+    assert flights.metrics() == {"loads": 1, "coalesced": 9}
+    assert not flights.in_flight("key")
+
+
+def test_failures_reach_every_waiter_and_the_next_call_retries():
+    flights = SingleFlight()
+    attempts = []
+
+    async def load():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ValueError("database down")
+        return "ok"
+
+    async def run():
+        results = await asyncio.gather(
+            flights.run("key", load), flights.run("key", load), return_exceptions=True
+        )
+        assert all(isinstance(r, ValueError) for r in results)
+        return await flights.run("key", load)
+
+    assert asyncio.run(run()) == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_the_load():
+    flights = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(flights.run("key", load))
+        second = asyncio.create_task(flights.run("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
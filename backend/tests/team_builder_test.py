@@ -0,0 +1,72 @@
+import asyncio
+import itertools
+
+from src.core.models import PetType
+from src.core.team_builder import (
+    TeamBuilder,
+    damaging_type_mask,
+    matchup_values,
+    stat_values,
+    type_attack_mask,
+    undominated,
+)
+from tests.fakes import load_abilities, load_pets
+
+PETS = load_pets()
+ABILITIES_BY_ID = {a.id: a for a in load_abilities()}
+
+
+def brute_force_best(candidates, enemy_types, masks) -> float:
+    values = matchup_values(candidates, ABILITIES_BY_ID, enemy_types, masks)
+    stats = stat_values(candidates)
+    return max(
+        values[list(team)].max(axis=0).sum() + stats[list(team)].sum()
+        for team in itertools.combinations(range(len(candidates)), 3)
+    )
+
+
+def test_search_matches_brute_force():
+    candidates, enemies = PETS[:60], PETS[100:103]
+    enemy_types = [pet.type for pet in enemies]
+    masks = damaging_type_mask(enemies, ABILITIES_BY_ID)
+    builder = TeamBuilder(max_workers=2)
+    try:
+        result = asyncio.run(
+            builder.recommend(
+                candidates, ABILITIES_BY_ID, enemy_types, masks, time_budget=10
+            )
+        )
+    finally:
+        builder.shutdown()
+    assert result.complete
+    assert len({pet.id for pet in result.pets}) == 3
+    assert abs(result.score - brute_force_best(candidates, enemy_types, masks)) < 1e-9
+
+
+def test_dominance_pruning_keeps_the_optimum():
+    values = matchup_values(
+        PETS, ABILITIES_BY_ID, [PetType.AQUATIC], type_attack_mask(PetType.AQUATIC)
+    )
+    stats = stat_values(PETS)
+    kept = undominated(values, stats)
+    assert len(kept) < len(PETS)
+    best_all = sorted(values[:, 0] + stats, reverse=True)[:1]
+    assert max(values[kept, 0] + stats[kept]) == best_all[0]
+
+
+def test_exhausted_budget_still_returns_a_team():
+    builder = TeamBuilder(max_workers=1)
+    try:
+        result = asyncio.run(
+            builder.recommend(
+                PETS,
+                ABILITIES_BY_ID,
+                [PetType.BEAST],
+                type_attack_mask(PetType.BEAST),
+                time_budget=1e-6,
+            )
+        )
+    finally:
+        builder.shutdown()
+    assert len(result.pets) == 3
+    assert result.score > 0
@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.core.vector_index import INDEX_TYPES, DocumentIndex, IndexConfig
+
+
+def unit_vectors(n: int, dimension: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_index_type_supports_upsert_remove_and_reload(tmp_path, index_type):
+    vectors = unit_vectors(300)
+    documents = {_id: f"doc {_id}" for _id in range(1000, 1300)}
+    index = DocumentIndex.create(IndexConfig(index_type, ivf_nprobe=64), vectors)
+    index.upsert(documents, vectors)
+    index.upsert({1000: "doc 1000 edited"}, vectors[:1])
+    index.remove([1001, 1002])
+    assert index.ntotal == 298
+
+    index.save(tmp_path / "docs")
+    loaded = DocumentIndex.load(tmp_path / "docs", index.config)
+    assert loaded.ntotal == 298
+    _, ids = loaded.search(vectors[10:11], 5)
+    # Quantized indexes trained on 300 vectors are too coarse to rank reliably.
+    assert set(ids[0]) <= set(documents) - {1001, 1002}
+
+
+def test_exact_modes_find_the_query_itself():
+    vectors = unit_vectors(300)
+    for index_type in ("flat", "hnsw", "sq_fp16"):
+        index = DocumentIndex.create(IndexConfig(index_type), vectors)
+        index.upsert({_id: str(_id) for _id in range(300)}, vectors)
+        _, ids = index.search(vectors[10:11], 1)
+        assert ids[0, 0] == 10
+
+
+def test_unknown_index_type_is_rejected():
+    with pytest.raises(ValueError):
+        IndexConfig("annoy")
+
+
+def test_searches_wait_for_a_modification_in_progress():
+    vectors = unit_vectors(50)
+    index = DocumentIndex.create(IndexConfig("flat"), vectors)
+    index.upsert({_id: str(_id) for _id in range(50)}, vectors)
+    results = []
+    search = threading.Thread(target=lambda: results.append(index.search(vectors, 1)))
+
+    with index._lock.writing():
+        search.start()
+        search.join(0.05)
+        assert search.is_alive() and not results
+    search.join(1)
+    assert results[0][1][10, 0] == 10